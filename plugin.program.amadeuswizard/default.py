@@ -19,11 +19,32 @@
 
 
 if __name__ == '__main__':
+    import os
     import sys
-    from resources.libs.common import router
+    import xbmcaddon
 
     _handle = int(sys.argv[1])
     _params = sys.argv[2][1:]
-    
-    dispatcher = router.Router()
-    dispatcher.dispatch(_handle, _params)
+
+    # Read straight from Kodi so the profiler is running before the first
+    # resources.libs import, CONFIG included
+    profiler = None
+    if xbmcaddon.Addon().getSetting('profileimports') == 'true':
+        from resources.libs.common.lazy import ImportProfiler
+        profiler = ImportProfiler()
+        profiler.start()
+
+    try:
+        from resources.libs.common import router
+
+        dispatcher = router.Router()
+        dispatcher.dispatch(_handle, _params)
+    finally:
+        from resources.libs.common import logging
+        logging.WIZARD_LOG.flush()
+
+        if profiler:
+            from resources.libs.common.config import CONFIG
+
+            profiler.stop()
+            profiler.report(os.path.join(CONFIG.PLUGIN_DATA, 'import_profile.txt'), title='Route: {0}'.format(_params or 'main'))
@@ -18,17 +18,15 @@ import os
 import json
 from urllib.parse import parse_qsl, urlencode
 
-# Import wizard library modules
-try:
-    from resources.lib import wizard_core
-    from resources.lib import repo_manager
-    from resources.lib import addon_installer
-    from resources.lib import service_auth
-    from resources.lib import backup_restore
-    from resources.lib import ui_builder
-except ImportError:
-    # Fallback for development
-    pass
+# Wizard library modules, imported by the actions that use them
+from resources.libs.common.lazy import lazy_import
+
+wizard_core = lazy_import('resources.lib.wizard_core')
+repo_manager = lazy_import('resources.lib.repo_manager')
+addon_installer = lazy_import('resources.lib.addon_installer')
+service_auth = lazy_import('resources.lib.service_auth')
+backup_restore = lazy_import('resources.lib.backup_restore')
+ui_builder = lazy_import('resources.lib.ui_builder')
 
 # =============================================================================
 # CONSTANTS
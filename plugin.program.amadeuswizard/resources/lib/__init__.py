@@ -4,12 +4,25 @@ Amadeus Wizard - Library Package
 ישראל וויזארד - חבילת ספריות
 """
 
-from resources.lib.wizard_core import WizardCore
-from resources.lib.repo_manager import RepoManager
-from resources.lib.addon_installer import AddonInstaller
-from resources.lib.service_auth import ServiceAuth
-from resources.lib.backup_restore import BackupRestore
-from resources.lib.ui_builder import UIBuilder
+# Submodules are imported on first access, so importing one of them does not
+# load (and create Addon handles for) all the others
+_CLASSES = {
+    'WizardCore': 'wizard_core',
+    'RepoManager': 'repo_manager',
+    'AddonInstaller': 'addon_installer',
+    'ServiceAuth': 'service_auth',
+    'BackupRestore': 'backup_restore',
+    'UIBuilder': 'ui_builder',
+}
+
+
+def __getattr__(name):
+    if name not in _CLASSES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    import importlib
+    module = importlib.import_module(f'{__name__}.{_CLASSES[name]}')
+    return getattr(module, name)
+
 
 __all__ = [
     'WizardCore',
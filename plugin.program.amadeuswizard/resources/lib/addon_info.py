@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Amadeus Wizard - Addon Info
+ישראל וויזארד - פרטי התוסף
+
+Shared xbmcaddon.Addon() handle, created on first use instead of at import.
+"""
+
+import xbmcaddon
+import xbmcvfs
+
+
+class AddonInfo:
+    """Lazily created addon handle with its commonly used info."""
+
+    def __init__(self):
+        self._addon = None
+        self._info = {}
+
+    @property
+    def addon(self):
+        if self._addon is None:
+            self._addon = xbmcaddon.Addon()
+        return self._addon
+
+    def info(self, key):
+        """Cached getAddonInfo(key)."""
+        if key not in self._info:
+            self._info[key] = self.addon.getAddonInfo(key)
+        return self._info[key]
+
+    def getAddonInfo(self, key):
+        return self.info(key)
+
+    @property
+    def id(self):
+        return self.info('id')
+
+    @property
+    def name(self):
+        return self.info('name')
+
+    @property
+    def version(self):
+        return self.info('version')
+
+    @property
+    def path(self):
+        return xbmcvfs.translatePath(self.info('path'))
+
+    @property
+    def profile(self):
+        return xbmcvfs.translatePath(self.info('profile'))
+
+
+ADDON = AddonInfo()
@@ -9,21 +9,19 @@ Handles automatic installation of video addons, subtitles, and utilities.
 import xbmc
 import xbmcgui
 import xbmcvfs
-import xbmcaddon
 import os
 import time
 import json
 
 try:
+    from resources.lib.addon_info import ADDON
     from resources.lib.wizard_core import WizardCore
     from resources.lib.repo_manager import RepoManager
 except ImportError:
+    from addon_info import ADDON
     from wizard_core import WizardCore
     from repo_manager import RepoManager
 
-ADDON = xbmcaddon.Addon()
-ADDON_ID = ADDON.getAddonInfo('id')
-ADDON_NAME = ADDON.getAddonInfo('name')
 ADDONS_PATH = xbmcvfs.translatePath('special://home/addons/')
 
 
@@ -156,7 +154,7 @@ class AddonInstaller:
     
     def log(self, message, level=xbmc.LOGINFO):
         """Log message with prefix."""
-        xbmc.log(f'{ADDON_ID} AddonInstaller: {message}', level)
+        xbmc.log(f'{ADDON.id} AddonInstaller: {message}', level)
     
     def _scan_installed(self):
         """Scan for installed addons."""
@@ -337,7 +335,7 @@ class AddonInstaller:
     def install_all_addons_interactive(self):
         """Interactive addon installation with progress dialog."""
         progress = xbmcgui.DialogProgress()
-        progress.create(ADDON_NAME, 'מתקין תוספים...')
+        progress.create(ADDON.name, 'מתקין תוספים...')
         
         try:
             def callback(p, m):
@@ -356,20 +354,20 @@ class AddonInstaller:
             
             if all_failed:
                 self.dialog.ok(
-                    ADDON_NAME,
+                    ADDON.name,
                     f'הותקנו {total_success} תוספים.\n\n'
                     f'נכשלו: {", ".join(all_failed[:5])}'
                 )
             else:
                 self.dialog.notification(
-                    ADDON_NAME,
+                    ADDON.name,
                     f'כל {total_success} התוספים הותקנו בהצלחה!',
                     xbmcgui.NOTIFICATION_INFO
                 )
                 
         except Exception as e:
             progress.close()
-            self.dialog.notification(ADDON_NAME, str(e), xbmcgui.NOTIFICATION_ERROR)
+            self.dialog.notification(ADDON.name, str(e), xbmcgui.NOTIFICATION_ERROR)
     
     def install_hebrew_language(self):
         """Install Hebrew language pack."""
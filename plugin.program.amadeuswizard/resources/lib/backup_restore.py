@@ -9,18 +9,21 @@ Handles backup and restore of Kodi configuration, addons, and userdata.
 import xbmc
 import xbmcgui
 import xbmcvfs
-import xbmcaddon
 import os
+import sys
 import json
 import zipfile
 import shutil
 import time
 from datetime import datetime
 
-ADDON = xbmcaddon.Addon()
-ADDON_ID = ADDON.getAddonInfo('id')
-ADDON_NAME = ADDON.getAddonInfo('name')
-ADDON_DATA = xbmcvfs.translatePath(ADDON.getAddonInfo('profile'))
+try:
+    from resources.lib.addon_info import ADDON
+    from resources.libs.common import compression
+except ImportError:
+    from addon_info import ADDON
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'libs', 'common'))
+    import compression
 
 HOME_PATH = xbmcvfs.translatePath('special://home/')
 ADDONS_PATH = xbmcvfs.translatePath('special://home/addons/')
@@ -28,8 +31,11 @@ USERDATA_PATH = xbmcvfs.translatePath('special://userdata/')
 DATABASE_PATH = xbmcvfs.translatePath('special://database/')
 TEMP_PATH = xbmcvfs.translatePath('special://temp/')
 
-# Default backup location
-BACKUP_BASE = os.path.join(ADDON_DATA, 'backups')
+
+def backup_base():
+    """Default backup location, inside the addon profile."""
+    return os.path.join(ADDON.profile, 'backups')
+
 
 # Items to backup
 BACKUP_ITEMS = {
@@ -109,12 +115,12 @@ class BackupRestore:
     
     def log(self, message, level=xbmc.LOGINFO):
         """Log message with prefix."""
-        xbmc.log(f'{ADDON_ID} BackupRestore: {message}', level)
+        xbmc.log(f'{ADDON.id} BackupRestore: {message}', level)
     
     def _ensure_backup_dir(self):
         """Ensure backup directory exists."""
-        if not os.path.exists(BACKUP_BASE):
-            os.makedirs(BACKUP_BASE)
+        if not os.path.exists(backup_base()):
+            os.makedirs(backup_base())
     
     def _get_backup_path(self, item_key):
         """Get full path for backup item."""
@@ -145,7 +151,7 @@ class BackupRestore:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 backup_name = f'israel_wizard_backup_{timestamp}'
             
-            backup_path = os.path.join(BACKUP_BASE, f'{backup_name}.zip')
+            backup_path = os.path.join(backup_base(), f'{backup_name}.zip')
             
             # Calculate total items
             total_items = len(items)
@@ -155,10 +161,10 @@ class BackupRestore:
                 metadata = {
                     'created': datetime.now().isoformat(),
                     'kodi_version': xbmc.getInfoLabel('System.BuildVersion'),
-                    'wizard_version': ADDON.getAddonInfo('version'),
+                    'wizard_version': ADDON.version,
                     'items': items,
                 }
-                zf.writestr('backup_metadata.json', json.dumps(metadata, indent=2))
+                compression.writestr(zf, 'backup_metadata.json', json.dumps(metadata, indent=2))
                 
                 for i, item_key in enumerate(items):
                     item = BACKUP_ITEMS.get(item_key)
@@ -178,7 +184,7 @@ class BackupRestore:
                     if item.get('is_file', False):
                         # Single file
                         arcname = os.path.join('backup', item['path'])
-                        zf.write(source_path, arcname)
+                        compression.write(zf, source_path, arcname)
                     else:
                         # Directory
                         for root, dirs, files in os.walk(source_path):
@@ -191,7 +197,7 @@ class BackupRestore:
                                 arcname = os.path.join('backup', rel_path)
                                 
                                 try:
-                                    zf.write(file_path, arcname)
+                                    compression.write(zf, file_path, arcname)
                                 except Exception as e:
                                     self.log(f'Could not backup file: {file_path} - {str(e)}', xbmc.LOGWARNING)
             
@@ -291,12 +297,12 @@ class BackupRestore:
         """List available backups."""
         backups = []
         
-        if not os.path.exists(BACKUP_BASE):
+        if not os.path.exists(backup_base()):
             return backups
         
-        for filename in os.listdir(BACKUP_BASE):
+        for filename in os.listdir(backup_base()):
             if filename.endswith('.zip'):
-                filepath = os.path.join(BACKUP_BASE, filename)
+                filepath = os.path.join(backup_base(), filename)
                 try:
                     stat = os.stat(filepath)
                     
@@ -351,12 +357,12 @@ class BackupRestore:
         selected_items = [items[i] for i in selected]
         
         if not selected_items:
-            self.dialog.notification(ADDON_NAME, 'לא נבחרו פריטים', xbmcgui.NOTIFICATION_INFO)
+            self.dialog.notification(ADDON.name, 'לא נבחרו פריטים', xbmcgui.NOTIFICATION_INFO)
             return
         
         # Create backup with progress
         progress = xbmcgui.DialogProgress()
-        progress.create(ADDON_NAME, 'יוצר גיבוי...')
+        progress.create(ADDON.name, 'יוצר גיבוי...')
         
         try:
             def callback(p, m):
@@ -370,24 +376,24 @@ class BackupRestore:
             if backup_path:
                 size_mb = round(os.path.getsize(backup_path) / (1024 * 1024), 2)
                 self.dialog.ok(
-                    ADDON_NAME,
+                    ADDON.name,
                     f'[COLOR green]הגיבוי נוצר בהצלחה![/COLOR]\n\n'
                     f'גודל: {size_mb} MB\n'
                     f'מיקום: {backup_path}'
                 )
             else:
-                self.dialog.notification(ADDON_NAME, 'יצירת גיבוי נכשלה', xbmcgui.NOTIFICATION_ERROR)
+                self.dialog.notification(ADDON.name, 'יצירת גיבוי נכשלה', xbmcgui.NOTIFICATION_ERROR)
                 
         except Exception as e:
             progress.close()
-            self.dialog.notification(ADDON_NAME, str(e), xbmcgui.NOTIFICATION_ERROR)
+            self.dialog.notification(ADDON.name, str(e), xbmcgui.NOTIFICATION_ERROR)
     
     def restore_backup_interactive(self):
         """Interactive backup restoration with selection."""
         backups = self.list_backups()
         
         if not backups:
-            self.dialog.notification(ADDON_NAME, 'לא נמצאו גיבויים', xbmcgui.NOTIFICATION_INFO)
+            self.dialog.notification(ADDON.name, 'לא נמצאו גיבויים', xbmcgui.NOTIFICATION_INFO)
             return
         
         # Show backup selection
@@ -405,7 +411,7 @@ class BackupRestore:
         
         # Confirm restore
         if not self.dialog.yesno(
-            ADDON_NAME,
+            ADDON.name,
             f'לשחזר מגיבוי?\n\n'
             f'קובץ: {backup["filename"]}\n'
             f'גודל: {backup["size_mb"]} MB\n\n'
@@ -417,7 +423,7 @@ class BackupRestore:
         
         # Restore with progress
         progress = xbmcgui.DialogProgress()
-        progress.create(ADDON_NAME, 'משחזר גיבוי...')
+        progress.create(ADDON.name, 'משחזר גיבוי...')
         
         try:
             def callback(p, m):
@@ -430,7 +436,7 @@ class BackupRestore:
             
             if success:
                 if self.dialog.yesno(
-                    ADDON_NAME,
+                    ADDON.name,
                     '[COLOR green]השחזור הושלם![/COLOR]\n\n'
                     'יש לאתחל את קודי להחלת השינויים.',
                     yeslabel='אתחל עכשיו',
@@ -438,11 +444,11 @@ class BackupRestore:
                 ):
                     xbmc.executebuiltin('Quit')
             else:
-                self.dialog.notification(ADDON_NAME, 'שחזור נכשל', xbmcgui.NOTIFICATION_ERROR)
+                self.dialog.notification(ADDON.name, 'שחזור נכשל', xbmcgui.NOTIFICATION_ERROR)
                 
         except Exception as e:
             progress.close()
-            self.dialog.notification(ADDON_NAME, str(e), xbmcgui.NOTIFICATION_ERROR)
+            self.dialog.notification(ADDON.name, str(e), xbmcgui.NOTIFICATION_ERROR)
 
 
 # Convenience functions
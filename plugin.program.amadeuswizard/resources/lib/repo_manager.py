@@ -9,20 +9,20 @@ Handles automatic installation and management of Kodi repositories.
 import xbmc
 import xbmcgui
 import xbmcvfs
-import xbmcaddon
 import os
 import time
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from xml.etree import ElementTree
 
 try:
+    from resources.lib.addon_info import ADDON
     from resources.lib.wizard_core import WizardCore
 except ImportError:
+    from addon_info import ADDON
     from wizard_core import WizardCore
 
-ADDON = xbmcaddon.Addon()
-ADDON_ID = ADDON.getAddonInfo('id')
-ADDON_NAME = ADDON.getAddonInfo('name')
 ADDONS_PATH = xbmcvfs.translatePath('special://home/addons/')
 TEMP_PATH = xbmcvfs.translatePath('special://temp/')
 
@@ -90,6 +90,14 @@ REPOSITORIES = {
 # Essential repos for fresh install
 ESSENTIAL_REPOS = ['burekas', 'fishenzon', 'kodifitzwell']
 
+# Parallel repository downloads
+MAX_WORKERS = 4
+
+# Result states returned by RepoManager.install_repos()
+STATUS_INSTALLED = 'installed'
+STATUS_SKIPPED = 'skipped'
+STATUS_FAILED = 'failed'
+
 
 class RepoManager:
     """Manages repository installation and updates."""
@@ -102,7 +110,7 @@ class RepoManager:
     
     def log(self, message, level=xbmc.LOGINFO):
         """Log message with prefix."""
-        xbmc.log(f'{ADDON_ID} RepoManager: {message}', level)
+        xbmc.log(f'{ADDON.id} RepoManager: {message}', level)
     
     def _scan_installed(self):
         """Scan for installed repositories."""
@@ -211,9 +219,157 @@ class RepoManager:
             self.log(f'Enable addon error: {str(e)}', xbmc.LOGERROR)
             return False
     
+    def _enable_addons(self, addon_ids):
+        """Enable several addons with a single batched JSON-RPC call."""
+        if not addon_ids:
+            return True
+        try:
+            requests = [{
+                'jsonrpc': '2.0',
+                'method': 'Addons.SetAddonEnabled',
+                'params': {
+                    'addonid': addon_id,
+                    'enabled': True
+                },
+                'id': i + 1
+            } for i, addon_id in enumerate(addon_ids)]
+            xbmc.executeJSONRPC(json.dumps(requests))
+            self.log(f'Enabled addons: {", ".join(addon_ids)}')
+            xbmc.sleep(200)
+            return True
+        except Exception as e:
+            self.log(f'Enable addons error: {str(e)}', xbmc.LOGERROR)
+            return False
+    
+    def install_repos(self, repo_keys, progress_callback=None, max_workers=MAX_WORKERS):
+        """
+        Install several repositories concurrently.
+        
+        Missing repositories are downloaded in parallel on a bounded thread
+        pool. Each ZIP is extracted as soon as its download finishes, one at
+        a time, and all new repositories are enabled in one batch at the end.
+        
+        Args:
+            repo_keys: Repository keys from REPOSITORIES
+            progress_callback: Optional callback(percent, message)
+            max_workers: Maximum number of parallel downloads
+            
+        Returns:
+            dict: repo_key -> {'id', 'name', 'status', 'error'}, where status
+                is one of STATUS_INSTALLED, STATUS_SKIPPED or STATUS_FAILED
+        """
+        results = {}
+        pending = []
+        
+        for repo_key in repo_keys:
+            repo = REPOSITORIES.get(repo_key)
+            if not repo:
+                self.log(f'Unknown repository: {repo_key}', xbmc.LOGERROR)
+                results[repo_key] = {'id': None, 'name': repo_key,
+                                     'status': STATUS_FAILED, 'error': 'unknown repository'}
+            elif self.is_installed(repo_key):
+                results[repo_key] = {'id': repo['id'], 'name': repo['name'],
+                                     'status': STATUS_SKIPPED, 'error': None}
+            else:
+                pending.append(repo_key)
+        
+        if not pending:
+            return results
+        
+        total = len(pending)
+        download_progress = dict((repo_key, 0) for repo_key in pending)
+        lock = threading.Lock()
+        extracted = []
+        
+        def report(message):
+            if progress_callback:
+                # Downloads fill the first 80%, extraction the next 15%
+                with lock:
+                    downloaded = sum(download_progress.values()) / total
+                    finished = sum(1 for repo_key in pending if repo_key in results)
+                percent = int(downloaded * 0.8 + finished * 15 / total)
+                progress_callback(min(percent, 95), message)
+        
+        def download(repo_key):
+            repo = REPOSITORIES[repo_key]
+            zip_path = os.path.join(TEMP_PATH, 'amadeuswizard', f'{repo["id"]}.zip')
+            
+            def on_progress(p, m):
+                with lock:
+                    download_progress[repo_key] = p
+            
+            if not self.wizard.download_file(repo['url'], zip_path, on_progress):
+                raise IOError('download failed')
+            with lock:
+                download_progress[repo_key] = 100
+            return zip_path
+        
+        def failed(repo_key, error):
+            repo = REPOSITORIES[repo_key]
+            self.log(f'Install error for {repo["id"]}: {error}', xbmc.LOGERROR)
+            results[repo_key] = {'id': repo['id'], 'name': repo['name'],
+                                 'status': STATUS_FAILED, 'error': error}
+        
+        pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, total)))
+        try:
+            futures = dict((pool.submit(download, repo_key), repo_key) for repo_key in pending)
+            remaining = set(futures)
+            report('מוריד מאגרים...')
+            
+            while remaining:
+                done, remaining = wait(remaining, timeout=0.25, return_when=FIRST_COMPLETED)
+                
+                # Extraction stays on this thread, one ZIP at a time
+                for future in done:
+                    repo_key = futures[future]
+                    repo = REPOSITORIES[repo_key]
+                    try:
+                        zip_path = future.result()
+                    except Exception as e:
+                        failed(repo_key, str(e))
+                        continue
+                    
+                    report(f'מתקין {repo["name"]}...')
+                    if self.wizard.extract_zip(zip_path, ADDONS_PATH):
+                        extracted.append(repo_key)
+                        results[repo_key] = {'id': repo['id'], 'name': repo['name'],
+                                             'status': STATUS_INSTALLED, 'error': None}
+                    else:
+                        failed(repo_key, 'extract failed')
+                    
+                    try:
+                        os.remove(zip_path)
+                    except:
+                        pass
+                
+                report(f'מוריד מאגרים... ({len(results)}/{len(repo_keys)})')
+        except Exception:
+            # Stop the remaining downloads, e.g. when the dialog is cancelled
+            self.wizard.cancelled = True
+            raise
+        finally:
+            pool.shutdown(wait=True)
+        
+        if extracted:
+            if progress_callback:
+                progress_callback(95, 'מפעיל מאגרים...')
+            # Kodi has to see the new folders before they can be enabled
+            self.wizard.refresh_addons()
+            repo_ids = [REPOSITORIES[repo_key]['id'] for repo_key in extracted]
+            self._enable_addons(repo_ids)
+            self.installed_repos.extend(repo_ids)
+        
+        for repo_key in extracted:
+            self.log(f'Repository installed: {REPOSITORIES[repo_key]["id"]}')
+        
+        if progress_callback:
+            progress_callback(100, f'הותקנו {len(extracted)} מאגרים')
+        
+        return results
+    
     def install_all_repos(self, progress_callback=None):
         """
-        Install all repositories in priority order.
+        Install all repositories.
         
         Args:
             progress_callback: Optional callback(percent, message)
@@ -221,52 +377,31 @@ class RepoManager:
         Returns:
             tuple: (success_count, failed_list)
         """
-        sorted_repos = sorted(
+        sorted_keys = [key for key, info in sorted(
             REPOSITORIES.items(),
             key=lambda x: x[1]['priority']
-        )
-        
-        total = len(sorted_repos)
-        success = 0
-        failed = []
+        )]
         
-        for i, (repo_key, repo_info) in enumerate(sorted_repos):
-            base_progress = int((i / total) * 100)
-            
-            def sub_progress(p, m):
-                if progress_callback:
-                    actual = base_progress + int(p * (100 / total) / 100)
-                    progress_callback(actual, m)
-            
-            if self.install_repo(repo_key, sub_progress):
-                success += 1
-            else:
-                failed.append(repo_info['name'])
+        results = self.install_repos(sorted_keys, progress_callback)
         
         # Refresh addon list
         self.wizard.refresh_addons()
         
+        success = sum(1 for result in results.values() if result['status'] != STATUS_FAILED)
+        failed = [result['name'] for result in results.values() if result['status'] == STATUS_FAILED]
         return success, failed
     
     def install_essential_repos(self, progress_callback=None):
         """Install only essential repositories."""
-        total = len(ESSENTIAL_REPOS)
-        success = 0
-        
-        for i, repo_key in enumerate(ESSENTIAL_REPOS):
-            if progress_callback:
-                progress_callback(int((i / total) * 100), f'מתקין מאגר {i + 1}/{total}...')
-            
-            if self.install_repo(repo_key):
-                success += 1
+        results = self.install_repos(ESSENTIAL_REPOS, progress_callback)
         
         self.wizard.refresh_addons()
-        return success
+        return sum(1 for result in results.values() if result['status'] != STATUS_FAILED)
     
     def install_all_repos_interactive(self):
         """Interactive repository installation with progress dialog."""
         progress = xbmcgui.DialogProgress()
-        progress.create(ADDON_NAME, 'מתקין מאגרים...')
+        progress.create(ADDON.name, 'מתקין מאגרים...')
         
         try:
             def callback(p, m):
@@ -280,20 +415,20 @@ class RepoManager:
             # Show result
             if failed:
                 self.dialog.ok(
-                    ADDON_NAME,
+                    ADDON.name,
                     f'הותקנו {success} מאגרים.\n\n'
                     f'נכשלו: {", ".join(failed)}'
                 )
             else:
                 self.dialog.notification(
-                    ADDON_NAME,
+                    ADDON.name,
                     f'כל {success} המאגרים הותקנו בהצלחה!',
                     xbmcgui.NOTIFICATION_INFO
                 )
                 
         except Exception as e:
             progress.close()
-            self.dialog.notification(ADDON_NAME, str(e), xbmcgui.NOTIFICATION_ERROR)
+            self.dialog.notification(ADDON.name, str(e), xbmcgui.NOTIFICATION_ERROR)
     
     def get_repo_list(self):
         """Get list of all repositories with status."""
@@ -9,7 +9,6 @@ Handles OAuth and API authentication for Real Debrid, Trakt, MDBList, and Premiu
 import xbmc
 import xbmcgui
 import xbmcvfs
-import xbmcaddon
 import os
 import json
 import time
@@ -17,17 +16,15 @@ from urllib.request import urlopen, Request
 from urllib.parse import urlencode
 from urllib.error import URLError, HTTPError
 
-ADDON = xbmcaddon.Addon()
-ADDON_ID = ADDON.getAddonInfo('id')
-ADDON_NAME = ADDON.getAddonInfo('name')
-ADDON_DATA = xbmcvfs.translatePath(ADDON.getAddonInfo('profile'))
+try:
+    from resources.lib.addon_info import ADDON
+except ImportError:
+    from addon_info import ADDON
 
-# Ensure addon data directory exists
-if not os.path.exists(ADDON_DATA):
-    os.makedirs(ADDON_DATA)
 
-# Service configuration
-SERVICES_FILE = os.path.join(ADDON_DATA, 'services.json')
+def services_file():
+    """Service configuration file inside the addon profile."""
+    return os.path.join(ADDON.profile, 'services.json')
 
 # Real Debrid OAuth settings
 RD_CLIENT_ID = 'X245A4XAIBGVM'  # Open source client ID
@@ -58,13 +55,13 @@ class ServiceAuth:
     
     def log(self, message, level=xbmc.LOGINFO):
         """Log message with prefix."""
-        xbmc.log(f'{ADDON_ID} ServiceAuth: {message}', level)
+        xbmc.log(f'{ADDON.id} ServiceAuth: {message}', level)
     
     def _load_services(self):
         """Load saved service tokens."""
         try:
-            if os.path.exists(SERVICES_FILE):
-                with open(SERVICES_FILE, 'r', encoding='utf-8') as f:
+            if os.path.exists(services_file()):
+                with open(services_file(), 'r', encoding='utf-8') as f:
                     return json.load(f)
         except Exception as e:
             self.log(f'Load services error: {str(e)}', xbmc.LOGERROR)
@@ -73,7 +70,10 @@ class ServiceAuth:
     def _save_services(self):
         """Save service tokens."""
         try:
-            with open(SERVICES_FILE, 'w', encoding='utf-8') as f:
+            # Ensure addon data directory exists
+            if not os.path.exists(ADDON.profile):
+                os.makedirs(ADDON.profile)
+            with open(services_file(), 'w', encoding='utf-8') as f:
                 json.dump(self.services, f, indent=2)
             self.log('Services saved')
         except Exception as e:
@@ -132,7 +132,7 @@ class ServiceAuth:
             response = self._api_request(device_code_url)
             
             if not response:
-                self.dialog.notification(ADDON_NAME, 'שגיאה בקבלת קוד', xbmcgui.NOTIFICATION_ERROR)
+                self.dialog.notification(ADDON.name, 'שגיאה בקבלת קוד', xbmcgui.NOTIFICATION_ERROR)
                 return False
             
             device_code = response.get('device_code')
@@ -197,11 +197,11 @@ class ServiceAuth:
                         self._configure_rd_in_addons()
                         
                         progress.close()
-                        self.dialog.notification(ADDON_NAME, 'Real Debrid מחובר!', xbmcgui.NOTIFICATION_INFO)
+                        self.dialog.notification(ADDON.name, 'Real Debrid מחובר!', xbmcgui.NOTIFICATION_INFO)
                         return True
             
             progress.close()
-            self.dialog.notification(ADDON_NAME, 'פג תוקף הקוד', xbmcgui.NOTIFICATION_WARNING)
+            self.dialog.notification(ADDON.name, 'פג תוקף הקוד', xbmcgui.NOTIFICATION_WARNING)
             return False
             
         except Exception as e:
@@ -318,7 +318,7 @@ class ServiceAuth:
                         self._save_services()
                         
                         progress.close()
-                        self.dialog.notification(ADDON_NAME, 'Trakt מחובר!', xbmcgui.NOTIFICATION_INFO)
+                        self.dialog.notification(ADDON.name, 'Trakt מחובר!', xbmcgui.NOTIFICATION_INFO)
                         return True
                         
                 except HTTPError as e:
@@ -326,7 +326,7 @@ class ServiceAuth:
                         raise
             
             progress.close()
-            self.dialog.notification(ADDON_NAME, 'פג תוקף הקוד', xbmcgui.NOTIFICATION_WARNING)
+            self.dialog.notification(ADDON.name, 'פג תוקף הקוד', xbmcgui.NOTIFICATION_WARNING)
             return False
             
         except Exception as e:
@@ -363,7 +363,7 @@ class ServiceAuth:
         
         if api_key:
             self.save_mdblist_key(api_key)
-            self.dialog.notification(ADDON_NAME, 'MDBList מוגדר!', xbmcgui.NOTIFICATION_INFO)
+            self.dialog.notification(ADDON.name, 'MDBList מוגדר!', xbmcgui.NOTIFICATION_INFO)
             return True
         return False
     
@@ -405,7 +405,7 @@ class ServiceAuth:
         
         if api_key:
             self.save_premiumize_key(api_key)
-            self.dialog.notification(ADDON_NAME, 'Premiumize מחובר!', xbmcgui.NOTIFICATION_INFO)
+            self.dialog.notification(ADDON.name, 'Premiumize מחובר!', xbmcgui.NOTIFICATION_INFO)
             return True
         return False
     
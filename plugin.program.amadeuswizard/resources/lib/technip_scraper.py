@@ -8,7 +8,6 @@ Uses cached torrents only - no illegal downloading.
 """
 
 import xbmc
-import xbmcaddon
 import json
 import time
 import hashlib
@@ -16,8 +15,10 @@ from urllib.request import urlopen, Request
 from urllib.parse import urlencode, quote
 from urllib.error import HTTPError
 
-ADDON = xbmcaddon.Addon()
-ADDON_ID = ADDON.getAddonInfo('id')
+try:
+    from resources.lib.addon_info import ADDON
+except ImportError:
+    from addon_info import ADDON
 
 # Rate limiting
 RATE_LIMIT_SECONDS = 2
@@ -39,7 +40,7 @@ class TechNipScraper:
         self.rd_api = 'https://api.real-debrid.com/rest/1.0'
     
     def log(self, message, level=xbmc.LOGINFO):
-        xbmc.log(f'{ADDON_ID} TechNip: {message}', level)
+        xbmc.log(f'{ADDON.id} TechNip: {message}', level)
     
     def _rate_limit(self):
         global _last_request_time
@@ -11,10 +11,11 @@ import xbmcaddon
 import os
 import json
 
-ADDON = xbmcaddon.Addon()
-ADDON_ID = ADDON.getAddonInfo('id')
-ADDON_NAME = ADDON.getAddonInfo('name')
-ADDON_PATH = xbmcvfs.translatePath(ADDON.getAddonInfo('path'))
+try:
+    from resources.lib.addon_info import ADDON
+except ImportError:
+    from addon_info import ADDON
+
 USERDATA_PATH = xbmcvfs.translatePath('special://userdata/')
 ADDONS_PATH = xbmcvfs.translatePath('special://home/addons/')
 
@@ -96,7 +97,7 @@ class UIBuilder:
         self.log('Disabled resource hogs')
 
     def log(self, message, level=xbmc.LOGINFO):
-        xbmc.log(f'{ADDON_ID} UIBuilder: {message}', level)
+        xbmc.log(f'{ADDON.id} UIBuilder: {message}', level)
     
     @staticmethod
     def colorize(text, color_key='accent'):
@@ -120,13 +121,13 @@ class UIBuilder:
     
     def apply_skin_settings(self):
         try:
-            guisettings_source = os.path.join(ADDON_PATH, 'guisettings', 'guisettings.xml')
+            guisettings_source = os.path.join(ADDON.path, 'guisettings', 'guisettings.xml')
             guisettings_dest = os.path.join(USERDATA_PATH, 'guisettings.xml')
             if os.path.exists(guisettings_source):
                 xbmcvfs.copy(guisettings_source, guisettings_dest)
             
             # Copy advancedsettings.xml (Performance / Firestick)
-            advanced_source = os.path.join(ADDON_PATH, 'resources', 'advancedsettings.xml')
+            advanced_source = os.path.join(ADDON.path, 'resources', 'advancedsettings.xml')
             advanced_dest = os.path.join(USERDATA_PATH, 'advancedsettings.xml')
             if os.path.exists(advanced_source):
                 xbmcvfs.copy(advanced_source, advanced_dest)
@@ -9,8 +9,8 @@ Handles downloads, extractions, and progress management.
 import xbmc
 import xbmcgui
 import xbmcvfs
-import xbmcaddon
 import os
+import sys
 import hashlib
 import zipfile
 import shutil
@@ -19,9 +19,14 @@ from urllib.error import URLError, HTTPError
 import json
 import time
 
-ADDON = xbmcaddon.Addon()
-ADDON_ID = ADDON.getAddonInfo('id')
-ADDON_NAME = ADDON.getAddonInfo('name')
+try:
+    from resources.lib.addon_info import ADDON
+    from resources.libs.package_cache import CACHE
+except ImportError:
+    from addon_info import ADDON
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from resources.libs.package_cache import CACHE
+
 TEMP_PATH = xbmcvfs.translatePath('special://temp/')
 HOME_PATH = xbmcvfs.translatePath('special://home/')
 ADDONS_PATH = xbmcvfs.translatePath('special://home/addons/')
@@ -38,11 +43,11 @@ class WizardCore:
     
     def log(self, message, level=xbmc.LOGINFO):
         """Log message with addon prefix."""
-        xbmc.log(f'{ADDON_ID}: {message}', level)
+        xbmc.log(f'{ADDON.id}: {message}', level)
     
     def notify(self, message, icon=xbmcgui.NOTIFICATION_INFO, time=3000):
         """Show notification."""
-        self.dialog.notification(ADDON_NAME, message, icon, time)
+        self.dialog.notification(ADDON.name, message, icon, time)
     
     def download_file(self, url, destination, progress_callback=None):
         """
@@ -74,8 +79,15 @@ class WizardCore:
             if not xbmcvfs.exists(dest_dir):
                 xbmcvfs.mkdirs(dest_dir)
             
+            # Shared with the wizard's other downloads
+            if CACHE.fetch(url, response.headers, total_size or None, destination):
+                response.close()
+                if progress_callback:
+                    progress_callback(100, 'נטען מהמטמון')
+                return True
+            
             downloaded = 0
-            chunk_size = 8192
+            chunk_size = 64 * 1024
             
             with open(destination, 'wb') as f:
                 while True:
@@ -97,6 +109,7 @@ class WizardCore:
                         progress_callback(percent, f'מוריד: {size_mb:.1f}/{total_mb:.1f} MB')
             
             self.log(f'Download complete: {destination}')
+            CACHE.store(url, response.headers, destination)
             return True
             
         except HTTPError as e:
@@ -226,7 +239,7 @@ class WizardCore:
     
     def restart_kodi(self):
         """Prompt and restart Kodi."""
-        if self.dialog.yesno(ADDON_NAME, 'יש לאתחל את קודי.\n\nלהפעיל מחדש עכשיו?'):
+        if self.dialog.yesno(ADDON.name, 'יש לאתחל את קודי.\n\nלהפעיל מחדש עכשיו?'):
             xbmc.executebuiltin('Quit')
     
     def force_close(self):
@@ -37,8 +37,11 @@ except ImportError:  # Python 2
 
 from resources.libs.common.config import CONFIG
 from resources.libs import db
+from resources.libs import zipwriter
+from resources.libs.common import compression
 from resources.libs.common import logging
 from resources.libs.common import tools
+from resources.libs.common.progress import ProgressReporter
 
 
 def cleanup_backup():
@@ -185,7 +188,7 @@ class Backup:
                                 continue
                             self.progress_dialog.update(0, '\n' +"[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, addonfolds[item]) + '\n' + "[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, file))
                             fn = os.path.join(base, file)
-                            zipf.write(fn, fn[len(CONFIG.ADDONS):], zipfile.ZIP_DEFLATED)
+                            compression.write(zipf, fn, fn[len(CONFIG.ADDONS):])
                     dep = os.path.join(CONFIG.ADDONS, addonfolds[item], 'addon.xml')
                     if os.path.exists(dep):
                         match = tools.parse_dom(tools.read_from_file(dep), 'import', ret='addon')
@@ -202,7 +205,7 @@ class Backup:
                                         continue
                                     self.progress_dialog.update(0, '\n' + "[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, depends) + '\n' + "[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, file))
                                     fn = os.path.join(base, file)
-                                    zipf.write(fn, fn[len(CONFIG.ADDONS):], zipfile.ZIP_DEFLATED)
+                                    compression.write(zipf, fn, fn[len(CONFIG.ADDONS):])
                                     added.append(depends)
             self.dialog.ok(CONFIG.ADDONTITLE,"[COLOR {0}]{1}[/COLOR] [COLOR {2}]Backup successful:[/COLOR]".format(CONFIG.COLOR1, name, CONFIG.COLOR2) + '\n' + "[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, zipname))
 
@@ -219,12 +222,10 @@ class Backup:
             name = quote_plus(name)
             tempzipname = ''
             zipname = os.path.join(CONFIG.MYBUILDS, '{0}.zip'.format(name))
-            for_progress = 0
-            ITEM = []
-            exclude_dirs = CONFIG.EXCLUDE_DIRS
+            exclude_dirs = list(CONFIG.EXCLUDE_DIRS)
 
             if not self.dialog.yesno(CONFIG.ADDONTITLE, "[COLOR {0}]Do you want to include your addon_data folder?".format(CONFIG.COLOR2) + '\n' + "This contains [COLOR {0}]ALL[/COLOR] add-on settings including passwords but may also contain important information such as skin shortcuts. We recommend [COLOR {0}]MANUALLY[/COLOR] removing the addon_data folders that aren\'t required.".format(CONFIG.COLOR1, CONFIG.COLOR1) + '\n' + "[COLOR {0}]{1}[/COLOR] addon_data is ignored[/COLOR]".format(CONFIG.COLOR1, CONFIG.ADDON_ID), yeslabel='[B][COLOR springgreen]Include data[/COLOR][/B]',nolabel='[B][COLOR red]Don\'t Include[/COLOR][/B]'):
-                exclude_dirs.append('addon_data')
+                exclude_dirs.append(CONFIG.ADDON_DATA)
 
             tools.convert_special(CONFIG.HOME, True)
             extractsize = 0
@@ -246,13 +247,6 @@ class Backup:
                         return
             self.progress_dialog.create(CONFIG.ADDONTITLE + "[COLOR {0}]: Creating Zip[/COLOR]".format(CONFIG.COLOR2) + '\n' + "[COLOR {0}]Creating backup zip".format(CONFIG.COLOR2) + '\n' + "Please Wait...[/COLOR]")
 
-            for base, dirs, files in os.walk(CONFIG.HOME):
-                dirs[:] = [d for d in dirs if d not in exclude_dirs]
-                files[:] = [f for f in files if f not in CONFIG.EXCLUDE_FILES]
-                for file in files:
-                    ITEM.append(file)
-
-            N_ITEM = len(ITEM)
             picture = []
             music = []
             video = []
@@ -314,64 +308,9 @@ class Backup:
 
             binarytxt = self._backup_binaries(binidlist)
 
-            for base, dirs, files in os.walk(CONFIG.HOME):
-                dirs[:] = [d for d in dirs if os.path.join(base, d) not in exclude_dirs]
-                files[:] = [f for f in files if f not in CONFIG.EXCLUDE_FILES]
-                for file in files:
-                    try:
-                        for_progress += 1
-                        progress = tools.percentage(for_progress, N_ITEM)
-                        self.progress_dialog.update(int(progress), '[COLOR {0}]Creating backup zip: [COLOR {1}]{2}[/COLOR] / [COLOR {3}]{4}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, for_progress, CONFIG.COLOR1, N_ITEM) + '\n' + '[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, file))
-                        fn = os.path.join(base, file)
-                        if file in CONFIG.LOGFILES:
-                            logging.log("[Back Up] Type = build: Ignore {0} - Log File".format(file))
-                            continue
-                        elif os.path.join(base, file) in CONFIG.EXCLUDE_FILES:
-                            logging.log("[Back Up] Type = build: Ignore {0} - Excluded File".format(file))
-                            continue
-                        elif os.path.join('addons', 'packages') in fn:
-                            logging.log("[Back Up] Type = build: Ignore {0} - Packages Folder".format(file))
-                            continue
-                        elif file.startswith('._') or file.lower().startswith('.ds_store'):
-                            logging.log("[Back Up] Type = build: Ignore {0} - OSX metadata file".format(file))
-                            continue
-                        elif file.endswith('.pyo'):
-                            continue
-                        elif file.lower().endswith('.db') and 'database' in base:
-                            temp = file.replace('.db', '')
-                            temp = ''.join([i for i in temp if not i.isdigit()])
-                            if temp in CONFIG.DB_FILES:
-                                if not file == db.latest_db(temp):
-                                    logging.log("[Back Up] Type = build: Ignore {0} - DB File".format(file))
-                                    continue
-
-                        skipbinary = False
-                        if len(binidlist) > 0:
-                            for id in binidlist:
-                                id = os.path.join(CONFIG.ADDONS, id)
-                                if id in fn:
-                                    skipbinary = True
-
-                        if skipbinary:
-                            logging.log("[Back Up] Type = build: Ignore {0} - Binary Add-on".format(file))
-                            continue
-
-                        try:
-                            zipf.write(fn, fn[len(CONFIG.HOME):], zipfile.ZIP_DEFLATED)
-                            extractsize += os.path.getsize(fn)
-                        except Exception as e:
-                            logging.log("[Back Up] Type = build: Unable to backup {0}".format(file))
-                            logging.log("{0} / {1}".format(Exception, e))
-                        if self.progress_dialog.iscanceled():
-                            self.progress_dialog.close()
-                            logging.log_notify(CONFIG.ADDONTITLE,
-                                               "[COLOR {0}]Backup Cancelled[/COLOR]".format(CONFIG.COLOR2))
-                            sys.exit()
-                    except Exception as e:
-                        logging.log("[Back Up] Type = build: Unable to backup {0}".format(file))
-                        logging.log("Build Backup Error: {0}".format(str(e)))
+            members = self._build_members(exclude_dirs, binidlist)
 
-            if 'addon_data' in exclude_dirs:
+            if CONFIG.ADDON_DATA in exclude_dirs:
                 match = glob.glob(os.path.join(CONFIG.ADDON_DATA, 'skin.*', ''))
                 for fold in match:
                     fd = os.path.split(fold[:-1])[1]
@@ -380,8 +319,7 @@ class Backup:
                             files[:] = [f for f in files if f not in CONFIG.EXCLUDE_FILES]
                             for file in files:
                                 fn = os.path.join(base, file)
-                                zipf.write(fn, fn[len(CONFIG.HOME):], zipfile.ZIP_DEFLATED)
-                                extractsize += os.path.getsize(fn)
+                                members.append((fn, fn[len(CONFIG.HOME):]))
                         xml = os.path.join(CONFIG.ADDONS, fd, 'addon.xml')
                         if os.path.exists(xml):
                             matchxml = tools.parse_dom(tools.read_from_file(xml), 'import', ret='addon')
@@ -391,8 +329,22 @@ class Backup:
                                     files[:] = [f for f in files if f not in CONFIG.EXCLUDE_FILES]
                                     for file in files:
                                         fn = os.path.join(base, file)
-                                        zipf.write(fn, fn[len(CONFIG.HOME):], zipfile.ZIP_DEFLATED)
-                                        extractsize += os.path.getsize(fn)
+                                        members.append((fn, fn[len(CONFIG.HOME):]))
+
+            N_ITEM = len(members)
+            reporter = ProgressReporter(self.progress_dialog)
+
+            def progress(for_progress, fn):
+                reporter.update(tools.percentage(for_progress, N_ITEM), lambda: '[COLOR {0}]Creating backup zip: [COLOR {1}]{2}[/COLOR] / [COLOR {3}]{4}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, for_progress, CONFIG.COLOR1, N_ITEM) + '\n' + '[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, os.path.basename(fn)))
+                return not reporter.canceled()
+
+            extractsize, cancelled = zipwriter.write_members(zipf, members, progress)
+            if cancelled:
+                zipf.close()
+                self.progress_dialog.close()
+                logging.log_notify(CONFIG.ADDONTITLE,
+                                   "[COLOR {0}]Backup Cancelled[/COLOR]".format(CONFIG.COLOR2))
+                sys.exit()
             zipf.close()
             xbmc.sleep(500)
             self.progress_dialog.close()
@@ -417,6 +369,66 @@ class Backup:
 
             self.dialog.ok(CONFIG.ADDONTITLE, "[COLOR {0}]{1}[/COLOR] [COLOR {2}]Backup successful:[/COLOR]".format(CONFIG.COLOR1, name, CONFIG.COLOR2) + '\n' + "[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, zipname))
 
+    def _build_members(self, exclude_dirs, binidlist):
+        # (path, arcname) of every file a build backup includes, from one
+        # pass over CONFIG.HOME
+        exclude_dirs = frozenset(exclude_dirs)
+        exclude_files = frozenset(CONFIG.EXCLUDE_FILES)
+        log_files = frozenset(CONFIG.LOGFILES)
+        binaries = frozenset(binidlist)
+        packages = os.path.join('addons', 'packages')
+        addons = os.path.join(CONFIG.ADDONS, '')
+        members = []
+
+        stack = [CONFIG.HOME]
+        while stack:
+            base = stack.pop()
+            try:
+                entries = sorted(os.scandir(base), key=lambda entry: entry.name)
+            except OSError as e:
+                logging.log("[Back Up] Type = build: Unable to scan {0}: {1}".format(base, e))
+                continue
+            for entry in entries:
+                file = entry.name
+                fn = entry.path
+                if entry.is_dir():
+                    # Like os.walk, symlinked folders are not followed
+                    if fn not in exclude_dirs and not entry.is_symlink():
+                        stack.append(fn)
+                    continue
+                if file in exclude_files:
+                    continue
+
+                if file in log_files:
+                    logging.log("[Back Up] Type = build: Ignore {0} - Log File".format(file))
+                    continue
+                elif fn in exclude_files:
+                    logging.log("[Back Up] Type = build: Ignore {0} - Excluded File".format(file))
+                    continue
+                elif packages in fn:
+                    logging.log("[Back Up] Type = build: Ignore {0} - Packages Folder".format(file))
+                    continue
+                elif file.startswith('._') or file.lower().startswith('.ds_store'):
+                    logging.log("[Back Up] Type = build: Ignore {0} - OSX metadata file".format(file))
+                    continue
+                elif file.endswith('.pyo'):
+                    continue
+                elif file.lower().endswith('.db') and 'database' in base:
+                    temp = file.replace('.db', '')
+                    temp = ''.join([i for i in temp if not i.isdigit()])
+                    if temp in CONFIG.DB_FILES:
+                        if not file == db.latest_db(temp):
+                            logging.log("[Back Up] Type = build: Ignore {0} - DB File".format(file))
+                            continue
+
+                # Binary add-ons are left out by their folder under addons
+                if binaries and fn.startswith(addons) and fn[len(addons):].split(os.sep, 1)[0] in binaries:
+                    logging.log("[Back Up] Type = build: Ignore {0} - Binary Add-on".format(file))
+                    continue
+
+                members.append((fn, fn[len(CONFIG.HOME):]))
+        return members
+
     def _backup_info(self, name, extractsize, programs, video, music, picture, repos, scripts, binaries):
         backup_path = CONFIG.MYBUILDS
         zipname = name + '.zip'
@@ -493,8 +505,8 @@ class Backup:
                     else:
                         return
             try:
-                zipf.write(CONFIG.GUISETTINGS, 'guisettings.xml', zipfile.ZIP_DEFLATED)
-                zipf.write(CONFIG.PROFILES, 'profiles.xml', zipfile.ZIP_DEFLATED)
+                compression.write(zipf, CONFIG.GUISETTINGS, 'guisettings.xml')
+                compression.write(zipf, CONFIG.PROFILES, 'profiles.xml')
                 match = glob.glob(os.path.join(CONFIG.ADDON_DATA, 'skin.*', ''))
                 for fold in match:
                     fd = os.path.split(fold[:-1])[1]
@@ -506,7 +518,7 @@ class Backup:
                                 files[:] = [f for f in files if f not in CONFIG.EXCLUDE_FILES]
                                 for file in files:
                                     fn = os.path.join(base, file)
-                                    zipf.write(fn, fn[len(CONFIG.USERDATA):], zipfile.ZIP_DEFLATED)
+                                    compression.write(zipf, fn, fn[len(CONFIG.USERDATA):])
                             xml = os.path.join(CONFIG.ADDONS, fd, 'addon.xml')
                             if os.path.exists(xml):
                                 matchxml = tools.parse_dom(tools.read_from_file(xml), 'import', ret='addon')
@@ -516,7 +528,7 @@ class Backup:
                                         files[:] = [f for f in files if f not in CONFIG.EXCLUDE_FILES]
                                         for file in files:
                                             fn = os.path.join(base, file)
-                                            zipf.write(fn, fn[len(CONFIG.USERDATA):], zipfile.ZIP_DEFLATED)
+                                            compression.write(zipf, fn, fn[len(CONFIG.USERDATA):])
                         else:
                             logging.log("[Back Up] Type = guifix: {0} ignored".format(fold))
             except Exception as e:
@@ -579,7 +591,7 @@ class Backup:
                                     nolabel="[B][COLOR red]Skip Textures[/COLOR][/B]"):
                                 fn = xbt
                                 fn2 = fn.replace(CONFIG.HOME, "")
-                                zipf.write(fn, fn2, zipfile.ZIP_DEFLATED)
+                                compression.write(zipf, fn, fn2)
                 else:
                     for xbt in match2:
                         if self.dialog.yesno(CONFIG.ADDONTITLE + '[COLOR {0}]: Theme Backup[/COLOR]'.format(CONFIG.COLOR2), "[COLOR {0}]Would you like to add the Texture File [COLOR {1}]{2}[/COLOR]?".format(CONFIG.COLOR2, CONFIG.COLOR1, xbt.replace(skinfold, "")[1:]) + '\n' + "from [COLOR {0}]{1}[/COLOR][/COLOR]".format(CONFIG.COLOR1, CONFIG.SKIN),
@@ -587,7 +599,7 @@ class Backup:
                                 nolabel="[B][COLOR red]Skip Textures[/COLOR][/B]"):
                             fn = xbt
                             fn2 = fn.replace(CONFIG.HOME, "")
-                            zipf.write(fn, fn2, zipfile.ZIP_DEFLATED)
+                            compression.write(zipf, fn, fn2)
                 ad_skin = os.path.join(CONFIG.ADDON_DATA, CONFIG.SKIN, 'settings.xml')
                 if os.path.exists(ad_skin):
                     if self.dialog.yesno(CONFIG.ADDONTITLE + '[COLOR {0}]: Theme Backup[/COLOR]'.format(CONFIG.COLOR2), "[COLOR {0}]Would you like to go add the [COLOR {1}]settings.xml[/COLOR] in [COLOR {2}]/addon_data/[/COLOR] for?".format(
@@ -595,7 +607,7 @@ class Backup:
                                          yeslabel="[B][COLOR springgreen]Add Settings[/COLOR][/B]",
                                          nolabel="[B][COLOR red]Skip Settings[/COLOR][/B]"):
                         ad_skin2 = ad_skin.replace(CONFIG.HOME, "")
-                        zipf.write(ad_skin, ad_skin2, zipfile.ZIP_DEFLATED)
+                        compression.write(zipf, ad_skin, ad_skin2)
                 match = tools.parse_dom(tools.read_from_file(os.path.join(CONFIG.SKIN, 'addon.xml')), 'import',
                                         ret='addon')
                 if 'script.skinshortcuts' in match:
@@ -606,7 +618,7 @@ class Backup:
                             files[:] = [f for f in files if f not in CONFIG.EXCLUDE_FILES]
                             for file in files:
                                 fn = os.path.join(base, file)
-                                zipf.write(fn, fn[len(CONFIG.HOME):], zipfile.ZIP_DEFLATED)
+                                compression.write(zipf, fn, fn[len(CONFIG.HOME):])
             if self.dialog.yesno(CONFIG.ADDONTITLE + '[COLOR {0}]: Theme Backup[/COLOR]'.format(CONFIG.COLOR2),
                                  "[COLOR {0}]Would you like to include a [COLOR {1}]Backgrounds[/COLOR] folder?[/COLOR]".format(
                                      CONFIG.COLOR2, CONFIG.COLOR1),
@@ -621,7 +633,7 @@ class Backup:
                         for file in files:
                             try:
                                 fn2 = os.path.join(base, file)
-                                zipf.write(fn2, fn2[len(CONFIG.HOME):], zipfile.ZIP_DEFLATED)
+                                compression.write(zipf, fn2, fn2[len(CONFIG.HOME):])
                             except Exception as e:
                                 logging.log("[Back Up] Type = theme: Unable to backup {0}".format(file))
                                 logging.log("Backup Error: {0}".format(str(e)))
@@ -631,8 +643,7 @@ class Backup:
                                          CONFIG.COLOR2, CONFIG.COLOR1, text),
                                      yeslabel="[B][COLOR springgreen]Yes Include[/COLOR][/B]",
                                      nolabel="[B][COLOR red]No Continue[/COLOR][/B]"):
-                    zipf.write(os.path.join(CONFIG.DATABASE, text), '/userdata/Database/{0}'.format(text),
-                               zipfile.ZIP_DEFLATED)
+                    compression.write(zipf, os.path.join(CONFIG.DATABASE, text), '/userdata/Database/{0}'.format(text))
             if self.dialog.yesno(CONFIG.ADDONTITLE + '[COLOR {0}]: Theme Backup[/COLOR]'.format(CONFIG.COLOR2),
                                  "[COLOR {0}]Would you like to include any addons?[/COLOR]".format(CONFIG.COLOR2),
                                  yeslabel="[B][COLOR springgreen]Yes Include[/COLOR][/B]",
@@ -671,7 +682,7 @@ class Backup:
                                 if file.endswith('.pyo'):
                                     continue
                                 fn = os.path.join(base, file)
-                                zipf.write(fn, fn[len(CONFIG.HOME):], zipfile.ZIP_DEFLATED)
+                                compression.write(zipf, fn, fn[len(CONFIG.HOME):])
                         dep = os.path.join(CONFIG.ADDONS, addonfolds[item], 'addon.xml')
                         if os.path.exists(dep):
                             match = tools.parse_dom(tools.read_from_file(dep), 'import', ret='addon')
@@ -686,14 +697,14 @@ class Backup:
                                         if file.endswith('.pyo'):
                                             continue
                                         fn = os.path.join(base, file)
-                                        zipf.write(fn, fn[len(CONFIG.HOME):], zipfile.ZIP_DEFLATED)
+                                        compression.write(zipf, fn, fn[len(CONFIG.HOME):])
                                         added.append(depends)
             if self.dialog.yesno(CONFIG.ADDONTITLE + '[COLOR {0}]: Theme Backup[/COLOR]'.format(CONFIG.COLOR2),
                                  "[COLOR {0}]Would you like to include the [COLOR {1}]guisettings.xml[/COLOR]?[/COLOR]".format(
                                      CONFIG.COLOR2, CONFIG.COLOR1),
                                  yeslabel="[B][COLOR springgreen]Yes Include[/COLOR][/B]",
                                  nolabel="[B][COLOR red]No Continue[/COLOR][/B]"):
-                zipf.write(CONFIG.GUISETTINGS, '/userdata/guisettings.xml', zipfile.ZIP_DEFLATED)
+                compression.write(zipf, CONFIG.GUISETTINGS, '/userdata/guisettings.xml')
         except Exception as e:
             zipf.close()
             logging.log("[Back Up] Type = theme: {0}".format(str(e)))
@@ -783,6 +794,7 @@ class Backup:
                 (os.path.join(CONFIG.ADDON_DATA, 'plugin.video.seren', 'torrentScrape.db')),
                 (os.path.join(CONFIG.ADDON_DATA, 'script.module.simplecache', 'simplecache.db'))]
 
+            reporter = ProgressReporter(self.progress_dialog)
             for base, dirs, files in os.walk(CONFIG.ADDON_DATA):
                 dirs[:] = [d for d in dirs if os.path.join(base, d) not in CONFIG.EXCLUDE_DIRS]
                 files[:] = [f for f in files if f not in CONFIG.EXCLUDE_FILES]
@@ -790,7 +802,7 @@ class Backup:
                     try:
                         for_progress += 1
                         progress = tools.percentage(for_progress, N_ITEM)
-                        self.progress_dialog.update(int(progress), '[COLOR {0}]Creating back up zip: [COLOR{1}]{2}[/COLOR] / [COLOR{3}]{4}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, for_progress, CONFIG.COLOR1, N_ITEM) + '\n' + '[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, file))
+                        reporter.update(progress, lambda: '[COLOR {0}]Creating back up zip: [COLOR{1}]{2}[/COLOR] / [COLOR{3}]{4}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, for_progress, CONFIG.COLOR1, N_ITEM) + '\n' + '[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, file))
                         fn = os.path.join(base, file)
                         if file in CONFIG.LOGFILES:
                             logging.log("[Back Up] Type = addon_data: Ignore {0} - Log Files".format(file))
@@ -812,7 +824,7 @@ class Backup:
                                     logging.log("[Back Up] Type = addon_data: Ignore {0} - Database Files".format(file))
                                     continue
                         try:
-                            zipf.write(fn, fn[len(CONFIG.ADDON_DATA):], zipfile.ZIP_DEFLATED)
+                            compression.write(zipf, fn, fn[len(CONFIG.ADDON_DATA):])
                         except Exception as e:
                             logging.log("[Back Up] Type = addon_data: Unable to backup {0}".format(file))
                             logging.log("Backup Error: {0}".format(str(e)))
@@ -0,0 +1,190 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import xbmc
+
+import json
+import os
+import re
+import threading
+import time
+
+from collections import namedtuple
+from collections import OrderedDict
+
+from resources.libs.common.config import CONFIG
+
+
+BUILD_FIELDS = ('name', 'version', 'url', 'minor', 'gui', 'kodi', 'theme', 'icon', 'fanart', 'preview', 'adult', 'info', 'description')
+WIZARD_FIELDS = ('id', 'version', 'zip')
+
+Build = namedtuple('Build', BUILD_FIELDS)
+WizardInfo = namedtuple('WizardInfo', WIZARD_FIELDS)
+
+# Same substitutions tools.clean_text() makes for empty values
+DEFAULTS = {'gui': 'http://', 'theme': 'http://', 'adult': 'no'}
+
+_FIELD = re.compile(r'(\w+)="(.*?)"', re.S)
+
+
+class BuildCatalog:
+    # Seconds a cached build.txt is trusted before it is revalidated
+    TTL = 300
+
+    def __init__(self, url=None, cache=None):
+        self.url = url or CONFIG.BUILDFILE
+        self.cache = cache or os.path.join(CONFIG.PLUGIN_DATA, 'build_cache.json')
+        self.builds = OrderedDict()
+        self.wizards = {}
+        self.text = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _read_cache(self):
+        if not os.path.exists(self.cache):
+            return None
+        try:
+            with open(self.cache, 'r') as f:
+                cached = json.load(f)
+        except:
+            return None
+        if cached.get('url') != self.url or not cached.get('text'):
+            return None
+        return cached
+
+    def _write_cache(self, cached):
+        from resources.libs.common import logging
+
+        try:
+            if not os.path.exists(CONFIG.PLUGIN_DATA):
+                os.makedirs(CONFIG.PLUGIN_DATA)
+            tmp = '{0}.tmp'.format(self.cache)
+            with open(tmp, 'w') as f:
+                json.dump(cached, f)
+            os.replace(tmp, self.cache)
+        except Exception as e:
+            logging.log("[Build Catalog] Unable to write cache: {0}".format(e), level=xbmc.LOGDEBUG)
+
+    def _parse(self, text):
+        builds = OrderedDict()
+        wizards = {}
+        current = None
+        fields = None
+
+        def store():
+            if current is None:
+                return
+            values = dict((key, current.get(key) or DEFAULTS.get(key, '')) for key in fields)
+            if fields is BUILD_FIELDS:
+                builds.setdefault(values['name'], Build(**values))
+            else:
+                wizards.setdefault(values['id'], WizardInfo(**values))
+
+        for match in _FIELD.finditer(text):
+            key, value = match.group(1), match.group(2).strip()
+            if key in ('name', 'id'):
+                store()
+                current = {}
+                fields = BUILD_FIELDS if key == 'name' else WIZARD_FIELDS
+            if current is not None and key in fields:
+                current.setdefault(key, value)
+        store()
+
+        self.text = text
+        self.builds = builds
+        self.wizards = wizards
+
+    def refresh(self, force=False):
+        from resources.libs.common import logging
+        from resources.libs.common import tools
+
+        cached = self._read_cache()
+        if cached and not force and time.time() - cached.get('fetched', 0) < self.TTL:
+            self._parse(cached['text'])
+            return True
+
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = tools.open_url(self.url, headers=headers)
+
+        if response is not False and response.status_code == 304 and cached:
+            logging.log("[Build Catalog] Not modified: {0}".format(self.url), level=xbmc.LOGDEBUG)
+            cached['fetched'] = time.time()
+            self._write_cache(cached)
+            self._parse(cached['text'])
+            return True
+        elif response is not False and response.status_code == 200:
+            text = response.text
+            self._write_cache({'url': self.url,
+                               'etag': response.headers.get('ETag'),
+                               'last_modified': response.headers.get('Last-Modified'),
+                               'fetched': time.time(),
+                               'text': text})
+            self._parse(text)
+            return True
+        elif cached:
+            logging.log("[Build Catalog] Unable to reach {0}, using cached copy".format(self.url), level=xbmc.LOGINFO)
+            self._parse(cached['text'])
+            return True
+
+        logging.log("[Build Catalog] Unable to load build file: {0}".format(self.url), level=xbmc.LOGERROR)
+        return False
+
+    def load(self, force=False):
+        with self._lock:
+            if force or not self._loaded:
+                self._loaded = self.refresh(force)
+            return self._loaded
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+            self.text = None
+            self.builds = OrderedDict()
+            self.wizards = {}
+            try:
+                os.remove(self.cache)
+            except:
+                pass
+
+    def available(self):
+        return self.load()
+
+    def get_builds(self):
+        if not self.load():
+            return []
+        return list(self.builds.values())
+
+    def get_build(self, name):
+        if not self.load():
+            return None
+        return self.builds.get(name)
+
+    def get_wizard(self, id=None):
+        if not self.load():
+            return None
+        return self.wizards.get(id or CONFIG.ADDON_ID)
+
+
+CATALOG = BuildCatalog()
@@ -53,46 +53,17 @@ def check_paths():
 
 
 def check_build(name, ret):
-    from resources.libs.common import tools
+    from resources.libs.catalog import CATALOG
 
-    response = tools.open_url(CONFIG.BUILDFILE)
+    build = CATALOG.get_build(name)
 
-    if not response:
+    if not build:
         return False
 
-    link = response.text.replace('\n', '').replace('\r', '').replace('\t', '')\
-        .replace('gui=""', 'gui="http://"').replace('theme=""', 'theme="http://"')
-    match = re.compile('name="%s".+?ersion="(.+?)".+?rl="(.+?)".+?inor="(.+?)".+?ui="(.+?)".+?odi="(.+?)".+?heme="(.+?)".+?con="(.+?)".+?anart="(.+?)".+?review="(.+?)".+?dult="(.+?)".+?nfo="(.+?)".+?escription="(.+?)"' % name.replace('[', '\[').replace(']', '\]')).findall(link)
-    if len(match) > 0:
-        for version, url, minor, gui, kodi, theme, icon, fanart, preview, adult, info, description in match:
-            if ret == 'version':
-                return version
-            elif ret == 'url':
-                return url
-            elif ret == 'minor':
-                return minor
-            elif ret == 'gui':
-                return gui
-            elif ret == 'kodi':
-                return kodi
-            elif ret == 'theme':
-                return theme
-            elif ret == 'icon':
-                return icon
-            elif ret == 'fanart':
-                return fanart
-            elif ret == 'preview':
-                return preview
-            elif ret == 'adult':
-                return adult
-            elif ret == 'description':
-                return description
-            elif ret == 'info':
-                return info
-            elif ret == 'all':
-                return name, version, url, minor, gui, kodi, theme, icon, fanart, preview, adult, info, description
-    else:
-        return False
+    if ret == 'all':
+        return tuple(build)
+    elif ret in build._fields:
+        return getattr(build, ret)
 
 
 def check_info(name):
@@ -135,43 +106,34 @@ def check_theme(name, theme, ret):
 
 
 def check_wizard(ret):
-    from resources.libs.common import tools
+    from resources.libs.catalog import CATALOG
 
-    response = tools.open_url(CONFIG.BUILDFILE)
+    wizard = CATALOG.get_wizard(CONFIG.ADDON_ID)
 
-    if not response:
+    if not wizard:
         return False
 
-    link = response.text.replace('\n', '').replace('\r', '').replace('\t', '')
-    match = re.compile('id="{0}".+?ersion="(.+?)".+?ip="(.+?)"'.format(CONFIG.ADDON_ID)).findall(link)
-    if len(match) > 0:
-        for version, zip in match:
-            if ret == 'version':
-                return version
-            elif ret == 'zip':
-                return zip
-            elif ret == 'all':
-                return CONFIG.ADDON_ID, version, zip
-    else:
-        return False
+    if ret == 'version':
+        return wizard.version
+    elif ret == 'zip':
+        return wizard.zip
+    elif ret == 'all':
+        return CONFIG.ADDON_ID, wizard.version, wizard.zip
 
 
 def check_build_update():
+    from resources.libs.catalog import CATALOG
     from resources.libs.common import logging
-    from resources.libs.common import tools
     from resources.libs.gui import window
 
-    response = tools.open_url(CONFIG.BUILDFILE)
-
-    if not response:
+    if not CATALOG.available():
         return
 
-    link = response.text.replace('\n', '').replace('\r', '').replace('\t', '')
-    match = re.compile('name="%s".+?ersion="(.+?)".+?con="(.+?)".+?anart="(.+?)"' % CONFIG.BUILDNAME.replace('[', '\[').replace(']', '\]')).findall(link)
-    if len(match) > 0:
-        version = match[0][0]
-        icon = match[0][1]
-        fanart = match[0][2]
+    build = CATALOG.get_build(CONFIG.BUILDNAME)
+    if build:
+        version = build.version
+        icon = build.icon
+        fanart = build.fanart
         CONFIG.set_setting('latestversion', version)
         if version > CONFIG.BUILDVERSION:
             if True:#CONFIG.DISABLEUPDATE == 'false': # KODI-RD-IL
@@ -379,9 +341,7 @@ def check_repos():
 
 def build_count():
     from resources.libs import test
-    from resources.libs.common import tools
-
-    response = tools.open_url(CONFIG.BUILDFILE)
+    from resources.libs.catalog import CATALOG
 
     total = 0
     count20 = 0
@@ -389,27 +349,18 @@ def build_count():
     hidden = 0
     adultcount = 0
 
-    if not response:
-        return total, count20, count21, adultcount, hidden
-
-    link = response.text.replace('\n', '').replace('\r', '').replace('\t', '')
-    match = re.compile('name="(.+?)".+?odi="(.+?)".+?dult="(.+?)"').findall(link)
-
-    if len(match) > 0:
-        for name, kodi, adult in match:
-            if not CONFIG.SHOWADULT == 'true' and adult.lower() == 'yes':
-                hidden += 1
-                adultcount += 1
-                continue
-            if not CONFIG.DEVELOPER == 'true' and test.str_test(name):
-                hidden += 1
-                continue
-            kodi = int(float(kodi))
-            total += 1
-            if kodi == 20:
-                count20 += 1
-            if kodi == 21:
-                count21 += 1
+    for build in CATALOG.get_builds():
+        if not CONFIG.SHOWADULT == 'true' and build.adult.lower() == 'yes':
+            hidden += 1
+            adultcount += 1
+            continue
+        if not CONFIG.DEVELOPER == 'true' and test.str_test(build.name):
+            hidden += 1
+            continue
+        kodi = int(float(build.kodi))
+        total += 1
+        if kodi == 20:
+            count20 += 1
+        if kodi == 21:
+            count21 += 1
     return total, count20, count21, adultcount, hidden
-
-
@@ -23,6 +23,7 @@ import xbmcgui
 import glob
 import os
 import shutil
+import time
 
 from datetime import datetime
 from datetime import timedelta
@@ -33,6 +34,14 @@ from resources.libs.common.config import CONFIG
 from resources.libs.common import logging
 from resources.libs.common import tools
 
+# Threads removing thumbnail files, and files handed to each at a time
+THUMB_WORKERS = 4
+THUMB_BATCH = 256
+# thumbsquota setting values in MB, 0 is no quota
+THUMB_QUOTAS = [0, 250, 500, 1024, 2048, 4096]
+# Share of the quota left in use after trimming
+THUMB_QUOTA_LOW = 0.9
+
 
 def get_cache_size():
     from resources.libs.common import tools
@@ -175,32 +184,44 @@ def clear_packages(over=None):
                   '[COLOR {0}]Clear Packages: None Found![/COLOR]'.format(CONFIG.COLOR2))
 
 
+def iter_old_packages(minutes=3):
+    # Removes packages older than `minutes` one entry at a time, yielding
+    # (files removed, bytes freed) after each
+    from resources.libs.common import tools
+
+    start = datetime.utcnow() - timedelta(minutes=minutes)
+    if not os.path.exists(CONFIG.PACKAGES):
+        return
+    pack = os.listdir(CONFIG.PACKAGES)
+    pack.sort(key=lambda f: os.path.getmtime(os.path.join(CONFIG.PACKAGES, f)))
+    for item in pack:
+        file = os.path.join(CONFIG.PACKAGES, item)
+        lastedit = datetime.utcfromtimestamp(os.path.getmtime(file))
+        if lastedit <= start:
+            if os.path.isfile(file):
+                size = os.path.getsize(file)
+                os.unlink(file)
+                yield 1, size
+            elif os.path.isdir(file):
+                size = tools.get_size(file)
+                cleanfiles, cleanfold = tools.clean_house(file)
+                try:
+                    shutil.rmtree(file)
+                except Exception as e:
+                    logging.log("Failed to remove {0}: {1}".format(file, str(e), xbmc.LOGERROR))
+                yield cleanfiles + cleanfold, size
+
+
 def clear_packages_startup():
     from resources.libs.common import tools
 
-    start = datetime.utcnow() - timedelta(minutes=3)
     file_count = 0
     cleanupsize = 0
     if os.path.exists(CONFIG.PACKAGES):
-        pack = os.listdir(CONFIG.PACKAGES)
-        pack.sort(key=lambda f: os.path.getmtime(os.path.join(CONFIG.PACKAGES, f)))
         try:
-            for item in pack:
-                file = os.path.join(CONFIG.PACKAGES, item)
-                lastedit = datetime.utcfromtimestamp(os.path.getmtime(file))
-                if lastedit <= start:
-                    if os.path.isfile(file):
-                        file_count += 1
-                        cleanupsize += os.path.getsize(file)
-                        os.unlink(file)
-                    elif os.path.isdir(file):
-                        cleanupsize += tools.get_size(file)
-                        cleanfiles, cleanfold = tools.clean_house(file)
-                        file_count += cleanfiles + cleanfold
-                        try:
-                            shutil.rmtree(file)
-                        except Exception as e:
-                            logging.log("Failed to remove {0}: {1}".format(file, str(e), xbmc.LOGERROR))
+            for count, size in iter_old_packages():
+                file_count += count
+                cleanupsize += size
             if file_count > 0:
                 logging.log_notify(CONFIG.ADDONTITLE,
                           '[COLOR {0}]Clear Packages: Success: {1}[/COLOR]'.format(CONFIG.COLOR2, tools.convert_size(cleanupsize)))
@@ -247,7 +268,9 @@ def clear_function_cache(over=False):
             xbmc.executebuiltin('RunPlugin(plugin://script.module.urlresolver/?mode=reset_cache)')
 
 
-def clear_cache(over=None):
+def iter_clear_cache(over=None):
+    # Clears the cache folders a folder at a time and video add-on cache
+    # databases one at a time, yielding (files removed, bytes freed) after each
     PROFILEADDONDATA = os.path.join(CONFIG.PROFILE, 'addon_data')
     dbfiles = [
         (os.path.join(CONFIG.ADDON_DATA, 'plugin.video.gaia', 'cache.db')),
@@ -289,7 +312,6 @@ def clear_cache(over=None):
         (os.path.join(CONFIG.ADDON_DATA, 'plugin.program.autocompletion', 'Bing')),
         (os.path.join(CONFIG.ADDON_DATA, 'plugin.video.openmeta', '.storage'))]
 
-    delfiles = 0
     excludes = ['meta_cache', 'archive_cache']
     for item in cachelist:
         if not os.path.exists(item):
@@ -297,15 +319,20 @@ def clear_cache(over=None):
         if item not in [CONFIG.ADDON_DATA, PROFILEADDONDATA]:
             for root, dirs, files in os.walk(item):
                 dirs[:] = [d for d in dirs if d not in excludes]
+                delfiles = 0
+                size = 0
                 file_count = 0
                 file_count += len(files)
                 if file_count > 0:
                     for f in files:
                         if f not in CONFIG.LOGFILES:
                             try:
-                                os.unlink(os.path.join(root, f))
-                                logging.log("[Wiped] {0}".format(os.path.join(root, f)))
+                                file = os.path.join(root, f)
+                                filesize = os.path.getsize(file)
+                                os.unlink(file)
+                                logging.log("[Wiped] {0}".format(file))
                                 delfiles += 1
+                                size += filesize
                             except:
                                 pass
                         else:
@@ -319,9 +346,11 @@ def clear_cache(over=None):
                         except:
                             logging.log("[Failed] to wipe cache in: {0}".format(os.path.join(item, d)),
                                         level=xbmc.LOGINFO)
+                yield delfiles, size
         else:
             for root, dirs, files in os.walk(item):
                 dirs[:] = [d for d in dirs if d not in excludes]
+                delfiles = 0
                 for d in dirs:
                     if not str(d.lower()).find('cache') == -1:
                         try:
@@ -330,6 +359,7 @@ def clear_cache(over=None):
                             logging.log("[Success] wiped {0} ".format(os.path.join(root, d)))
                         except:
                             logging.log("[Failed] to wipe cache in: {0}".format(os.path.join(item, d)))
+                yield delfiles, 0
 
     if CONFIG.INCLUDEVIDEO == 'true' and over is None:
         files = []
@@ -365,7 +395,7 @@ def clear_cache(over=None):
         if len(files) > 0:
             for item in files:
                 if os.path.exists(item):
-                    delfiles += 1
+                    size = os.path.getsize(item)
                     try:
                         textdb = database.connect(item)
                         textexe = textdb.cursor()
@@ -395,65 +425,246 @@ def clear_cache(over=None):
                                 except:
                                     pass
                         textexe.close()
+                    yield 1, max(size - os.path.getsize(item), 0)
         else:
             logging.log("Clear Cache: Clear Video Cache Not Enabled")
+
+
+def clear_cache(over=None):
+    delfiles = 0
+    for count, size in iter_clear_cache(over):
+        delfiles += count
     logging.log_notify(CONFIG.ADDONTITLE,
                        '[COLOR {0}]Clear Cache: Removed {1} Files[/COLOR]'.format(CONFIG.COLOR2, delfiles))
 
 
-def old_thumbs():
+def _open_textures():
     from resources.libs import db
-    from resources.libs.common import tools
 
     dbfile = os.path.join(CONFIG.DATABASE, db.latest_db('Textures'))
-    use = 30
-    week = tools.get_date(days=-7)
-    ids = []
-    images = []
-    size = 0
-    if os.path.exists(dbfile):
-        try:
-            textdb = database.connect(dbfile, isolation_level=None)
-            textexe = textdb.cursor()
-        except Exception as e:
-            logging.log("DB Connection Error: {0}".format(str(e)), level=xbmc.LOGERROR)
-            return False
-    else:
+    if not os.path.exists(dbfile):
         logging.log('{0} not found.'.format(dbfile), level=xbmc.LOGERROR)
-        return False
-    textexe.execute("SELECT idtexture FROM sizes WHERE usecount < ? AND lastusetime < ?", (use, str(week)))
-    found = textexe.fetchall()
-    for rows in found:
-        idfound = rows[0]
-        ids.append(idfound)
-        textexe.execute("SELECT cachedurl FROM texture WHERE id = ?", (idfound, ))
-        found2 = textexe.fetchall()
-        for rows2 in found2:
-            images.append(rows2[0])
-    logging.log("{0} total thumbs cleaned up.".format(str(len(images))))
-    for id in ids:
-        textexe.execute("DELETE FROM sizes WHERE idtexture = ?", (id, ))
-        textexe.execute("DELETE FROM texture WHERE id = ?", (id, ))
-    textexe.execute("VACUUM")
-    textdb.commit()
-    textexe.close()
-    for image in images:
-        path = os.path.join(CONFIG.THUMBNAILS, image)
+        return dbfile, None
+    try:
+        # Transactions are managed by hand below
+        return dbfile, database.connect(dbfile, isolation_level=None)
+    except Exception as e:
+        logging.log("DB Connection Error: {0}".format(str(e)), level=xbmc.LOGERROR)
+        return dbfile, None
+
+
+def _delete_textures(textdb, query, params=()):
+    # query is a SELECT of the texture ids to remove, or the ids themselves.
+    # They are collected into a temp table once, so finding their files and
+    # deleting their rows are each a single statement instead of a few per
+    # texture.
+    textexe = textdb.cursor()
+    textexe.execute("DROP TABLE IF EXISTS temp.evict")
+    textexe.execute("CREATE TEMP TABLE evict (id INTEGER PRIMARY KEY)")
+    if isinstance(query, str):
+        textexe.execute("INSERT OR IGNORE INTO temp.evict (id) {0}".format(query), params)
+    else:
+        textexe.executemany("INSERT OR IGNORE INTO temp.evict (id) VALUES (?)", ((id, ) for id in query))
+    textexe.execute("SELECT texture.cachedurl FROM texture JOIN temp.evict ON texture.id = evict.id")
+    images = [row[0] for row in textexe.fetchall() if row[0]]
+
+    textexe.execute("BEGIN")
+    try:
+        textexe.execute("DELETE FROM sizes WHERE idtexture IN (SELECT id FROM temp.evict)")
+        textexe.execute("DELETE FROM texture WHERE id IN (SELECT id FROM temp.evict)")
+        textexe.execute("COMMIT")
+    except:
+        textexe.execute("ROLLBACK")
+        raise
+    finally:
+        textexe.execute("DROP TABLE IF EXISTS temp.evict")
+        textexe.close()
+    return images
+
+
+def _iter_remove_thumbs(images):
+    # Removes the files THUMB_BATCH at a time, yielding (files removed,
+    # bytes freed) after each batch
+    from concurrent.futures import ThreadPoolExecutor
+
+    def remove(image):
+        path = os.path.join(CONFIG.THUMBNAILS, *image.split('/'))
         try:
-            imagesize = os.path.getsize(path)
+            size = os.stat(path).st_size
             os.remove(path)
-            size += imagesize
-        except:
-            pass
+            return size
+        except OSError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=THUMB_WORKERS) as pool:
+        for start in range(0, len(images), THUMB_BATCH):
+            sizes = [size for size in pool.map(remove, images[start:start + THUMB_BATCH]) if size is not None]
+            yield len(sizes), sum(sizes)
+
+
+def _compact_textures(textdb, dbfile):
+    # A full VACUUM rewrites the whole database and locks Kodi out of it
+    # meanwhile. With auto_vacuum=INCREMENTAL free pages can be handed back
+    # in place, so switch to that once and only trim the free list after.
+    # Returns the bytes the database shrank by.
+    if CONFIG.THUMBSVACUUM != 'true':
+        return 0
+    before = os.path.getsize(dbfile)
+    textexe = textdb.cursor()
+    try:
+        textexe.execute("PRAGMA auto_vacuum")
+        if textexe.fetchone()[0] != 2:
+            textexe.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            textexe.execute("VACUUM")
+        else:
+            textexe.execute("PRAGMA incremental_vacuum")
+            textexe.fetchall()
+    except Exception as e:
+        logging.log("Unable to compact {0}: {1}".format(dbfile, str(e)), level=xbmc.LOGERROR)
+    finally:
+        textexe.close()
+    return max(before - os.path.getsize(dbfile), 0)
+
+
+def iter_old_thumbs():
+    # Yields (files removed, bytes freed) as it goes. The database work is
+    # done and the connection closed before the first yield, files are then
+    # removed a batch at a time.
+    use = 30
+    # lastusetime is stored as text
+    week = tools.get_date(days=-7, formatted=True)
+
+    dbfile, textdb = _open_textures()
+    if textdb is None:
+        return
+    try:
+        images = _delete_textures(textdb, "SELECT idtexture FROM sizes WHERE usecount < ? AND lastusetime < ?", (use, week))
+        logging.log("{0} total thumbs cleaned up.".format(str(len(images))))
+        size = _compact_textures(textdb, dbfile)
+    finally:
+        textdb.close()
+
+    yield 0, size
+    for count, size in _iter_remove_thumbs(images):
+        yield count, size
+
+
+def old_thumbs():
+    count = 0
+    size = 0
+    for removed, freed in iter_old_thumbs():
+        count += removed
+        size += freed
+
     removed = tools.convert_size(size)
-    if len(images) > 0:
+    logging.log("Clear Thumbs: removed {0} files, reclaimed {1} bytes".format(count, size))
+    if count > 0:
         logging.log_notify(CONFIG.ADDONTITLE,
-                           '[COLOR {0}]Clear Thumbs: {1} Files / {2} MB[/COLOR]!'.format(CONFIG.COLOR2, str(len(images)), removed))
+                           '[COLOR {0}]Clear Thumbs: {1} Files / {2}[/COLOR]!'.format(CONFIG.COLOR2, str(count), removed))
     else:
         logging.log_notify(CONFIG.ADDONTITLE,
                            '[COLOR {0}]Clear Thumbs: None Found![/COLOR]'.format(CONFIG.COLOR2))
 
 
+def _scan_thumbs(files):
+    # Fills files with {cachedurl: (size, mtime)} of every file in the
+    # texture cache, which Kodi keeps in the folders 0-f, yielding after each
+    # of them. Other folders (Video/Bookmarks) are not tracked in the
+    # Textures database.
+    if not os.path.isdir(CONFIG.THUMBNAILS):
+        return
+    for folder in os.scandir(CONFIG.THUMBNAILS):
+        if len(folder.name) != 1 or not folder.is_dir():
+            continue
+        stack = [folder.path]
+        while stack:
+            for entry in os.scandir(stack.pop()):
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    name = os.path.relpath(entry.path, CONFIG.THUMBNAILS).replace(os.sep, '/')
+                    files[name] = (stat.st_size, stat.st_mtime)
+        yield
+
+
+def thumbs_quota_size():
+    try:
+        return THUMB_QUOTAS[int(CONFIG.THUMBSQUOTA)] * 1024 * 1024
+    except (ValueError, IndexError, TypeError):
+        return 0
+
+
+def iter_trim_thumbs(quota=None):
+    """Removes orphaned thumbnails, then the least recently used ones until
+    the texture cache fits in quota bytes (the thumbsquota setting if None).
+
+    Orphans are files with no texture row, and rows whose file is gone.
+    Yields (files removed, bytes freed) as it goes.
+    """
+    if quota is None:
+        quota = thumbs_quota_size()
+
+    files = {}
+    for _ in _scan_thumbs(files):
+        yield 0, 0
+
+    dbfile, textdb = _open_textures()
+    if textdb is None:
+        return
+    try:
+        textexe = textdb.cursor()
+        # Never used textures sort first, they have no sizes row
+        textexe.execute("SELECT texture.id, texture.cachedurl, MAX(sizes.lastusetime) FROM texture "
+                        "LEFT JOIN sizes ON sizes.idtexture = texture.id GROUP BY texture.id")
+        rows = textexe.fetchall()
+        textexe.close()
+
+        known = set(row[1] for row in rows)
+        # Kodi writes a file just before adding its row, leave fresh ones be
+        recent = time.time() - 3600
+        orphan_files = [name for name in set(files) - known if files[name][1] < recent]
+        orphan_rows = [row[0] for row in rows if row[1] not in files]
+
+        evict = []
+        used = sum(files[row[1]][0] for row in rows if row[1] in files)
+        if quota and used > quota:
+            # Trim below the quota, so it does not run again after every
+            # few new thumbnails
+            target = quota * THUMB_QUOTA_LOW
+            for id, cachedurl, lastuse in sorted((row for row in rows if row[1] in files), key=lambda row: row[2] or ''):
+                if used <= target:
+                    break
+                evict.append((id, cachedurl))
+                used -= files[cachedurl][0]
+
+        logging.log("Trim Thumbs: {0} orphaned files, {1} orphaned rows, {2} evicted for a {3} quota".format(
+            len(orphan_files), len(orphan_rows), len(evict), tools.convert_size(quota)))
+
+        images = _delete_textures(textdb, orphan_rows + [id for id, cachedurl in evict])
+        size = _compact_textures(textdb, dbfile)
+    finally:
+        textdb.close()
+
+    yield 0, size
+    for count, size in _iter_remove_thumbs([image for image in images if image in files] + orphan_files):
+        yield count, size
+    logging.log("Trim Thumbs: {0} in use".format(tools.convert_size(used)))
+
+
+def trim_thumbs(quota=None, notify=True):
+    count = 0
+    size = 0
+    for removed, freed in iter_trim_thumbs(quota):
+        count += removed
+        size += freed
+
+    logging.log("Trim Thumbs: removed {0} files, reclaimed {1} bytes".format(count, size))
+    if notify:
+        logging.log_notify(CONFIG.ADDONTITLE,
+                           '[COLOR {0}]Trim Thumbs: {1} Files / {2}[/COLOR]'.format(CONFIG.COLOR2, count, tools.convert_size(size)))
+
+
 def clear_crash():
     files = []
     for file in glob.glob(os.path.join(CONFIG.LOGPATH, '*crashlog*.*')):
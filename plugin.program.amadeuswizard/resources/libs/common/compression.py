@@ -0,0 +1,122 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+# How each file goes into a backup or build ZIP. Shared by the add-on and the
+# scripts/ that build releases, so this module must not import xbmc.
+#
+# Deflating artwork, archives and other already compressed files costs CPU
+# when zipping and again when extracting, for next to no saving. Those are
+# STORED, which extraction copies as is.
+
+import math
+import os
+import zipfile
+import zlib
+
+# Already compressed formats
+STORE_EXTENSIONS = frozenset([
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.tbn',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.apk', '.whl',
+    '.mp3', '.mp4', '.m4a', '.aac', '.ogg', '.flac', '.mkv', '.avi', '.webm',
+    '.woff', '.woff2', '.xbt'])
+# Text and other formats known to compress well
+DEFLATE_EXTENSIONS = frozenset([
+    '.xml', '.py', '.txt', '.json', '.po', '.md', '.html', '.htm', '.css',
+    '.js', '.nfo', '.csv', '.log', '.ini', '.cfg', '.svg', '.ttf', '.otf',
+    '.so', '.dll', '.pyd'])
+DATABASE_EXTENSIONS = frozenset(['.db', '.sqlite', '.sqlite3'])
+
+DEFAULT_LEVEL = zlib.Z_DEFAULT_COMPRESSION
+# Databases above DB_SIZE are mostly free pages and repeated structure, a
+# fast level gets nearly all of the saving
+DB_SIZE = 1024 * 1024
+DB_LEVEL = 1
+# Unknown types are sampled; above ENTROPY_LIMIT bits per byte the content is
+# taken to be compressed already
+SAMPLE_SIZE = 64 * 1024
+MIN_SAMPLE = 512
+ENTROPY_LIMIT = 7.5
+
+
+def entropy(data):
+    """Shannon entropy of data in bits per byte."""
+    if not data:
+        return 0.0
+    total = float(len(data))
+    result = 0.0
+    for value in range(256):
+        count = data.count(bytes((value, )))
+        if count:
+            p = count / total
+            result -= p * math.log(p, 2)
+    return result
+
+
+class CompressionPolicy:
+    """Picks (compress_type, compresslevel) for a ZIP member.
+
+    Decided by extension where it tells, otherwise by the entropy of a
+    sample of the content.
+    """
+
+    def __init__(self, db_level=DB_LEVEL, level=DEFAULT_LEVEL):
+        self.db_level = db_level
+        self.level = level
+
+    def _by_name(self, name, size):
+        ext = os.path.splitext(name)[1].lower()
+        if ext in STORE_EXTENSIONS:
+            return zipfile.ZIP_STORED, None
+        if ext in DEFLATE_EXTENSIONS:
+            return zipfile.ZIP_DEFLATED, self.level
+        if ext in DATABASE_EXTENSIONS:
+            return zipfile.ZIP_DEFLATED, self.db_level if size > DB_SIZE else self.level
+        return None
+
+    def _by_sample(self, sample):
+        if len(sample) >= MIN_SAMPLE and entropy(sample) > ENTROPY_LIMIT:
+            return zipfile.ZIP_STORED, None
+        return zipfile.ZIP_DEFLATED, self.level
+
+    def for_file(self, path):
+        size = os.path.getsize(path)
+        choice = self._by_name(path, size)
+        if choice is None:
+            with open(path, 'rb') as f:
+                choice = self._by_sample(f.read(SAMPLE_SIZE))
+        return choice
+
+    def for_data(self, name, data):
+        return self._by_name(name, len(data)) or self._by_sample(data[:SAMPLE_SIZE])
+
+
+POLICY = CompressionPolicy()
+
+
+def write(zipf, path, arcname=None, policy=None):
+    """ZipFile.write() with the compression the policy picks for path."""
+    compress_type, level = (policy or POLICY).for_file(path)
+    zipf.write(path, arcname, compress_type, level)
+
+
+def writestr(zipf, arcname, data, policy=None):
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    compress_type, level = (policy or POLICY).for_data(arcname, data)
+    zipf.writestr(arcname, data, compress_type, level)
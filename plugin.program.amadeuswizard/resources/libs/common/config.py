@@ -22,20 +22,131 @@ import xbmcaddon
 import xbmcvfs
 
 import os
+import threading
+import time
+
+from contextlib import contextmanager
 
 import uservar
 
+# Settings changes notified within this many seconds of one of our own writes
+# are taken to be that write
+OWN_WRITE_WINDOW = 2.0
+
 
 class Config:
+    # Settings backed attributes, read from the snapshot on first access
+    SETTINGS = {
+        'FIRSTRUN': 'first_install',
+
+        # Build variables
+        'BUILDNAME': 'buildname',
+        'BUILDCHECK': 'nextbuildcheck',
+        'DEFAULTSKIN': 'defaultskin',
+        'DEFAULTNAME': 'defaultskinname',
+        'DEFAULTIGNORE': 'defaultskinignore',
+        'BUILDVERSION': 'buildversion',
+        'BUILDTHEME': 'buildtheme',
+        'BUILDLATEST': 'latestversion',
+        # 'DISABLEUPDATE': 'disableupdate',
+        'INSTALLED': 'installed',
+        'EXTRACT': 'extract',
+        'EXTERROR': 'errors',
+        'STREAMINSTALL': 'streaminstall',
+        'PACKAGECACHESIZE': 'packagecachesize',
+
+        # View variables
+        'SHOW20': 'show20',
+        'SHOW21': 'show21',
+        'SHOWADULT': 'adult',
+        'SEPARATE': 'separate',
+        'DEVELOPER': 'developer',
+
+        # Auto-Clean variables
+        'AUTOCLEANUP': 'autoclean',
+        'AUTOCACHE': 'clearcache',
+        'AUTOPACKAGES': 'clearpackages',
+        'AUTOTHUMBS': 'clearthumbs',
+        'THUMBSVACUUM': 'thumbsvacuum',
+        'THUMBSQUOTA': 'thumbsquota',
+        'AUTONEXTRUN': 'nextautocleanup',
+
+        # KODI-RD-IL - Auto force addon updates on Kodi startup
+        'FORCEUPDATEFAST_ONSTARTUP': 'forceupdateFAST_on_startup',
+        'FORCEUPDATEFAST_ONSTARTUP_NOTIFY': 'forceupdateFAST_on_startup_notify',
+
+        # Video Cache variables
+        'INCLUDEVIDEO': 'includevideo',
+        'INCLUDEALL': 'includeall',
+        'INCLUDEEXODUSREDUX': 'includeexodusredux',
+        'INCLUDEGAIA': 'includegaia',
+        'INCLUDESEREN': 'includeseren',
+        'INCLUDETHECREW': 'includethecrew',
+        'INCLUDEYODA': 'includeyoda',
+        'INCLUDEVENOM': 'includevenom',
+        'INCLUDENUMBERS': 'includenumbers',
+        'INCLUDESCRUBS': 'includescrubs',
+
+        # Notification variables
+        'NOTIFY': 'notify',
+        'NOTEID': 'noteid',
+        'NOTEDISMISS': 'notedismiss',
+
+        #########################################################################################################
+        # KODI-RD-IL - AUTO QUICK UPDATES
+        'QUICK_UPDATE_NOTEID': 'quick_update_noteid',
+        'QUICK_UPDATE_NOTEDISMISS': 'quick_update_notedismiss',
+        #########################################################################################################
+
+        # Save Data variables
+        # 'USE_GITHUB_CUSTOM_SAVE_DATA_CONFIG': 'use_github_custom_save_data_config',
+        'TRAKTSAVE': 'traktnextsave',
+        'DEBRIDSAVE': 'debridnextsave',
+        'LOGINSAVE': 'loginnextsave',
+        'KEEPFAVS': 'keepfavourites',
+        'KEEPFENDATA': 'keepfendata',
+        'KEEPTWILIGHTDATA': 'keeptwilightdata',
+        'KEEPFENTASTICDATA': 'keepfentasticdata',
+        'KEEPSOURCES': 'keepsources',
+        'KEEPPROFILES': 'keepprofiles',
+        'KEEPPLAYERCORE': 'keepplayercore',
+        'KEEPADVANCED': 'keepadvanced',
+        'KEEPGUISETTINGS': 'keepguisettings',
+        'KEEPREPOS': 'keeprepos',
+        'KEEPSUPER': 'keepsuper',
+        'KEEPWHITELIST': 'keepwhitelist',
+        'KEEPADDONS33DB': 'keepaddons33db',
+        'KEEPTRAKT': 'keeptrakt',
+        'KEEPDEBRID': 'keepdebrid',
+        'KEEPLOGIN': 'keeplogin',
+
+        # Logging variables
+        'DEBUGLEVEL': 'debuglevel',
+        'ENABLEWIZLOG': 'wizardlog',
+        'CLEANWIZLOG': 'autocleanwiz',
+        'CLEANWIZLOGBY': 'wizlogcleanby',
+        'CLEANDAYS': 'wizlogcleandays',
+        'CLEANSIZE': 'wizlogcleansize',
+        'CLEANLINES': 'wizlogcleanlines',
+        'LOGEMAIL': 'email',
+        'NEXTCLEANDATE': 'nextwizcleandate',
+    }
+
     def __init__(self):
+        self._settings = {}
+        self._pending = {}
+        self._batch = 0
+        self._lock = threading.RLock()
+        self._written = 0
+
         self.init_meta()
         self.init_uservars()
         self.init_paths()
         self.init_settings()
 
     def init_meta(self):
-        self.ADDON_ID = xbmcaddon.Addon().getAddonInfo('id')
-        self.ADDON = xbmcaddon.Addon(self.ADDON_ID)
+        self.ADDON = xbmcaddon.Addon()
+        self.ADDON_ID = self.ADDON.getAddonInfo('id')
         self.ADDON_NAME = self.ADDON.getAddonInfo('name')
         self.ADDON_VERSION = self.ADDON.getAddonInfo('version')
         self.ADDON_PATH = self.ADDON.getAddonInfo('path')
@@ -189,6 +300,8 @@ class Config:
         self.QRCODES = os.path.join(self.PLUGIN_DATA, 'QRCodes')
         self.SPEEDTEST = os.path.join(self.PLUGIN_DATA, 'SpeedTest')
         self.ARCHIVE_CACHE = os.path.join(self.TEMP, 'archive_cache')
+        # Kept under the master profile so every profile shares it
+        self.PACKAGE_CACHE = os.path.join(self.HOME, 'userdata', 'addon_data', self.ADDON_ID, 'package_cache')
         self.ART = os.path.join(self.PLUGIN, 'resources', 'art')
         self.CUSTOM_ART = os.path.join(self.PLUGIN, 'resources', 'AMADEUS_art')
         self.DEBRIDFOLD = os.path.join(self.PLUGIN_DATA, 'debrid')
@@ -218,119 +331,105 @@ class Config:
                              os.path.join(self.USERDATA, 'library')]
 
     def init_settings(self):
-        self.FIRSTRUN = self.get_setting('first_install')
-
-        # Build variables
-        self.BUILDNAME = self.get_setting('buildname')
-        self.BUILDCHECK = self.get_setting('nextbuildcheck')
-        self.DEFAULTSKIN = self.get_setting('defaultskin')
-        self.DEFAULTNAME = self.get_setting('defaultskinname')
-        self.DEFAULTIGNORE = self.get_setting('defaultskinignore')
-        self.BUILDVERSION = self.get_setting('buildversion')
-        self.BUILDTHEME = self.get_setting('buildtheme')
-        self.BUILDLATEST = self.get_setting('latestversion')
-        # self.DISABLEUPDATE = self.get_setting('disableupdate')
-        self.INSTALLED = self.get_setting('installed')
-        self.EXTRACT = self.get_setting('extract')
-        self.EXTERROR = self.get_setting('errors')
-        
-        # View variables
-        self.SHOW20 = self.get_setting('show20')
-        self.SHOW21 = self.get_setting('show21')
-        self.SHOWADULT = self.get_setting('adult')
-        self.SEPARATE = self.get_setting('separate')
-        self.DEVELOPER = self.get_setting('developer')
-        
-        # Auto-Clean variables
-        self.AUTOCLEANUP = self.get_setting('autoclean')
-        self.AUTOCACHE = self.get_setting('clearcache')
-        self.AUTOPACKAGES = self.get_setting('clearpackages')
-        self.AUTOTHUMBS = self.get_setting('clearthumbs')
-        self.AUTOFREQ = self.get_setting('autocleanfreq')
-        self.AUTOFREQ = int(float(self.AUTOFREQ)) if self.AUTOFREQ.isdigit() else 0
-        self.AUTONEXTRUN = self.get_setting('nextautocleanup')
-        
-        # KODI-RD-IL - Auto force addon updates on Kodi startup
-        self.FORCEUPDATEFAST_ONSTARTUP = self.get_setting('forceupdateFAST_on_startup')
-        self.FORCEUPDATEFAST_ONSTARTUP_NOTIFY = self.get_setting('forceupdateFAST_on_startup_notify')
-        
-        # Video Cache variables
-        self.INCLUDEVIDEO = self.get_setting('includevideo')
-        self.INCLUDEALL = self.get_setting('includeall')
-        self.INCLUDEEXODUSREDUX = self.get_setting('includeexodusredux')
-        self.INCLUDEGAIA = self.get_setting('includegaia')
-        self.INCLUDESEREN = self.get_setting('includeseren')
-        self.INCLUDETHECREW = self.get_setting('includethecrew')
-        self.INCLUDEYODA = self.get_setting('includeyoda')
-        self.INCLUDEVENOM = self.get_setting('includevenom')
-        self.INCLUDENUMBERS = self.get_setting('includenumbers')
-        self.INCLUDESCRUBS = self.get_setting('includescrubs')
-        
-        # Notification variables
-        self.NOTIFY = self.get_setting('notify')
-        self.NOTEID = self.get_setting('noteid')
-        self.NOTEDISMISS = self.get_setting('notedismiss')
-        
-        #########################################################################################################
-        # KODI-RD-IL - AUTO QUICK UPDATES
-        self.QUICK_UPDATE_NOTEID = self.get_setting('quick_update_noteid')
-        self.QUICK_UPDATE_NOTEDISMISS = self.get_setting('quick_update_notedismiss')
-        #########################################################################################################
-        
-        # Save Data variables
-        # self.USE_GITHUB_CUSTOM_SAVE_DATA_CONFIG = self.get_setting('use_github_custom_save_data_config')
-        self.TRAKTSAVE = self.get_setting('traktnextsave')
-        self.DEBRIDSAVE = self.get_setting('debridnextsave')
-        self.LOGINSAVE = self.get_setting('loginnextsave')
-        self.KEEPFAVS = self.get_setting('keepfavourites')
-        self.KEEPFENDATA = self.get_setting('keepfendata')
-        self.KEEPTWILIGHTDATA = self.get_setting('keeptwilightdata')
-        self.KEEPFENTASTICDATA = self.get_setting('keepfentasticdata')
-        self.KEEPSOURCES = self.get_setting('keepsources')
-        self.KEEPPROFILES = self.get_setting('keepprofiles')
-        self.KEEPPLAYERCORE = self.get_setting('keepplayercore')
-        self.KEEPADVANCED = self.get_setting('keepadvanced')
-        self.KEEPGUISETTINGS = self.get_setting('keepguisettings')
-        self.KEEPREPOS = self.get_setting('keeprepos')
-        self.KEEPSUPER = self.get_setting('keepsuper')
-        self.KEEPWHITELIST = self.get_setting('keepwhitelist')
-        self.KEEPADDONS33DB = self.get_setting('keepaddons33db')
-        self.KEEPTRAKT = self.get_setting('keeptrakt')
-        self.KEEPDEBRID = self.get_setting('keepdebrid')
-        self.KEEPLOGIN = self.get_setting('keeplogin')
+        # Derived values, everything else in SETTINGS is read lazily
+        autofreq = self.get_setting('autocleanfreq')
+        self.AUTOFREQ = int(float(autofreq)) if autofreq.isdigit() else 0
 
         # Backup variables
         self.BACKUPLOCATION = xbmcvfs.translatePath(self.get_setting('path') if not self.get_setting('path') == '' else self.HOME)
         self.MYBUILDS = os.path.join(self.BACKUPLOCATION, 'My_Builds')
 
         # Logging variables
-        self.DEBUGLEVEL = self.get_setting('debuglevel')
-        self.ENABLEWIZLOG = self.get_setting('wizardlog')
-        self.CLEANWIZLOG = self.get_setting('autocleanwiz')
-        self.CLEANWIZLOGBY = self.get_setting('wizlogcleanby')
-        self.CLEANDAYS = self.get_setting('wizlogcleandays')
-        self.CLEANSIZE = self.get_setting('wizlogcleansize')
-        self.CLEANLINES = self.get_setting('wizlogcleanlines')
         self.MAXWIZSIZE = [100, 200, 300, 400, 500, 1000]
         self.MAXWIZLINES = [100, 200, 300, 400, 500]
         self.MAXWIZDATES = [1, 2, 3, 7]
         self.KEEPOLDLOG = self.get_setting('oldlog') == 'true'
         self.KEEPWIZLOG = self.get_setting('wizlog') == 'true'
         self.KEEPCRASHLOG = self.get_setting('crashlog') == 'true'
-        self.LOGEMAIL = self.get_setting('email')
-        self.NEXTCLEANDATE = self.get_setting('nextwizcleandate')
 
-    def get_setting(self, key, id=xbmcaddon.Addon().getAddonInfo('id')):
+    def __getattr__(self, name):
+        # Only reached for attributes that were never assigned
+        key = Config.SETTINGS.get(name)
+        if key is None:
+            raise AttributeError(name)
+        return self.get_setting(key)
+
+    def reload(self):
+        # Drops the snapshot, e.g. after the settings dialog was closed
+        with self._lock:
+            self.flush()
+            self.ADDON = xbmcaddon.Addon(self.ADDON_ID)
+            self._settings = {}
+            self.init_settings()
+
+    def settings_changed(self):
+        # For Monitor.onSettingsChanged, which also fires for our own
+        # set_setting() and flush() writes; the snapshot has those already
+        with self._lock:
+            if time.time() - self._written < OWN_WRITE_WINDOW:
+                return False
+            self.reload()
+            return True
+
+    def _write(self, key, value):
+        self._written = time.time()
+        return self.ADDON.setSetting(key, value)
+
+    def get_setting(self, key, id=None):
+        if id is not None and id != self.ADDON_ID:
+            try:
+                return xbmcaddon.Addon(id).getSetting(key)
+            except:
+                return False
+
+        with self._lock:
+            if key not in self._settings:
+                try:
+                    self._settings[key] = self.ADDON.getSetting(key)
+                except:
+                    return False
+            return self._settings[key]
+
+    def set_setting(self, key, value, id=None):
+        if id is not None and id != self.ADDON_ID:
+            try:
+                return xbmcaddon.Addon(id).setSetting(key, value)
+            except:
+                return False
+
+        with self._lock:
+            self._settings[key] = value
+            if self._batch:
+                self._pending[key] = value
+                return True
         try:
-            return xbmcaddon.Addon(id).getSetting(key)
+            return self._write(key, value)
         except:
             return False
 
-    def set_setting(self, key, value, id=xbmcaddon.Addon().getAddonInfo('id')):
+    @contextmanager
+    def batch(self):
+        # Coalesces set_setting() calls into one flush when the block exits
+        with self._lock:
+            self._batch += 1
         try:
-            return xbmcaddon.Addon(id).setSetting(key, value)
-        except:
-            return False
+            yield self
+        finally:
+            with self._lock:
+                self._batch -= 1
+                done = self._batch == 0
+            if done:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        for key, value in pending.items():
+            try:
+                self._write(key, value)
+            except:
+                pass
 
     def open_settings(self, id=None, cat=None, set=None, activate=False):
         offset = [(100,  200), (-100, -80)]
@@ -339,6 +438,8 @@ class Config:
 
         try:
             xbmcaddon.Addon(id).openSettings()
+            if id == self.ADDON_ID:
+                self.reload()
         except:
             import logging
             logging.log('Cannot open settings for {}'.format(id), level=xbmc.LOGERROR)
@@ -369,6 +470,10 @@ class Config:
                     'default.skincolors', 'default.skintheme',
                     'default.skinzoom', 'default.soundskin',
                     'default.startupwindow', 'default.stereostrength']
+        with self.batch():
+            self._clear_setting(type, build, install, default, lookfeel)
+
+    def _clear_setting(self, type, build, install, default, lookfeel):
         if type == 'build':
             for element in build:
                 self.set_setting(element, build[element])
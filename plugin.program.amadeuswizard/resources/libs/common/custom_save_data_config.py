@@ -26,21 +26,46 @@ custom_save_data_config_github_url = "https://raw.githubusercontent.com/jacquely
 build_addons_whitelist_github_url = "https://raw.githubusercontent.com/jacquelynnale/Amadeus/main/wizard/assets/custom_save_data_config/build_addons_whitelist.txt"
 build_addons_blacklist_github_url = "https://raw.githubusercontent.com/jacquelynnale/Amadeus/main/wizard/assets/custom_save_data_config/build_addons_blacklist.txt"
 
-# Load the configuration from the JSON file (with timeout and error handling)
-try:
-    with urllib.request.urlopen(custom_save_data_config_github_url, context=context, timeout=10) as response:
-        custom_save_data_config = json.loads(response.read().decode('utf-8'))
-except Exception as e:
-    logging.log("custom_save_data_config.py | Failed to load config from GitHub: " + str(e), level=xbmc.LOGWARNING)
-    custom_save_data_config = {'USE_JSON_FILE': 'false'}  # Default to disabled
-    
-# Log JSON
-logging.log("custom_save_data_config.py | custom_save_data_config.json: " + str(custom_save_data_config), level=xbmc.LOGINFO)
+_custom_save_data_config = None
+
+
+def load_custom_save_data_config():
+    # Fetched on first use rather than at import, so importing this module stays cheap
+    global _custom_save_data_config
+    if _custom_save_data_config is not None:
+        return _custom_save_data_config
+
+    # Load the configuration from the JSON file (with timeout and error handling)
+    try:
+        with urllib.request.urlopen(custom_save_data_config_github_url, context=context, timeout=10) as response:
+            config = json.loads(response.read().decode('utf-8'))
+    except Exception as e:
+        logging.log("custom_save_data_config.py | Failed to load config from GitHub: " + str(e), level=xbmc.LOGWARNING)
+        config = {'USE_JSON_FILE': 'false'}  # Default to disabled
+
+    # Log JSON
+    logging.log("custom_save_data_config.py | custom_save_data_config.json: " + str(config), level=xbmc.LOGINFO)
+
+    _custom_save_data_config = config
+    return config
+
+
+def use_json_file():
+    # set USE_JSON_FILE from JSON file.
+    return str(load_custom_save_data_config().get('USE_JSON_FILE', 'false')).lower()
+
+
+def __getattr__(name):
+    # Keeps the old module level names working without fetching at import
+    if name == 'custom_save_data_config':
+        return load_custom_save_data_config()
+    if name == 'USE_JSON_FILE':
+        return use_json_file()
+    raise AttributeError(name)
 
-# set USE_JSON_FILE from JSON file.
-USE_JSON_FILE = str(custom_save_data_config.get('USE_JSON_FILE', 'false')).lower()
 
 def set_custom_save_data_variables_from_github():
+    custom_save_data_config = load_custom_save_data_config()
 
     # Override the variables based on the configuration
     CONFIG.KEEPTRAKT = str(custom_save_data_config.get('CONFIG.KEEPTRAKT', CONFIG.KEEPTRAKT)).lower() if 'CONFIG.KEEPTRAKT' in custom_save_data_config else CONFIG.KEEPTRAKT
@@ -62,6 +87,7 @@ def set_custom_save_data_variables_from_github():
 
 
 def set_addons_whitelist_from_github():
+    custom_save_data_config = load_custom_save_data_config()
 
     # Override CONFIG.KEEPWHITELIST from JSON file.
     CONFIG.KEEPWHITELIST = str(custom_save_data_config.get('CONFIG.KEEPWHITELIST', CONFIG.KEEPWHITELIST)).lower() if 'CONFIG.KEEPWHITELIST' in custom_save_data_config else CONFIG.KEEPWHITELIST
@@ -184,6 +210,8 @@ def delete_addons_whitelist_file():
 
 # Main
 def main():
+    USE_JSON_FILE = use_json_file()
+
     # Exit if USE_JSON_FILE is false.
     if USE_JSON_FILE == 'false':
         logging.log("custom_save_data_config.py | USE_JSON_FILE is: " + USE_JSON_FILE + ". Exiting custom_save_data_config.py..", level=xbmc.LOGINFO)
@@ -0,0 +1,172 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import hashlib
+import json
+import os
+import re
+import time
+
+from resources.libs.common.config import CONFIG
+
+INDEX_FILE = os.path.join(CONFIG.PLUGIN_DATA, 'log_errors.json')
+START = '-->Python callback/script returned the following error<--'
+END = '-->End of Python script error report<--'
+# Latest error texts kept per log, besides the last one of each signature;
+# counts cover every error
+MAX_ERRORS = 20
+MAX_FIRST_LINE = 1024
+MAX_SESSIONS = 4
+
+ADDON_PATH = re.compile(r'addons[\\/]+([^\\/]+)[\\/]')
+SCRIPT_FILE = re.compile(r'File "([^"]+)"')
+ERROR_TYPE = re.compile(r"Error Type: <(?:class|type) '([^']+)'>")
+
+
+def _identity(path):
+    # Kodi starts every log with a timestamped line, so the first line tells
+    # sessions apart and follows kodi.log when it is renamed to kodi.old.log
+    with open(path, 'rb') as f:
+        first = f.readline(MAX_FIRST_LINE)
+    if not first.endswith(b'\n'):
+        return None
+    return hashlib.sha1(first).hexdigest()
+
+
+def signature(error):
+    """(addon, module, exception type) an error report came from."""
+    addons = ADDON_PATH.findall(error)
+    files = SCRIPT_FILE.findall(error)
+    kind = ERROR_TYPE.search(error)
+    return ' | '.join([addons[-1] if addons else 'kodi',
+                       os.path.basename(files[-1].replace('\\', '/')) if files else '?',
+                       kind.group(1) if kind else '?'])
+
+
+def _new_state():
+    return {'offset': 0, 'total': 0, 'errors': [], 'last': None, 'signatures': {}}
+
+
+def _add(state, error):
+    state['total'] += 1
+    state['errors'].append(error)
+    if len(state['errors']) > MAX_ERRORS:
+        del state['errors'][0]
+    state['last'] = error
+
+    sig = state['signatures'].setdefault(signature(error), {'count': 0, 'last': None})
+    sig['count'] += 1
+    sig['last'] = error
+
+
+def _scan(path, state):
+    # Streams the log from the checkpoint. A report still being written when
+    # the file ends is read again from its first line on the next scan.
+    with open(path, 'rb') as f:
+        f.seek(state['offset'])
+        offset = state['offset']
+        block = None
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break
+            offset += len(raw)
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+
+            while True:
+                if block is None:
+                    start = line.find(START)
+                    if start == -1:
+                        break
+                    block = []
+                    line = line[start + len(START):]
+                end = line.find(END)
+                if end == -1:
+                    block.append(line)
+                    break
+                block.append(line[:end])
+                _add(state, '[CR]'.join(block))
+                block = None
+                line = line[end + len(END):]
+
+            if block is None:
+                state['offset'] = offset
+
+
+class ErrorIndex:
+    """Python error reports found in Kodi logs, kept between runs.
+
+    Each log is only read from where the last scan stopped. Results are
+    stored per log session, with a count per (addon, module, exception type)
+    signature and the most recent error for a quick "last error" lookup.
+    """
+
+    def __init__(self, index_file=INDEX_FILE):
+        self.index_file = index_file
+        self.sessions = self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                return json.load(f).get('sessions', {})
+        except:
+            return {}
+
+    def _save(self):
+        try:
+            folder = os.path.dirname(self.index_file)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            tmp = '{0}.tmp'.format(self.index_file)
+            with open(tmp, 'w') as f:
+                json.dump({'sessions': self.sessions}, f)
+            os.replace(tmp, self.index_file)
+        except:
+            pass
+
+    def update(self, paths):
+        """Scans new content of each log. Returns their states in order."""
+        states = []
+        changed = False
+        for path in paths:
+            try:
+                identity = _identity(path)
+                state = self.sessions.get(identity) if identity else None
+                if state is None or os.path.getsize(path) < state['offset']:
+                    state = _new_state()
+                    changed = True
+                offset = state['offset']
+                _scan(path, state)
+                changed = changed or state['offset'] != offset
+            except (IOError, OSError):
+                state = _new_state()
+                identity = None
+            if identity:
+                state['seen'] = time.time()
+                self.sessions[identity] = state
+            states.append(state)
+
+        # Kodi only keeps kodi.log and kodi.old.log around
+        if len(self.sessions) > MAX_SESSIONS:
+            recent = sorted(self.sessions.items(), key=lambda item: -item[1].get('seen', 0))
+            self.sessions = dict(recent[:MAX_SESSIONS])
+            changed = True
+        # Menus count errors on every render, only write when a log moved on
+        if changed:
+            self._save()
+        return states
@@ -0,0 +1,120 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+# Every menu click runs default.py in a fresh interpreter, so anything imported
+# at module level is paid for on every navigation. Modules only some routes
+# need should go through lazy_import().
+
+import os
+import sys
+import time
+
+try:  # Python 3
+    import builtins
+except ImportError:  # Python 2
+    import __builtin__ as builtins
+
+
+class LazyModule(object):
+    """Stands in for a module until one of its attributes is first used."""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            # __import__ rather than importlib, so ImportProfiler sees it
+            __import__(self._name)
+            module = self.__dict__['_module'] = sys.modules[self._name]
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        return '<lazy module {0}>'.format(self._name)
+
+
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+class ImportProfiler(object):
+    """Records how long each import statement takes while started.
+
+    Self time excludes the imports a module triggers itself; cumulative
+    time includes them. Imports of already loaded modules are left out.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._stack = []
+        self._original = None
+        self._started = 0
+
+    def start(self):
+        self._original = builtins.__import__
+        self._started = time.time()
+        builtins.__import__ = self._import
+
+    def stop(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        loaded = len(sys.modules)
+        self._stack.append(0.0)
+        start = time.time()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.time() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            if len(sys.modules) > loaded:
+                label = '.' * level + name
+                if level and globals and globals.get('__package__'):
+                    label = '{0}.{1}'.format(globals['__package__'].rsplit('.', level - 1)[0], name).rstrip('.')
+                if fromlist:
+                    label = '{0} ({1})'.format(label, ', '.join(fromlist))
+                self.records.append((label, elapsed - children, elapsed))
+
+    def report(self, path, title=''):
+        total = time.time() - self._started
+        lines = [title,
+                 'Total: {0:.1f} ms, {1} imports'.format(total * 1000, len(self.records)),
+                 '',
+                 '{0:>10} {1:>10}  {2}'.format('self ms', 'cumul ms', 'module')]
+        for label, own, cumulative in sorted(self.records, key=lambda record: -record[1]):
+            lines.append('{0:>10.1f} {1:>10.1f}  {2}'.format(own * 1000, cumulative * 1000, label))
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
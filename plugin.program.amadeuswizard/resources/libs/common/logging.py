@@ -21,8 +21,9 @@ import xbmc
 import xbmcgui
 import xbmcvfs
 
+import atexit
 import os
-import re
+import threading
 import time
 
 import _strptime
@@ -30,13 +31,6 @@ import _strptime
 from resources.libs.common import tools
 from resources.libs.common.config import CONFIG
 
-try:  # Python 3
-    from urllib.parse import urlencode
-    from urllib.request import FancyURLopener
-except ImportError:  # Python 2
-    from urllib import urlencode
-    from urllib import FancyURLopener
-
 
 URL = 'https://paste.ubuntu.com/'
 EXPIRATION = 2592000
@@ -44,6 +38,178 @@ REPLACES = (('//.+?:.+?@', '//USER:PASSWORD@'), ('<user>.+?</user>', '<user>USER
                                                                                             '<pass>PASSWORD</pass>'),)
 
 
+# wizard.log is buffered in memory and appended in one write per flush
+FLUSH_SIZE = 64 * 1024
+FLUSH_INTERVAL = 2.0
+# Segment size and count used when cleaning by days
+SEGMENT_SIZE = 512 * 1024
+MAX_SEGMENTS = 10
+
+
+class WizardLog:
+    """Buffered, size-rotated wizard.log.
+
+    Lines are appended in a single write once FLUSH_SIZE bytes or
+    FLUSH_INTERVAL seconds have built up, and at exit. Long running callers
+    call tick() regularly so a quiet log is still written out. When the current file
+    (CONFIG.WIZLOG) is full it becomes wizard.1.log, older segments move up
+    one number, and cleaning deletes whole segments instead of rewriting.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lines = []
+        self._size = 0
+        self._flushed = time.time()
+        self._lock = threading.RLock()
+        self._current_size = None
+        self._current_lines = None
+        self._clean_checked = False
+        atexit.register(self.flush)
+
+    def segment(self, number):
+        base, ext = os.path.splitext(self.path)
+        return '{0}.{1}{2}'.format(base, number, ext)
+
+    def segments(self):
+        """Rotated segments, newest first."""
+        found = []
+        while os.path.exists(self.segment(len(found) + 1)):
+            found.append(self.segment(len(found) + 1))
+        return found
+
+    def _limits(self):
+        # (max bytes, max lines, old segments kept) for the current file
+        if CONFIG.CLEANWIZLOG != 'true':
+            return None, None, None
+        if CONFIG.CLEANWIZLOGBY == '1':  # By Size
+            return CONFIG.MAXWIZSIZE[int(float(CONFIG.CLEANSIZE))] * 1024 // 2, None, 1
+        if CONFIG.CLEANWIZLOGBY == '2':  # By Lines
+            return None, CONFIG.MAXWIZLINES[int(float(CONFIG.CLEANLINES))] // 2, 1
+        return SEGMENT_SIZE, None, MAX_SEGMENTS  # By Days, see clean()
+
+    def write(self, line):
+        with self._lock:
+            if not self._clean_checked:
+                self._clean_checked = True
+                if CONFIG.CLEANWIZLOG == 'true' and time.mktime(time.strptime(CONFIG.NEXTCLEANDATE, "%Y-%m-%d %H:%M:%S")) <= tools.get_date():
+                    self.clean()
+            self._lines.append(line)
+            self._size += len(line)
+            if self._size >= FLUSH_SIZE or time.time() - self._flushed >= FLUSH_INTERVAL:
+                self.flush()
+
+    def tick(self):
+        with self._lock:
+            if self._lines and time.time() - self._flushed >= FLUSH_INTERVAL:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._lines:
+                return
+            lines = self._lines
+            self._lines = []
+            self._size = 0
+            self._flushed = time.time()
+            try:
+                self._append(lines)
+            except Exception as e:
+                xbmc.log('{0}: Unable to write {1}: {2}'.format(CONFIG.ADDONTITLE, self.path, e), xbmc.LOGERROR)
+
+    def _write(self, lines):
+        if lines:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(lines))
+
+    def _append(self, lines):
+        max_size, max_lines, keep = self._limits()
+        if self._current_size is None:
+            exists = os.path.exists(self.path)
+            self._current_size = os.path.getsize(self.path) if exists else 0
+            self._current_lines = 0
+            if max_lines and exists:
+                with open(self.path, 'rb') as f:
+                    self._current_lines = f.read().count(b'\n')
+
+        pending = []
+        for line in lines:
+            if (max_size and self._current_size >= max_size) or (max_lines and self._current_lines >= max_lines):
+                self._write(pending)
+                pending = []
+                self._rotate(keep)
+            pending.append(line)
+            self._current_size += len(line)
+            self._current_lines += 1
+        self._write(pending)
+
+    def _rotate(self, keep):
+        for number in range(len(self.segments()), 0, -1):
+            if number >= keep:
+                os.remove(self.segment(number))
+            else:
+                os.rename(self.segment(number), self.segment(number + 1))
+        if not os.path.exists(self.path):
+            pass
+        elif keep:
+            os.rename(self.path, self.segment(1))
+        else:
+            os.remove(self.path)
+        self._current_size = 0
+        self._current_lines = 0
+
+    def _started(self):
+        # Date of the first line of the current file, as logged
+        try:
+            with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+                return f.readline()[1:20]
+        except (IOError, OSError):
+            return ''
+
+    def clean(self):
+        # Size and line limits are applied on rotation, only days need a pass
+        if CONFIG.CLEANWIZLOGBY == '0':  # By Days
+            days = CONFIG.MAXWIZDATES[int(float(CONFIG.CLEANDAYS))]
+            keep = tools.get_date(days=-days)
+            with self._lock:
+                self.flush()
+                for path in self.segments():
+                    if os.path.getmtime(path) < keep:
+                        os.remove(path)
+                if os.path.exists(self.path):
+                    if os.path.getmtime(self.path) < keep:
+                        os.remove(self.path)
+                        self._current_size = None
+                    elif '' < self._started() < tools.get_date(days=-days, formatted=True):
+                        # Started before the cutoff: rotate it so it ages
+                        # out with the other segments
+                        self._rotate(MAX_SEGMENTS)
+        CONFIG.set_setting('nextwizcleandate', tools.get_date(days=1, formatted=True))
+
+    def read(self):
+        """The whole log, oldest segment first."""
+        self.flush()
+        content = ''
+        for path in reversed(self.segments() + [self.path]):
+            if os.path.exists(path):
+                content += tools.read_from_file(path)
+        return content
+
+    def clear(self):
+        with self._lock:
+            self._lines = []
+            self._size = 0
+            for path in self.segments() + [self.path]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._current_size = None
+
+
+WIZARD_LOG = WizardLog(CONFIG.WIZLOG)
+
+
 def log(msg, level=xbmc.LOGDEBUG):
     if CONFIG.DEBUGLEVEL == '0':  # No Logging
         return False
@@ -54,45 +220,8 @@ def log(msg, level=xbmc.LOGDEBUG):
     
     xbmc.log('{0}: {1}'.format(CONFIG.ADDONTITLE, msg), level)
     if CONFIG.ENABLEWIZLOG == 'true':
-        if not os.path.exists(CONFIG.WIZLOG):
-            with open(CONFIG.WIZLOG, 'w+') as f:
-                f.close()
-
-        lastcheck = CONFIG.NEXTCLEANDATE if not CONFIG.NEXTCLEANDATE == 0 else tools.get_date()
-        if CONFIG.CLEANWIZLOG == 'true' and time.mktime(time.strptime(lastcheck, "%Y-%m-%d %H:%M:%S")) <= tools.get_date():
-            check_log()
-
         line = "[{0}] {1}".format(tools.get_date(formatted=True), msg)
-        line = line.rstrip('\r\n') + '\n'
-        tools.write_to_file(CONFIG.WIZLOG, line, mode='a')
-
-
-def check_log():
-    next = tools.get_date(days=1, formatted=True)
-    lines = tools.read_from_file(CONFIG.WIZLOG).split('\n')
-
-    if CONFIG.CLEANWIZLOGBY == '0':  # By Days
-        keep = tools.get_date(days=-CONFIG.MAXWIZDATES[int(float(CONFIG.CLEANDAYS))])
-        x = 0
-        for line in lines:
-            if str(line[1:11]) >= str(keep):
-                break
-            x += 1
-        newfile = lines[x:]
-        tools.write_to_file(CONFIG.WIZLOG, '\n'.join(newfile))
-    elif CONFIG.CLEANWIZLOGBY == '1':  # By Size
-        maxsize = CONFIG.MAXWIZSIZE[int(float(CONFIG.CLEANSIZE))]*1024
-        if os.path.getsize(CONFIG.WIZLOG) >= maxsize:
-            start = int(len(lines)/2)
-            newfile = lines[start:]
-            tools.write_to_file(CONFIG.WIZLOG, '\n'.join(newfile))
-    elif CONFIG.CLEANWIZLOGBY == '2':  # By Lines
-        maxlines = CONFIG.MAXWIZLINES[int(float(CONFIG.CLEANLINES))]
-        if len(lines) > maxlines:
-            start = len(lines) - int(maxlines/2)
-            newfile = lines[start:]
-            tools.write_to_file(CONFIG.WIZLOG, '\n'.join(newfile))
-    CONFIG.set_setting('nextwizcleandate', next)
+        WIZARD_LOG.write(line.rstrip('\r\n') + '\n')
 
 
 def log_notify(title, message, times=2000, icon=CONFIG.ADDON_ICON, sound=False):
@@ -102,8 +231,9 @@ def log_notify(title, message, times=2000, icon=CONFIG.ADDON_ICON, sound=False):
 
 def grab_log(file=False, old=False, wizard=False):
     if wizard:
+        WIZARD_LOG.flush()
         if os.path.exists(CONFIG.WIZLOG):
-            return CONFIG.WIZLOG if file else tools.read_from_file(CONFIG.WIZLOG)
+            return CONFIG.WIZLOG if file else WIZARD_LOG.read()
         else:
             return False
                 
@@ -124,8 +254,29 @@ def grab_log(file=False, old=False, wizard=False):
         return False
 
 
+def log_files(path):
+    """Files making up the log at path, oldest first."""
+    if path == CONFIG.WIZLOG:
+        WIZARD_LOG.flush()
+        return list(reversed(WIZARD_LOG.segments())) + [path]
+    return [path]
+
+
 def upload_log():
+    from resources.libs.common import logupload
+
+    dialog = xbmcgui.Dialog()
+
     files = get_files()
+    if not files:
+        return
+    spans = [None, 10, 30, 60]
+    choice = dialog.select("{0}: Upload Logs".format(CONFIG.ADDONTITLE),
+                           ["Full log", "Last 10 minutes", "Last 30 minutes", "Last 60 minutes"])
+    if choice == -1:
+        return
+    minutes = spans[choice]
+
     for item in files:
         filetype = item[0]
         if filetype == 'log':
@@ -142,25 +293,21 @@ def upload_log():
         elif filetype == 'crashlog':
             name = "crash log"
             error = "Error posting the crashlog file"
-        succes, data = read_log(item[1])
+        # Crash logs have no timestamped lines to trim by
+        succes, result = logupload.upload(log_files(item[1]), name, None if filetype == 'crashlog' else minutes)
         if succes:
-            content = clean_log(data)
-            succes, result = post_log(content, name)
-            if succes:
-                msg = "Post this url or scan QRcode for your [COLOR {0}]{1}[/COLOR]," \
-                      "together with a description of the problem:[CR][COLOR {2}]{3}[/COLOR]".format(
-                    CONFIG.COLOR1, name, CONFIG.COLOR1, result)
-
-                # if len(self.email) > 5:
-                # em_result, em_msg = self.email_Log(self.email, result, name)
-                # if em_result == 'message':
-                # msg += "[CR]%s" % em_msg
-                # else:
-                # msg += "[CR]Email ERROR: %s" % em_msg
-
-                show_result(msg, result)
-            else:
-                show_result('{0}[CR]{1}'.format(error, result))
+            msg = "Post this url or scan QRcode for your [COLOR {0}]{1}[/COLOR]," \
+                  "together with a description of the problem:[CR][COLOR {2}]{3}[/COLOR]".format(
+                CONFIG.COLOR1, name, CONFIG.COLOR1, result)
+
+            # if len(self.email) > 5:
+            # em_result, em_msg = self.email_Log(self.email, result, name)
+            # if em_result == 'message':
+            # msg += "[CR]%s" % em_msg
+            # else:
+            # msg += "[CR]Email ERROR: %s" % em_msg
+
+            show_result(msg, result)
         else:
             show_result('{0}[CR]{1}'.format(error, result))
 
@@ -220,48 +367,6 @@ def get_files():
     return logfiles
 
 
-def read_log(path):
-    try:
-        lf = xbmcvfs.File(path)
-        content = lf.read()
-        if content:
-            return True, content
-        else:
-            log('file is empty')
-            return False, "File is Empty"
-    except Exception as e:
-        log('unable to read file: {0}'.format(e))
-        return False, "Unable to Read File"
-
-
-def clean_log(content):
-    for pattern, repl in REPLACES:
-        content = re.sub(pattern, repl, content)
-        return content
-
-
-def post_log(data, name):
-    params = {'poster': CONFIG.BUILDERNAME, 'content': data, 'syntax': 'text', 'expiration': 'week'}
-    params = urlencode(params)
-
-    try:
-        page = LogURLopener().open(URL, params)
-    except Exception as e:
-        a = 'failed to connect to the server'
-        log("{0}: {1}".format(a, str(e)), level=xbmc.LOGERROR)
-        return False, a
-
-    try:
-        page_url = page.url.strip()
-        # copy_to_clipboard(page_url)
-        log("URL for {0}: {1}".format(name, page_url))
-        return True, page_url
-    except Exception as e:
-        a = 'unable to retrieve the paste url'
-        log("{0}: {1}".format(a, str(e)), level=xbmc.LOGERROR)
-        return False, a
-
-
 # CURRENTLY NOT IN USE
 def copy_to_clipboard(txt):
     import subprocess
@@ -314,10 +419,6 @@ def copy_to_clipboard(txt):
         # return False, "Error Sending Email."
 
 
-class LogURLopener(FancyURLopener):
-    version = '{0}: {1}'.format(CONFIG.ADDON_ID, CONFIG.ADDON_VERSION)
-
-
 def show_result(message, url=None):
     from resources.libs.gui import window
 
@@ -353,7 +454,6 @@ def view_log_file():
     
     which = 0
     logtype = oldlog
-    msg = grab_log(old=True)
     
     if mainlog:
         choices.append(logfiles['mainlog'])
@@ -436,19 +536,14 @@ def _dialog_watch():
 
 
 def error_list(file):
-    errors = []
-    b = tools.read_from_file(file).replace('\n', '[CR]').replace('\r', '')
+    from resources.libs.common.errorscan import ErrorIndex
 
-    match = re.compile("-->Python callback/script returned the following error<--(.+?)-->End of Python script error report<--").findall(b)
-    for item in match:
-        errors.append(item)
-    return errors
+    return list(ErrorIndex().update([file])[0]['errors'])
 
 
 def error_checking(log=None, count=None, last=None):
-    errors = []
-    error1 = []
-    error2 = []
+    from resources.libs.common.errorscan import ErrorIndex
+
     if log is None:
         curr = grab_log(file=True)
         old = grab_log(file=True, old=True)
@@ -459,36 +554,42 @@ def error_checking(log=None, count=None, last=None):
                 return
             else:
                 return 0
-        if curr:
-            error1 = error_list(curr)
-        if old:
-            error2 = error_list(old)
-        if len(error2) > 0:
-            for item in error2:
-                errors = [item] + errors
-        if len(error1) > 0:
-            for item in error1:
-                errors = [item] + errors
+        logs = [path for path in (curr, old) if path]
     else:
-        error1 = error_list(log)
-        if len(error1) > 0:
-            for item in error1:
-                errors = [item] + errors
+        logs = [log]
+
+    # Newest first, current log before the old one
+    states = ErrorIndex().update(logs)
+    total = sum(state['total'] for state in states)
 
     if count is not None:
-        return len(errors)
-    elif len(errors) > 0:
+        return total
+    elif total > 0:
         from resources.libs.gui import window
         
         if last is None:
+            errors = []
+            signatures = {}
+            for state in states:
+                errors.extend(reversed(state['errors']))
+                for sig, info in state['signatures'].items():
+                    signatures[sig] = signatures.get(sig, 0) + info['count']
+
+            string = "[B]Errors by source (addon | file | type):[/B]\n"
+            for sig, found in sorted(signatures.items(), key=lambda item: -item[1]):
+                string += "{0}x {1}\n".format(found, sig)
+            string += "\n"
+            if total > len(errors):
+                string += "Showing the latest {0} of {1} errors\n\n".format(len(errors), total)
+
             i = 0
-            string = ''
             for item in errors:
                 i += 1
                 string += "[B][COLOR red]ERROR NUMBER {0}:[/B][/COLOR] {1}\n".format(str(i), item.replace(CONFIG.HOME, '/').replace('                                        ', ''))
             window.show_log_viewer("Viewing Errors in Log", string)
         else:
-            string = "[B][COLOR red]Last Error in Log:[/B][/COLOR] {0}\n".format(errors[0].replace(CONFIG.HOME, '/').replace('                                        ', ''))
+            latest = [state['last'] for state in states if state['last']][0]
+            string = "[B][COLOR red]Last Error in Log:[/B][/COLOR] {0}\n".format(latest.replace(CONFIG.HOME, '/').replace('                                        ', ''))
             window.show_log_viewer("Viewing Last Error in Log", string)
 
     else:
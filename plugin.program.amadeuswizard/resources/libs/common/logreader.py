@@ -0,0 +1,139 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import collections
+import mmap
+import os
+import re
+
+# How much of a log one page shows
+PAGE_SIZE = 256 * 1024
+BLOCK_SIZE = 64 * 1024
+MAX_RESULTS = 200
+
+
+class LogReader:
+    """Reads a log from its end, one page at a time.
+
+    `paths` are the files making up the log, oldest first (a single file, or
+    wizard.log with its rotated segments), and are treated as one stream.
+    Only the pages asked for are read, so opening a log costs the same no
+    matter how big it is.
+    """
+
+    def __init__(self, paths):
+        if not isinstance(paths, (list, tuple)):
+            paths = [paths]
+        self.paths = [path for path in paths if os.path.exists(path)]
+        self.sizes = [os.path.getsize(path) for path in self.paths]
+        # Position of the oldest line shown so far
+        self.index = len(self.paths) - 1
+        self.start = self.sizes[-1] if self.paths else 0
+
+    @property
+    def size(self):
+        return sum(self.sizes)
+
+    @property
+    def at_start(self):
+        return self.index <= 0 and self.start == 0
+
+    def _read_back(self, path, end, max_bytes, max_lines):
+        # Reads blocks backwards from end until enough is collected, then
+        # drops the partial line at the front
+        blocks = []
+        pos = end
+        size = 0
+        lines = 0
+        with open(path, 'rb') as f:
+            while pos > 0 and size < max_bytes and (max_lines is None or lines <= max_lines):
+                length = min(BLOCK_SIZE, pos, max_bytes - size)
+                pos -= length
+                f.seek(pos)
+                block = f.read(length)
+                blocks.append(block)
+                size += length
+                lines += block.count(b'\n')
+
+        data = b''.join(reversed(blocks))
+        if pos > 0:
+            cut = data.find(b'\n')
+            if cut == -1 or cut == len(data) - 1:
+                # A single line longer than the page, show it anyway
+                cut = -1
+            pos += cut + 1
+            data = data[cut + 1:]
+        if max_lines is not None:
+            lines = data.split(b'\n')
+            if len(lines) > max_lines + 1:
+                dropped = lines[:-(max_lines + 1)]
+                pos += sum(len(line) + 1 for line in dropped)
+                data = b'\n'.join(lines[-(max_lines + 1):])
+        return pos, data.decode('utf-8', 'replace')
+
+    def older(self, max_bytes=PAGE_SIZE, max_lines=None):
+        """The page before what has been read so far, or '' at the start."""
+        while self.start == 0 and self.index > 0:
+            self.index -= 1
+            self.start = self.sizes[self.index]
+        if not self.paths or self.start == 0:
+            return ''
+        self.start, text = self._read_back(self.paths[self.index], self.start, max_bytes, max_lines)
+        return text
+
+    def tail(self, max_bytes=PAGE_SIZE, max_lines=None):
+        """The last page of the log."""
+        self.index = len(self.paths) - 1
+        self.start = self.sizes[-1] if self.paths else 0
+        return self.older(max_bytes, max_lines)
+
+    def search(self, pattern, regex=False, ignore_case=True, max_results=MAX_RESULTS):
+        """Lines matching pattern across the whole log, newest last.
+
+        Files are memory mapped, so nothing is read into memory beyond the
+        matching lines. Only the last max_results matches are kept.
+        """
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        pattern = pattern.encode('utf-8')
+        matcher = re.compile(pattern if regex else re.escape(pattern), flags)
+
+        results = collections.deque(maxlen=max_results)
+        for path, size in zip(self.paths, self.sizes):
+            if size == 0:
+                continue
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                size = len(mapped)
+                try:
+                    pos = 0
+                    while True:
+                        match = matcher.search(mapped, pos)
+                        if not match:
+                            break
+                        start = mapped.rfind(b'\n', 0, match.start()) + 1
+                        end = mapped.find(b'\n', match.end())
+                        if end == -1:
+                            end = size
+                        results.append(mapped[start:end].decode('utf-8', 'replace').rstrip('\r'))
+                        pos = max(end + 1, match.end() + 1)
+                        if pos > size:
+                            break
+                finally:
+                    mapped.close()
+        return list(results)
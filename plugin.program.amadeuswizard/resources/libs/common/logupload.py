@@ -0,0 +1,191 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import xbmc
+
+import gzip
+import os
+import re
+import tempfile
+import time
+
+try:  # Python 3
+    from urllib.parse import quote_plus
+    from urllib.parse import urlencode
+except ImportError:  # Python 2
+    from urllib import quote_plus
+    from urllib import urlencode
+
+from resources.libs.common import logging
+from resources.libs.common import tools
+from resources.libs.common.config import CONFIG
+
+CHUNK_SIZE = 64 * 1024
+# Upload bodies above this are spooled to disk
+SPOOL_SIZE = 1024 * 1024
+# A line longer than this is redacted in pieces
+MAX_LINE = 1024 * 1024
+# paste.ubuntu.com does not accept compressed request bodies, only enable for
+# an endpoint that handles Content-Encoding: gzip
+GZIP_UPLOAD = False
+USER_AGENT = '{0}: {1}'.format(CONFIG.ADDON_ID, CONFIG.ADDON_VERSION)
+
+# Every REPLACES pattern in one pass. None of them match across a newline, so
+# redacting whole lines at a time is exact.
+REDACT = re.compile('|'.join('(?P<r{0}>{1})'.format(i, pattern) for i, (pattern, repl) in enumerate(logging.REPLACES)))
+REDACTED = dict(('r{0}'.format(i), repl) for i, (pattern, repl) in enumerate(logging.REPLACES))
+
+# Kodi log lines start with "2024-01-31 18:00:00.123", wizard.log lines with "[2024-01-31 18:00:00]"
+TIMESTAMP = re.compile(br'^\[?(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)')
+
+
+def redact(text):
+    return REDACT.sub(lambda match: REDACTED[match.lastgroup], text)
+
+
+def _timestamp(line):
+    match = TIMESTAMP.match(line)
+    return match.group(1).decode('ascii') if match else None
+
+
+def _seek_since(f, size, cutoff):
+    # Binary search for a position shortly before the first line logged at
+    # or after cutoff, so a large log is not read from the start
+    low, high = 0, size
+    while high - low > CHUNK_SIZE:
+        middle = (low + high) // 2
+        f.seek(middle)
+        f.readline()
+        stamp = None
+        for i in range(1000):
+            line = f.readline()
+            if not line:
+                break
+            stamp = _timestamp(line)
+            if stamp:
+                break
+        if stamp is None or stamp >= cutoff:
+            high = middle
+        else:
+            low = middle
+    f.seek(low)
+    if low:
+        f.readline()
+
+    # Then line by line up to the first one in range
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if not line:
+            return
+        stamp = _timestamp(line)
+        if stamp and stamp >= cutoff:
+            f.seek(start)
+            return
+
+
+def iter_redacted(paths, minutes=None):
+    """Redacted text of the log made of paths, in line aligned chunks.
+
+    With minutes, only lines logged in that many last minutes are included.
+    """
+    cutoff = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() - minutes * 60)) if minutes else None
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            if cutoff:
+                _seek_since(f, os.path.getsize(path), cutoff)
+            carry = b''
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                chunk = carry + chunk
+                end = chunk.rfind(b'\n') + 1
+                if end == 0 and len(chunk) < MAX_LINE:
+                    carry = chunk
+                    continue
+                if end == 0:
+                    end = len(chunk)
+                carry = chunk[end:]
+                yield redact(chunk[:end].decode('utf-8', 'replace'))
+            if carry:
+                yield redact(carry.decode('utf-8', 'replace'))
+
+
+def build_body(paths, fields, minutes=None, compress=GZIP_UPLOAD):
+    """Writes the form encoded upload body to a spooled file.
+
+    Returns (body, length, content_length) where length is the number of
+    characters of log included, or (None, 0, 0) when there is nothing to send.
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    out = gzip.GzipFile(fileobj=body, mode='wb') if compress else body
+    out.write('{0}&content='.format(urlencode(fields)).encode('ascii'))
+
+    length = 0
+    for text in iter_redacted(paths, minutes):
+        length += len(text)
+        out.write(quote_plus(text).encode('ascii'))
+
+    if compress:
+        out.close()
+    if not length:
+        body.close()
+        return None, 0, 0
+    content_length = body.tell()
+    body.seek(0)
+    return body, length, content_length
+
+
+def upload(paths, name, minutes=None):
+    """Posts the redacted log to the paste service. Returns (success, url or error)."""
+    try:
+        body, length, content_length = build_body(paths, {'poster': CONFIG.BUILDERNAME, 'syntax': 'text', 'expiration': 'week'}, minutes)
+    except Exception as e:
+        logging.log('unable to read file: {0}'.format(e))
+        return False, "Unable to Read File"
+    if body is None:
+        logging.log('file is empty')
+        return False, "File is Empty"
+
+    headers = {'Content-Type': 'application/x-www-form-urlencoded',
+               'Content-Length': str(content_length),
+               'User-Agent': USER_AGENT}
+    if GZIP_UPLOAD:
+        headers['Content-Encoding'] = 'gzip'
+
+    logging.log("Uploading {0}: {1} of log as {2}".format(name, tools.convert_size(length), tools.convert_size(content_length)))
+    try:
+        response = tools.get_session().post(logging.URL, data=body, headers=headers, timeout=tools.URL_TIMEOUT)
+    except Exception as e:
+        a = 'failed to connect to the server'
+        logging.log("{0}: {1}".format(a, str(e)), level=xbmc.LOGERROR)
+        return False, a
+    finally:
+        body.close()
+
+    if not response.ok:
+        a = 'unable to retrieve the paste url'
+        logging.log("{0}: status {1}".format(a, response.status_code), level=xbmc.LOGERROR)
+        return False, a
+
+    page_url = response.url.strip()
+    logging.log("URL for {0}: {1}".format(name, page_url))
+    return True, page_url
@@ -0,0 +1,92 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import time
+
+
+class NullDialog:
+    """Stands in for a progress dialog when running without a GUI."""
+
+    def create(self, *args, **kwargs):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+    def iscanceled(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class ProgressReporter:
+    """Rate-limited front end for DialogProgress / DialogProgressBG.
+
+    Updates are forwarded when `interval` seconds have passed or the percent
+    moved by `step` since the last one. Labels may be callables, so they are
+    only formatted when an update is actually shown. iscanceled() is polled at
+    most every `cancel_interval` seconds.
+    """
+
+    def __init__(self, dialog=None, interval=0.1, step=1, cancel_interval=0.25, cancelable=True):
+        self.dialog = dialog if dialog is not None else NullDialog()
+        self.interval = interval
+        self.step = step
+        self.cancel_interval = cancel_interval
+        self.cancelable = cancelable
+        self.updates = 0
+        self._last_time = 0
+        self._last_percent = None
+        self._last_poll = 0
+        self._canceled = False
+
+    def update(self, percent, label=None, force=False):
+        percent = int(percent)
+        now = time.time()
+
+        if not force and self._last_percent is not None \
+                and now - self._last_time < self.interval \
+                and abs(percent - self._last_percent) < self.step:
+            return False
+
+        self._last_time = now
+        self._last_percent = percent
+        self.updates += 1
+
+        if callable(label):
+            label = label()
+        if label is None:
+            self.dialog.update(percent)
+        else:
+            self.dialog.update(percent, label)
+        return True
+
+    def canceled(self):
+        if self._canceled or not self.cancelable:
+            return self._canceled
+
+        now = time.time()
+        if now - self._last_poll >= self.cancel_interval:
+            self._last_poll = now
+            self._canceled = bool(self.dialog.iscanceled())
+        return self._canceled
+
+    def close(self):
+        self.dialog.close()
@@ -13,7 +13,10 @@ except ImportError:  # Python 2
 from resources.libs.common.config import CONFIG
 from resources.libs.common import logging
 from resources.libs.common import tools
-from resources.libs.gui import menu
+from resources.libs.common.lazy import lazy_import
+
+# Only loaded by the routes that use it
+menu = lazy_import('resources.libs.gui.menu')
 
 advanced_settings_mode = 'advanced_settings'
 addon_installer_mode = 'addons'
@@ -262,6 +265,10 @@ class Router:
         elif mode == 'oldThumbs':  # Cleaning Tools -> Clear Old Thumbnails
             from resources.libs import clear
             clear.old_thumbs()
+        elif mode == 'trimthumbs':  # Cleaning Tools -> Trim Thumbnails To Quota
+            from resources.libs import clear
+            clear.trim_thumbs()
+            xbmc.executebuiltin('Container.Refresh()')
         elif mode == 'clearbackup':  # Backup/Restore -> Clean Up Back Up Folder
             from resources.libs import backup
             backup.cleanup_backup()
@@ -330,14 +337,14 @@ class Router:
             logging.view_log_file()
         elif mode == 'viewwizlog':  # View wizard.log
             from resources.libs.gui import window
+            logging.WIZARD_LOG.flush()
             window.show_log_viewer(log_file=CONFIG.WIZLOG)
         elif mode == 'viewerrorlog':  # View errors in log
             logging.error_checking()
         elif mode == 'viewerrorlast':  # View last error in log
             logging.error_checking(last=True)
         elif mode == 'clearwizlog':  # Clear wizard.log
-            from resources.libs.common import tools
-            tools.remove_file(CONFIG.WIZLOG)
+            logging.WIZARD_LOG.clear()
             logging.log_notify("[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, CONFIG.ADDONTITLE),
                                "[COLOR {0}]Wizard Log Cleared![/COLOR]".format(CONFIG.COLOR2))
 
@@ -27,6 +27,7 @@ import re
 import shutil
 import string
 import sys
+import threading
 
 if sys.version_info[0] > 2:
     # Python 3
@@ -57,6 +58,7 @@ except ImportError:  # Python 2
 from contextlib import contextmanager
 
 from resources.libs.common.config import CONFIG
+from resources.libs.common.progress import ProgressReporter
 
 
 #########################
@@ -449,12 +451,13 @@ def convert_special(url, over=False):
     total = file_count(url)
     start = 0
     progress_dialog.create(CONFIG.ADDONTITLE, "[COLOR {0}]Changing Physical Paths To Special".format(CONFIG.COLOR2) + "\n" + "Please Wait[/COLOR]")
+    reporter = ProgressReporter(progress_dialog)
     for root, dirs, files in os.walk(url):
         for file in files:
             start += 1
             perc = int(percentage(start, total))
             if file.endswith(".xml") or file.endswith(".hash") or file.endswith("properies"):
-                progress_dialog.update(perc, "[COLOR {0}]Scanning: [COLOR {1}]{2}[/COLOR]".format(CONFIG.COLOR2, CONFIG.COLOR1, root.replace(CONFIG.HOME, '')) + '\n' + "[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, file) + '\n' + "Please Wait[/COLOR]")
+                reporter.update(perc, lambda: "[COLOR {0}]Scanning: [COLOR {1}]{2}[/COLOR]".format(CONFIG.COLOR2, CONFIG.COLOR1, root.replace(CONFIG.HOME, '')) + '\n' + "[COLOR {0}]{1}[/COLOR]".format(CONFIG.COLOR1, file) + '\n' + "Please Wait[/COLOR]")
                 a = read_from_file(os.path.join(root, file))
                 encodedpath = quote(CONFIG.HOME)
                 encodedpath2 = quote(CONFIG.HOME).replace('%3A', '%3a').replace('%5C', '%5c')
@@ -465,7 +468,7 @@ def convert_special(url, over=False):
                 except IOError as e:
                     logging.log('Unable to open file to convert special paths: {}'.format(os.path.join(root, file)))
 
-                if progress_dialog.iscanceled():
+                if reporter.canceled():
                     progress_dialog.close()
                     logging.log_notify(CONFIG.ADDONTITLE,
                                        "[COLOR {0}]Convert Path Cancelled[/COLOR]".format(CONFIG.COLOR2))
@@ -569,17 +572,16 @@ def ascii_check(use=None, over=False):
     f2 = 0
     items = file_count(source)
     msg = ''
-    prog = []
+    prog = 0
     logging.log("Source file: ({0})".format(str(source)))
 
     progress_dialog.create(CONFIG.ADDONTITLE, 'Please wait...')
+    reporter = ProgressReporter(progress_dialog)
     for base, dirs, files in os.walk(source):
-        dirs[:] = [d for d in dirs]
-        files[:] = [f for f in files]
         for file in files:
-            prog.append(file)
-            prog2 = int(len(prog) / float(items) * 100)
-            progress_dialog.update(prog2, "[COLOR {0}]Checking for non ASCII files".format(CONFIG.COLOR2) + '\n' + '[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, file) + '\n' + 'Please Wait[/COLOR]')
+            prog += 1
+            prog2 = int(prog / float(items) * 100)
+            reporter.update(prog2, lambda: "[COLOR {0}]Checking for non ASCII files".format(CONFIG.COLOR2) + '\n' + '[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, file) + '\n' + 'Please Wait[/COLOR]')
             try:
                 file.encode('ascii')
             except UnicodeEncodeError:
@@ -608,7 +610,7 @@ def ascii_check(use=None, over=False):
                     f1 += 1
                     logging.log("[ASCII Check] File Found: {0} ".format(badfile), level=xbmc.LOGERROR)
                 pass
-        if progress_dialog.iscanceled():
+        if reporter.canceled():
             progress_dialog.close()
             logging.log_notify(CONFIG.ADDONTITLE,
                                "[COLOR {0}]ASCII Check Cancelled[/COLOR]".format(CONFIG.COLOR2))
@@ -690,67 +692,149 @@ def _is_url(url):
         return False
 
 
-def _check_url(url, cred):
-    import requests
+# (connect, read) timeouts in seconds, shared by every request in open_url()
+URL_TIMEOUT = (5.0, 15.0)
+URL_RETRIES = 3
+URL_BACKOFF = 0.5
+
+_session = None
+_session_lock = threading.Lock()
+
+# Responses fetched ahead of time by prefetch(), consumed by open_url()
+PREFETCH_DEADLINE = 10.0
+PREFETCH_WORKERS = 4
+_prefetched = {}
+_prefetched_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            try:
+                from urllib3.util.retry import Retry
+            except ImportError:
+                from requests.packages.urllib3.util.retry import Retry
+
+            retry = Retry(total=URL_RETRIES, connect=URL_RETRIES, read=URL_RETRIES,
+                          backoff_factor=URL_BACKOFF, status_forcelist=(500, 502, 503, 504))
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=8)
+
+            session = requests.Session()
+            session.headers.update({'user-agent': CONFIG.USER_AGENT})
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
+def open_url(url, stream=False, check=False, cred=None, count=0, headers=None):
     from resources.libs.common import logging
 
-    if _is_url(url):
+    if not url:
+        return False
+
+    if not _is_url(url):
+        logging.log("URL is not of a valid schema: {0}".format(url), level=xbmc.LOGDEBUG)
+        return False
+
+    dialog = xbmcgui.Dialog()
+    request_headers = dict(headers) if headers else {}
+
+    if check:
+        # Ask for a single byte instead of the whole body; servers without
+        # range support just answer 200 and the body is never read.
+        request_headers['Range'] = 'bytes=0-0'
+        stream = True
+
+    response = None
+    if not (stream or check or cred or headers):
+        with _prefetched_lock:
+            response = _prefetched.pop(url, None)
+
+    if response is None:
         try:
-            response = requests.head(url, headers={'user-agent': CONFIG.USER_AGENT}, allow_redirects=True, auth=cred)
-            
-            if response.status_code < 300:
-                logging.log("URL check passed for {0}: Status code [{1}]".format(url, response.status_code), level=xbmc.LOGDEBUG)
-                return True
-            elif response.status_code < 400:
-                logging.log("URL check redirected from {0} to {1}: Status code [{2}]".format(url, response.headers['Location'], response.status_code), level=xbmc.LOGDEBUG)
-                return _check_url(response.headers['Location'])
-            elif response.status_code == 401:
-                logging.log("URL requires authentication for {0}: Status code [{1}]".format(url, response.status_code), level=xbmc.LOGDEBUG)
-                return 'auth'
-            else:
-                logging.log("URL check failed for {0}: Status code [{1}]".format(url, response.status_code), level=xbmc.LOGDEBUG)
-                return False
+            response = get_session().get(url, headers=request_headers, timeout=URL_TIMEOUT, stream=stream, auth=cred)
         except Exception as e:
             logging.log("URL check error for {0}: [{1}]".format(url, e), level=xbmc.LOGDEBUG)
             return False
-    else:
-        logging.log("URL is not of a valid schema: {0}".format(url), level=xbmc.LOGDEBUG)
+
+    if check:
+        response.close()
+        if response.status_code == 401 or response.status_code < 400:
+            logging.log("URL check passed for {0}: Status code [{1}]".format(url, response.status_code), level=xbmc.LOGDEBUG)
+            return True
+        logging.log("URL check failed for {0}: Status code [{1}]".format(url, response.status_code), level=xbmc.LOGDEBUG)
         return False
-        
 
-def open_url(url, stream=False, check=False, cred=None, count=0):
-    import requests
+    if response.status_code == 401:
+        response.close()
+        if not cred:
+            logging.log("URL requires authentication for {0}: Status code [{1}]".format(url, response.status_code), level=xbmc.LOGDEBUG)
+            cred = (get_keyboard(heading='Username'), get_keyboard(heading='Password'))
+            return open_url(url, stream, check, cred, count, headers)
 
-    if not url:
-        return False
+        retry = dialog.yesno(CONFIG.ADDONTITLE, 'Either the username or password were invalid. Would you like to try again?', yeslabel='Try Again', nolabel='Cancel')
 
-    dialog = xbmcgui.Dialog()
-    user_agent = {'user-agent': CONFIG.USER_AGENT}
-    count = 0
-    
-    valid = _check_url(url, cred)
+        if retry and count < 3:
+            count += 1
+            cred = (get_keyboard(heading='Username'), get_keyboard(heading='Password'))
 
-    if not valid:
+            return open_url(url, stream, check, cred, count, headers)
+        else:
+            dialog.ok(CONFIG.ADDONTITLE, 'Authentication Failed.')
+            return False
+    elif response.status_code >= 400:
+        logging.log("URL check failed for {0}: Status code [{1}]".format(url, response.status_code), level=xbmc.LOGDEBUG)
+        response.close()
         return False
-    else:
-        if check:
-            return True if valid else False
-            
-        if valid == 'auth' and not cred:
-            cred = (get_keyboard(heading='Username'), get_keyboard(heading='Password'))
-            
-        response = requests.get(url, headers=user_agent, timeout=10.000, stream=stream, auth=cred)
-
-        if response.status_code == 401:
-            retry = dialog.yesno(CONFIG.ADDONTITLE, 'Either the username or password were invalid. Would you like to try again?', yeslabel='Try Again', nolabel='Cancel')
-            
-            if retry and count < 3:
-                count += 1
-                cred = (get_keyboard(heading='Username'), get_keyboard(heading='Password'))
-                
-                response = open_url(url, stream, check, cred, count)
-            else:
-                dialog.ok(CONFIG.ADDONTITLE, 'Authentication Failed.')
-                return False
-        
-        return response
+
+    return response
+
+
+def prefetch(urls=(), tasks=(), deadline=PREFETCH_DEADLINE):
+    # Runs independent fetches side by side and waits at most `deadline`
+    # seconds for all of them. The next plain open_url() of a fetched url is
+    # answered from memory; anything slower is simply fetched again later.
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import wait
+
+    from resources.libs.common import logging
+
+    def fetch(url):
+        try:
+            response = get_session().get(url, timeout=URL_TIMEOUT)
+        except Exception as e:
+            # Not kept, open_url() tries again itself
+            logging.log("Prefetch failed for {0}: [{1}]".format(url, e), level=xbmc.LOGDEBUG)
+            return
+        # Only successes are kept; open_url() handles errors and
+        # authentication prompts itself
+        if not 200 <= response.status_code < 300:
+            response.close()
+            return
+        with _prefetched_lock:
+            # Nobody waits for a late answer, it would only go stale here
+            if time.time() > expires:
+                response.close()
+                return
+            _prefetched[url] = response
+
+    urls = [url for url in set(urls) if url and _is_url(url)]
+    jobs = [(fetch, (url,)) for url in urls] + [(task, ()) for task in tasks]
+    if not jobs:
+        return True
+
+    start = time.time()
+    expires = start + deadline
+    pool = ThreadPoolExecutor(max_workers=min(PREFETCH_WORKERS, len(jobs)))
+    futures = [pool.submit(job, *args) for job, args in jobs]
+    done, pending = wait(futures, timeout=deadline)
+    pool.shutdown(wait=False)
+
+    logging.log("Prefetched {0}/{1} in {2:.2f}s".format(len(done), len(futures), time.time() - start), level=xbmc.LOGINFO)
+    return not pending
@@ -21,9 +21,13 @@ import xbmc
 import xbmcgui
 import xbmcvfs
 
+import atexit
+import contextlib
 import glob
 import os
 import re
+import threading
+import time
 try:  # Python 3
     import zipfile
 except ImportError:  # Python 2
@@ -38,57 +42,151 @@ from resources.libs.common import logging
 from resources.libs.common import tools
 
 
+# Seconds to wait on a database Kodi is writing to
+DB_TIMEOUT = 10
+# Put a database in WAL mode for bulk writes when nothing else is using it.
+# Off by default: Kodi keeps its databases open, and while it does the
+# journal cannot be switched back afterwards.
+BULK_WAL = False
+# Seconds a force check waits for all repositories together, and between
+# looks at their lastcheck
+REPO_CHECK_TIMEOUT = 20
+REPO_POLL_INTERVAL = 0.5
+
+# Open connections, {path: (connection, inode)}, kept for the whole run
+_CONNECTIONS = {}
+# latest_db() results, {name: (Database folder mtime, file name)}
+_LATEST = {}
+
+
+def connect(dbfile):
+    """Shared connection to dbfile, in autocommit mode.
+
+    A connection is reopened when the file was replaced since, as happens
+    when a build is extracted over the Database folder.
+    """
+    inode = os.stat(dbfile).st_ino
+    cached = _CONNECTIONS.get(dbfile)
+    if cached is not None:
+        if cached[1] == inode:
+            return cached[0]
+        close(dbfile)
+    conn = database.connect(dbfile, timeout=DB_TIMEOUT, isolation_level=None, check_same_thread=False)
+    _CONNECTIONS[dbfile] = (conn, inode)
+    return conn
+
+
+def close(dbfile=None):
+    """Closes the shared connection to dbfile, or all of them."""
+    for path in [dbfile] if dbfile else list(_CONNECTIONS):
+        cached = _CONNECTIONS.pop(path, None)
+        if cached is not None:
+            try:
+                cached[0].close()
+            except:
+                pass
+
+
+atexit.register(close)
+
+
+def _try_wal(conn):
+    # Switching to WAL needs the database to itself. Fails straight away,
+    # leaving the journal as it was, while Kodi is using it.
+    conn.execute("PRAGMA busy_timeout = 0")
+    try:
+        mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    except database.OperationalError:
+        mode = None
+    finally:
+        conn.execute("PRAGMA busy_timeout = {0}".format(DB_TIMEOUT * 1000))
+    return mode == 'wal'
+
+
+@contextlib.contextmanager
+def transaction(dbfile, bulk=False):
+    """Runs the block in one transaction on the shared connection.
+
+    With bulk, the database is put in WAL mode with synchronous=NORMAL for
+    the duration if nothing else holds it, and put back afterwards.
+    """
+    conn = connect(dbfile)
+    wal = bulk and BULK_WAL and _try_wal(conn)
+    if wal:
+        conn.execute("PRAGMA synchronous = NORMAL")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        if wal:
+            conn.execute("PRAGMA synchronous = FULL")
+            conn.execute("PRAGMA busy_timeout = 0")
+            try:
+                conn.execute("PRAGMA journal_mode = DELETE")
+            except database.OperationalError as e:
+                # Kodi opens WAL databases just as well
+                logging.log("{0} left in WAL mode: {1}".format(dbfile, str(e)))
+            finally:
+                conn.execute("PRAGMA busy_timeout = {0}".format(DB_TIMEOUT * 1000))
+
+
 def addon_database(addon=None, state=1, array=False):
     dbfile = latest_db('Addons')
     dbfile = os.path.join(CONFIG.DATABASE, dbfile)
     installedtime = str(datetime.now())[:-7]
 
-    if os.path.exists(dbfile):
-        try:
-            textdb = database.connect(dbfile)
-            textexe = textdb.cursor()
-        except Exception as e:
-            logging.log("DB Connection Error: {0}".format(str(e)), level=xbmc.LOGERROR)
-            return False
-    else:
+    if not os.path.exists(dbfile):
         return False
 
     if state == 2:
         try:
-            textexe.execute("DELETE FROM installed WHERE addonID = ?", (addon,))
-            textdb.commit()
-            textexe.close()
-        except:
-            logging.log("Error Removing {0} from DB".format(addon))
+            with transaction(dbfile) as textdb:
+                textdb.execute("DELETE FROM installed WHERE addonID = ?", (addon,))
+        except Exception as e:
+            logging.log("Error Removing {0} from DB: {1}".format(addon, str(e)))
         return True
 
+    addons = addon if array else [addon]
     try:
-        if not array:
-            textexe.execute('INSERT or IGNORE into installed (addonID , enabled, installDate) VALUES (?,?,?)', (addon, state, installedtime,))
-            textexe.execute('UPDATE installed SET enabled = ? WHERE addonID = ? ', (state, addon,))
-        else:
-            for item in addon:
-                textexe.execute('INSERT or IGNORE into installed (addonID , enabled, installDate) VALUES (?,?,?)', (item, state, installedtime,))
-                textexe.execute('UPDATE installed SET enabled = ? WHERE addonID = ? ', (state, item,))
-        textdb.commit()
-        textexe.close()
-    except:
-        logging.log("Erroring enabling addon: {0}".format(addon))
+        with transaction(dbfile, bulk=len(addons) > 1) as textdb:
+            textdb.executemany('INSERT or IGNORE into installed (addonID , enabled, installDate) VALUES (?,?,?)',
+                               [(item, state, installedtime) for item in addons])
+            textdb.executemany('UPDATE installed SET enabled = ? WHERE addonID = ? ',
+                               [(state, item) for item in addons])
+    except Exception as e:
+        logging.log("Erroring enabling addon: {0}: {1}".format(addon, str(e)))
 
 
 def latest_db(db):
     if db in CONFIG.DB_FILES:
+        # Only looked up again when files were added to or removed from the
+        # Database folder
+        try:
+            mtime = os.stat(CONFIG.DATABASE).st_mtime
+        except OSError:
+            mtime = None
+        cached = _LATEST.get(db)
+        if cached is not None and mtime is not None and cached[0] == mtime:
+            return cached[1]
+
         match = glob.glob(os.path.join(CONFIG.DATABASE, '{0}*.db'.format(db)))
-        comp = '{0}(.+?).db'.format(db[1:])
+        comp = re.compile('{0}(.+?).db'.format(db[1:]))
         highest = 0
         for file in match:
             try:
-                check = int(re.compile(comp).findall(file)[0])
+                check = int(comp.findall(file)[0])
             except:
                 check = 0
             if highest < check:
                 highest = check
-        return '{0}{1}.db'.format(db, highest)
+        latest = '{0}{1}.db'.format(db, highest)
+        _LATEST[db] = (mtime, latest)
+        return latest
     else:
         return False
         
@@ -103,59 +201,82 @@ def forceUpdate():
     xbmc.executebuiltin('UpdateLocalAddons()')
 ############################################################################
 
+class _RepoMonitor(xbmc.Monitor):
+    # Addon notifications often mean a repository finished, so check again
+    # right away instead of at the next poll
+    def __init__(self):
+        super(_RepoMonitor, self).__init__()
+        self.changed = threading.Event()
+
+    def onNotification(self, sender, method, data):
+        if method.startswith('Addon.') or 'repo' in method.lower():
+            self.changed.set()
+
+
+def _wait_for_repos(dbfile, repos, start_time, timeout=None):
+    # Returns the repos whose lastcheck did not move past start_time in time.
+    # Monitor callbacks are only delivered while in waitForAbort, hence the
+    # short ticks.
+    monitor = _RepoMonitor()
+    conn = connect(dbfile)
+    pending = set(repos)
+    deadline = time.time() + (timeout or REPO_CHECK_TIMEOUT)
+    next_poll = 0
+    while pending:
+        now = time.time()
+        if monitor.changed.is_set() or now >= next_poll:
+            monitor.changed.clear()
+            next_poll = now + REPO_POLL_INTERVAL
+            for repo, lastcheck in conn.execute('SELECT addonID, lastcheck FROM repo').fetchall():
+                if repo not in pending or not lastcheck:
+                    continue
+                try:
+                    checked_time = time.mktime(time.strptime(lastcheck, '%Y-%m-%d %H:%M:%S'))
+                except ValueError:
+                    continue
+                # lastcheck only has whole seconds
+                if checked_time >= int(start_time):
+                    pending.discard(repo)
+                    logging.log('{0} successfully force checked.'.format(repo), level=xbmc.LOGDEBUG)
+                    logging.log_notify('[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, CONFIG.ADDONTITLE),
+                                       "[COLOR {0}]{1} successfully force checked.[/COLOR]".format(CONFIG.COLOR2, repo))
+            if not pending:
+                break
+        if now >= deadline or monitor.waitForAbort(0.1):
+            break
+    return pending
+
+
 def force_check_updates(auto=False, over=False):
-    import time
-    
     if not over:
         logging.log_notify(CONFIG.ADDONTITLE,
                            '[COLOR {0}]Force Checking for Updates[/COLOR]'.format(CONFIG.COLOR2))
 
     dbfile = latest_db('Addons')
     dbfile = os.path.join(CONFIG.DATABASE, dbfile)
-    sqldb = database.connect(dbfile)
-    sqlexe = sqldb.cursor()
-    
+
     # force rollback all installed repos
-    sqlexe.execute("UPDATE repo SET version = ?, checksum = ?, lastcheck = ?", ('', '', '',))
-    sqldb.commit()
+    with transaction(dbfile) as sqldb:
+        sqldb.execute("UPDATE repo SET version = ?, checksum = ?, lastcheck = ?", ('', '', '',))
+        installed_repos = [row[0] for row in sqldb.execute('SELECT addonID FROM repo').fetchall()]
 
     # trigger kodi to check them for updates
+    start_time = time.time()
     xbmc.executebuiltin('UpdateAddonRepos')
 
-    # wait until they have finished updating
+    # wait until they have finished updating, all of them against one deadline
     with tools.busy_dialog():
-        installed_repos = sqlexe.execute('SELECT addonID FROM repo')
-
-        start_time = time.time()
-        checked_time = 0
-        for repo in installed_repos.fetchall():
-            repo = repo[0]
-            logging.log('Force checking {0}...'.format(repo), level=xbmc.LOGDEBUG)
-            while checked_time < start_time:
-                if time.time() >= start_time + 20:
-                    logging.log('{0} timed out during repo force check.'.format(repo), level=xbmc.LOGDEBUG)
-                    break
-                
-                lastcheck = sqlexe.execute('SELECT lastcheck FROM repo WHERE addonID = ?', (repo,))
-                
-                if lastcheck:
-                    checked_time = lastcheck.fetchone()[0]
-                    checked_time = time.mktime(time.strptime(checked_time, '%Y-%m-%d %H:%M:%S')) if checked_time else 0
-                    
-                xbmc.sleep(1000)
-            checked_time = 0
-            logging.log('{0} successfully force checked.'.format(repo), level=xbmc.LOGDEBUG)
-            logging.log_notify('[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, CONFIG.ADDONTITLE),
-                               "[COLOR {0}]{1} successfully force checked.[/COLOR]".format(CONFIG.COLOR2, repo))
-            
-    sqlexe.close()
-                    
+        logging.log('Force checking {0}...'.format(', '.join(installed_repos)), level=xbmc.LOGDEBUG)
+        for repo in _wait_for_repos(dbfile, installed_repos, start_time):
+            logging.log('{0} timed out during repo force check.'.format(repo), level=xbmc.LOGDEBUG)
+
     if auto:
         xbmc.executebuiltin('UpdateLocalAddons')
 
 
 def purge_db_file(name):
     logging.log('Purging DB {0}.'.format(name))
+    close(name)
     if os.path.exists(name):
         try:
             textdb = database.connect(name)
@@ -0,0 +1,172 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+# Quick update manifests are published next to the gui zip, e.g.
+# israel-quick-update.zip -> israel-quick-update.manifest.json:
+#
+#   {"format": 1,
+#    "version": "1.2.0",
+#    "files": {"userdata/guisettings.xml": {"size": 1234, "sha1": "..."}, ...},
+#    "deltas": {"1.1.0": {"url": "israel-delta-1.1.0-1.2.0.zip",
+#                         "files": ["userdata/guisettings.xml", ...],
+#                         "delete": ["addons/plugin.old/addon.xml", ...]}}}
+#
+# Delta urls are relative to the manifest. scripts/create_build.py writes both.
+
+import xbmc
+
+import json
+import os
+
+try:  # Python 3
+    from urllib.parse import urljoin
+except ImportError:  # Python 2
+    from urlparse import urljoin
+
+from resources.libs.common import logging
+from resources.libs.common import tools
+from resources.libs.common.config import CONFIG
+
+MANIFEST_FORMAT = 1
+MANIFEST_FOLDER = os.path.join(CONFIG.PLUGIN_DATA, 'manifests')
+
+
+def manifest_url(url):
+    base = url.split('?')[0]
+    if base.lower().endswith('.zip'):
+        base = base[:-4]
+    return '{0}.manifest.json'.format(base)
+
+
+def _local_path(name):
+    name = ''.join(c for c in name if c not in '\\/:*?"<>|')
+    return os.path.join(MANIFEST_FOLDER, '{0}.json'.format(name))
+
+
+def _valid(manifest):
+    return isinstance(manifest, dict) \
+        and manifest.get('format') == MANIFEST_FORMAT \
+        and isinstance(manifest.get('files'), dict)
+
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except:
+        return None
+    return manifest if _valid(manifest) else None
+
+
+def write_manifest(path, manifest):
+    try:
+        tools.ensure_folders(os.path.dirname(path))
+        tmp = '{0}.tmp'.format(path)
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        logging.log("[Quick Update] Unable to save manifest: {0}".format(e), level=xbmc.LOGERROR)
+
+
+def fetch_manifest(url):
+    response = tools.open_url(url)
+    if not response:
+        return None
+    try:
+        manifest = response.json()
+    except:
+        logging.log("[Quick Update] Invalid manifest: {0}".format(url), level=xbmc.LOGERROR)
+        return None
+    return manifest if _valid(manifest) else None
+
+
+def diff(old, new):
+    """Returns (changed, deleted) paths between two manifest file maps."""
+    changed = [path for path, info in new.items() if old.get(path) != info]
+    deleted = [path for path in old if path not in new]
+    return sorted(changed), sorted(deleted)
+
+
+def forget(name):
+    try:
+        os.remove(_local_path(name))
+    except:
+        pass
+
+
+class DeltaUpdate:
+    """Picks the smallest package for a quick update of an installed build.
+
+    The manifest saved after the last quick update is diffed against the
+    published one. When a delta zip from the installed version covers the
+    difference it is used instead of the full gui zip.
+    """
+
+    def __init__(self, name, url):
+        self.url = url
+        self.path = _local_path(name)
+        self.local = read_manifest(self.path)
+        self.remote = None
+        self.delta = None
+        self.changed = []
+        self.deleted = []
+
+    def prepare(self):
+        """Returns the url of the package to download."""
+        self.remote = fetch_manifest(manifest_url(self.url))
+        if not self.remote or not self.local:
+            return self.url
+
+        self.changed, self.deleted = diff(self.local['files'], self.remote['files'])
+        entry = self.remote.get('deltas', {}).get(self.local.get('version'))
+        if not entry:
+            logging.log("[Quick Update] No delta from version {0}".format(self.local.get('version')))
+            return self.url
+        if not set(self.changed).issubset(entry.get('files', [])) \
+                or not set(self.deleted).issubset(entry.get('delete', [])):
+            logging.log("[Quick Update] Delta from version {0} does not match the installed files".format(self.local.get('version')))
+            return self.url
+
+        self.delta = entry
+        logging.log("[Quick Update] Using delta {0}: {1} changed, {2} deleted".format(entry['url'], len(self.changed), len(self.deleted)))
+        return urljoin(manifest_url(self.url), entry['url'])
+
+    def finish(self, home, errors=0):
+        # With extract errors the installed files are neither the old nor the
+        # new version, keep the old manifest so the next update covers them
+        if errors:
+            logging.log("[Quick Update] {0} extract errors, keeping the manifest of version {1}".format(
+                errors, (self.local or {}).get('version')), level=xbmc.LOGERROR)
+            return
+        home = os.path.abspath(home)
+        for path in self.deleted:
+            target = os.path.abspath(os.path.join(home, path))
+            if not target.startswith(home + os.sep):
+                continue
+            try:
+                os.remove(target)
+                logging.log("[Quick Update] Removed {0}".format(path), level=xbmc.LOGDEBUG)
+            except OSError:
+                pass
+
+        if self.remote:
+            write_manifest(self.path, self.remote)
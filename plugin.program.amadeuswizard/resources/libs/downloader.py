@@ -20,14 +20,27 @@
 import xbmc
 import xbmcgui
 
-import requests
-import sys
+import json
 import os
+import re
+import threading
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+
 from resources.libs.common import logging
 from resources.libs.common import tools
 from resources.libs.common.config import CONFIG
+from resources.libs.package_cache import CACHE
+
+MB = 1024 * 1024
+
+# Files smaller than this are fetched with a single ranged request
+SEGMENT_MIN_SIZE = 8 * MB
+SEGMENTS = 4
+SEGMENT_RETRIES = 5
+CHUNK_SIZE = 256 * 1024
+MANIFEST_INTERVAL = 1.0
 
 
 class Downloader:
@@ -39,6 +52,9 @@ class Downloader:
         self.progress_dialog_bg = progress_dialog_bg
         self.progress_dialog = xbmcgui.DialogProgressBG() if self.progress_dialog_bg else xbmcgui.DialogProgress()
         #####################################################
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._received = 0
 
     def download(self, url, dest):
         self.progress_dialog.create(CONFIG.ADDONTITLE, "מוריד...")
@@ -47,59 +63,237 @@ class Downloader:
         path = os.path.split(dest)[0]
         if not os.path.exists(path):
             os.makedirs(path)
-        with open(dest, 'wb') as f:
-            response = tools.open_url(url, stream=True)
-            
-            if not response:
-                logging.log_notify(CONFIG.ADDONTITLE,
-                                   '[COLOR {0}]Build Install: Invalid Zip Url![/COLOR]'.format(CONFIG.COLOR2))
-                return
-            else:
-                total = response.headers.get('content-length')
 
-            if total is None:
-                f.write(response.content)
+        part = '{0}.part'.format(dest)
+        manifest_file = '{0}.json'.format(part)
+
+        response = tools.open_url(url, stream=True, headers={'Range': 'bytes=0-0'})
+
+        if not response:
+            logging.log_notify(CONFIG.ADDONTITLE,
+                               '[COLOR {0}]Build Install: Invalid Zip Url![/COLOR]'.format(CONFIG.COLOR2))
+            self._fail(dest)
+            return
+
+        total = self._range_total(response)
+
+        length = response.headers.get('content-length')
+        if CACHE.fetch(url, response.headers, total if total is not None else (int(length) if length else None), dest):
+            response.close()
+            self.progress_dialog.update(100)
+            return
+
+        if total is None:
+            # No range support, stream the body we already have in one pass
+            completed = self._download_single(response, part)
+        else:
+            response.close()
+            manifest = self._load_manifest(manifest_file, url, total, response)
+            if manifest is None:
+                manifest = self._new_manifest(url, total, response)
+                with open(part, 'wb') as f:
+                    f.truncate(total)
             else:
-                downloaded = 0
-                total = int(total)
-                start_time = time.time()
-                mb = 1024*1024
-                
-                for chunk in response.iter_content(chunk_size=max(int(total/512), mb)):
-                    downloaded += len(chunk)
+                logging.log("[Downloader] Resuming {0} at {1} of {2} bytes".format(url, self._done(manifest), total))
+            completed = self._download_segments(response.url, part, manifest, manifest_file)
+
+        if not completed:
+            self._fail(dest)
+            return
+
+        try:
+            os.remove(dest)
+        except:
+            pass
+        os.rename(part, dest)
+        try:
+            os.remove(manifest_file)
+        except:
+            pass
+
+        CACHE.store(url, response.headers, dest)
+
+    def _fail(self, dest):
+        # Callers test for an empty file to detect a failed download, so an
+        # older copy of dest must not survive. It is removed rather than
+        # truncated in place, as it may be hardlinked into the package cache.
+        part = '{0}.part'.format(dest)
+        for path in (dest, part, '{0}.json'.format(part)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        open(dest, 'wb').close()
+
+    def _range_total(self, response):
+        if response.status_code != 206:
+            return None
+        match = re.match(r'bytes\s+\d+-\d+/(\d+)', response.headers.get('content-range', ''))
+        return int(match.group(1)) if match else None
+
+    def _new_manifest(self, url, total, response):
+        count = SEGMENTS if total >= SEGMENT_MIN_SIZE else 1
+        size = -(-total // count)
+        segments = []
+        for start in range(0, total, size):
+            segments.append({'start': start, 'end': min(start + size, total) - 1, 'done': 0})
+        return {'url': url,
+                'size': total,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+                'segments': segments}
+
+    def _load_manifest(self, manifest_file, url, total, response):
+        part = manifest_file[:-len('.json')]
+        if not os.path.exists(manifest_file) or not os.path.exists(part):
+            return None
+        try:
+            with open(manifest_file, 'r') as f:
+                manifest = json.load(f)
+        except:
+            return None
+        if manifest.get('url') != url or manifest.get('size') != total or os.path.getsize(part) != total:
+            return None
+        if manifest.get('etag') != response.headers.get('etag') or manifest.get('last_modified') != response.headers.get('last-modified'):
+            logging.log("[Downloader] Remote file changed, restarting download: {0}".format(url))
+            return None
+        return manifest
+
+    def _save_manifest(self, manifest, manifest_file):
+        with self._lock:
+            data = json.dumps(manifest)
+        tmp = '{0}.tmp'.format(manifest_file)
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, manifest_file)
+
+    def _done(self, manifest):
+        return sum(segment['done'] for segment in manifest['segments'])
+
+    def _download_single(self, response, part):
+        total = response.headers.get('content-length')
+        total = int(total) if total else None
+        start_time = time.time()
+        downloaded = 0
+
+        try:
+            with open(part, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
                     f.write(chunk)
-                    
-                    done = int(100 * downloaded / total)
-                    #####################################################
-                    # KODI-RD-IL
-                    try:
-                        kbps_speed = downloaded / (time.time() - start_time)
-                    except:
-                        kbps_speed = 0
-                        pass
-                    #####################################################
-                    
-                    if kbps_speed > 0 and not done >= 100:
-                        eta = (total - downloaded) / kbps_speed
-                    else:
-                        eta = 0
-                    
-                    kbps_speed = kbps_speed / 1024
-                    type_speed = 'KB'
-                    
-                    if kbps_speed >= 1024:
-                        kbps_speed = kbps_speed / 1024
-                        type_speed = 'MB'
-                        
-                    currently_downloaded = '[COLOR %s][B]Size:[/B] [COLOR %s]%.02f[/COLOR] MB of [COLOR %s]%.02f[/COLOR] MB[/COLOR]' % (CONFIG.COLOR2, CONFIG.COLOR1, downloaded / mb, CONFIG.COLOR1, total / mb)
-                    speed = '[COLOR %s][B]Speed:[/B] [COLOR %s]%.02f [/COLOR]%s/s ' % (CONFIG.COLOR2, CONFIG.COLOR1, kbps_speed, type_speed)
-                    div = divmod(eta, 60)
-                    speed += '[B]ETA:[/B] [COLOR %s]%02d:%02d[/COLOR][/COLOR]' % (CONFIG.COLOR1, div[0], div[1])
-                    
-                    #####################################################
-                    # KODI-RD-IL
-                    if self.progress_dialog_bg:
-                        self.progress_dialog.update(done)
-                    else:
-                        self.progress_dialog.update(done, '\n' + str(currently_downloaded) + '\n' + str(speed)) 
-                    #####################################################
+                    downloaded += len(chunk)
+                    self._received = downloaded
+                    self._update(downloaded, total, start_time)
+                    if self._canceled():
+                        return False
+        except Exception as e:
+            logging.log("[Downloader] Download failed: {0}".format(e), level=xbmc.LOGERROR)
+            return False
+        finally:
+            response.close()
+        return total is None or downloaded == total
+
+    def _download_segments(self, url, part, manifest, manifest_file):
+        total = manifest['size']
+        pending = [segment for segment in manifest['segments'] if segment['done'] < segment['end'] - segment['start'] + 1]
+        start_time = time.time()
+        last_save = start_time
+        failed = []
+
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as pool:
+            futures = [pool.submit(self._fetch_segment, url, part, segment) for segment in pending]
+            while not all(future.done() for future in futures):
+                time.sleep(0.25)
+                self._update(self._done(manifest), total, start_time)
+                if self._canceled():
+                    self._stop.set()
+                if time.time() - last_save >= MANIFEST_INTERVAL:
+                    self._save_manifest(manifest, manifest_file)
+                    last_save = time.time()
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.log("[Downloader] Segment failed: {0}".format(e), level=xbmc.LOGERROR)
+                    failed.append(e)
+
+        self._save_manifest(manifest, manifest_file)
+        self._update(self._done(manifest), total, start_time)
+        return not failed and not self._stop.is_set() and self._done(manifest) == total
+
+    def _fetch_segment(self, url, part, segment):
+        attempts = 0
+        length = segment['end'] - segment['start'] + 1
+
+        while segment['done'] < length and not self._stop.is_set():
+            offset = segment['start'] + segment['done']
+            try:
+                response = tools.get_session().get(url, headers={'Range': 'bytes={0}-{1}'.format(offset, segment['end'])},
+                                                   stream=True, timeout=tools.URL_TIMEOUT)
+                try:
+                    if response.status_code != 206:
+                        raise IOError('Range request returned status {0}'.format(response.status_code))
+                    with open(part, 'r+b', buffering=0) as f:
+                        f.seek(offset)
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            chunk = chunk[:length - segment['done']]
+                            f.write(chunk)
+                            with self._lock:
+                                segment['done'] += len(chunk)
+                                self._received += len(chunk)
+                            if self._stop.is_set() or segment['done'] >= length:
+                                break
+                finally:
+                    response.close()
+                if segment['done'] < length and not self._stop.is_set():
+                    # A short or empty body counts as a failed attempt
+                    raise IOError('Connection closed at byte {0} of {1}'.format(segment['start'] + segment['done'], segment['end']))
+            except Exception as e:
+                attempts += 1
+                if attempts > SEGMENT_RETRIES:
+                    raise
+                logging.log("[Downloader] Retrying segment at {0} ({1}): {2}".format(offset, attempts, e), level=xbmc.LOGDEBUG)
+                time.sleep(min(2 ** attempts, 30))
+
+    def _canceled(self):
+        if self.progress_dialog_bg:
+            return False
+        try:
+            return self.progress_dialog.iscanceled()
+        except:
+            return False
+
+    def _update(self, downloaded, total, start_time):
+        done = int(100 * downloaded / total) if total else 0
+        #####################################################
+        # KODI-RD-IL
+        try:
+            kbps_speed = self._received / (time.time() - start_time)
+        except:
+            kbps_speed = 0
+            pass
+        #####################################################
+
+        if kbps_speed > 0 and total and not done >= 100:
+            eta = (total - downloaded) / kbps_speed
+        else:
+            eta = 0
+
+        kbps_speed = kbps_speed / 1024
+        type_speed = 'KB'
+
+        if kbps_speed >= 1024:
+            kbps_speed = kbps_speed / 1024
+            type_speed = 'MB'
+
+        currently_downloaded = '[COLOR %s][B]Size:[/B] [COLOR %s]%.02f[/COLOR] MB of [COLOR %s]%.02f[/COLOR] MB[/COLOR]' % (CONFIG.COLOR2, CONFIG.COLOR1, downloaded / MB, CONFIG.COLOR1, (total or 0) / MB)
+        speed = '[COLOR %s][B]Speed:[/B] [COLOR %s]%.02f [/COLOR]%s/s ' % (CONFIG.COLOR2, CONFIG.COLOR1, kbps_speed, type_speed)
+        div = divmod(eta, 60)
+        speed += '[B]ETA:[/B] [COLOR %s]%02d:%02d[/COLOR][/COLOR]' % (CONFIG.COLOR1, div[0], div[1])
+
+        #####################################################
+        # KODI-RD-IL
+        if self.progress_dialog_bg:
+            self.progress_dialog.update(done)
+        else:
+            self.progress_dialog.update(done, '\n' + str(currently_downloaded) + '\n' + str(speed))
+        #####################################################
@@ -20,6 +20,7 @@
 import xbmc
 import xbmcgui
 
+import re
 import sys
 try:  # Python 3
     import zipfile
@@ -29,9 +30,13 @@ except ImportError:  # Python 2
 from resources.libs.common.config import CONFIG
 from resources.libs.common import logging
 from resources.libs.common import tools
-from resources.libs.common import custom_save_data_config
+from resources.libs.common.progress import ProgressReporter
+from resources.libs.common.lazy import lazy_import
 from resources.libs import install
 
+# Fetches its config from GitHub, so only load it when actually used
+custom_save_data_config = lazy_import('resources.libs.common.custom_save_data_config')
+
 
                        
 ########################################################################################################################################################
@@ -115,16 +120,124 @@ def all(_in, _out, ignore=None, title=None, progress_dialog_bg=False):
     return all_with_progress(_in, _out, progress_dialog, ignore, title, progress_dialog_bg)
 
 
+def whitelist_excludes():
+    from resources.libs import whitelist
+
+    excludes = []
+    white_list = whitelist.whitelist('read')
+    for item in white_list:
+        try:
+            name, id, fold = item
+        except:
+            pass
+        excludes.append(fold)
+    return excludes
+
+
+class SkipRules:
+    KEEP = 'keep'
+    SKIP = 'skip'
+    EXTRACT = 'extract'
+
+    def __init__(self, ignore=None, excludes=None):
+        keep_files = [('userdata/sources.xml', CONFIG.KEEPSOURCES),
+                      ('userdata/favourites.xml', CONFIG.KEEPFAVS),
+                      ('userdata/profiles.xml', CONFIG.KEEPPROFILES),
+                      ('userdata/guisettings.xml', CONFIG.KEEPGUISETTINGS),
+                      ('userdata/playercorefactory.xml', CONFIG.KEEPPLAYERCORE),
+                      ('userdata/advancedsettings.xml', CONFIG.KEEPADVANCED),
+                      # KODI RD ISRAEL - Skip Addons33.db if CONFIG.KEEPADDONS33DB is enabled.
+                      ('userdata/Database/Addons33.db', CONFIG.KEEPADDONS33DB)]
+        self.keep_files = frozenset(name for name, setting in keep_files if setting == 'true')
+        self.keep_folders = frozenset(whitelist_excludes() if excludes is None else excludes)
+        self.skip_names = frozenset(CONFIG.LOGFILES) | frozenset(CONFIG.EXCLUDE_FILES)
+
+        keep_patterns = []
+        if CONFIG.KEEPSUPER == 'true':
+            keep_patterns.append(re.escape('plugin.program.super.favourites'))
+        skip_patterns = [r'\.csv$']
+        if ignore is None:
+            skip_patterns.append(re.escape(CONFIG.ADDON_ID))
+        patterns = ['(?P<skip>{0})'.format('|'.join(skip_patterns))]
+        if keep_patterns:
+            patterns.append('(?P<keep>{0})'.format('|'.join(keep_patterns)))
+        self.pattern = re.compile('|'.join(patterns))
+
+    def classify(self, filename):
+        if filename in self.keep_files:
+            return self.KEEP
+
+        parts = filename.split('/', 3)
+        if len(parts) > 1:
+            if parts[0] == 'addons' and parts[1] in self.keep_folders:
+                return self.KEEP
+            if len(parts) > 2 and parts[0] == 'userdata' and parts[1] == 'addon_data' and parts[2] in self.keep_folders:
+                return self.KEEP
+
+        if filename.rsplit('/', 1)[-1] in self.skip_names:
+            return self.SKIP
+
+        match = self.pattern.search(filename)
+        if match:
+            return self.KEEP if match.lastgroup == 'keep' else self.SKIP
+        return self.EXTRACT
+
+    def skip(self, filename):
+        return self.classify(filename) != self.EXTRACT
+
+
+def plan(_in, ignore=None):
+    rules = SkipRules(ignore)
+    result = {SkipRules.KEEP: [], SkipRules.SKIP: [], SkipRules.EXTRACT: []}
+
+    with zipfile.ZipFile(_in, 'r', allowZip64=True) as zin:
+        for filename in zin.namelist():
+            result[rules.classify(filename)].append(filename)
+    return result
+
+
+def progress_lines(title, errors, count, total, size, zipsize, filename):
+    line1 = '{0} [COLOR {1}][B][Errors:{2}][/B][/COLOR]'.format(title,
+                                                                CONFIG.COLOR2,
+                                                                errors)
+    line2 = '[COLOR {0}][B]File:[/B][/COLOR] [COLOR {1}]{2}/{3}[/COLOR] '.format(CONFIG.COLOR2,
+                                                                                 CONFIG.COLOR1,
+                                                                                 count,
+                                                                                 int(total))
+    line2 += '[COLOR {0}][B]Size:[/B][/COLOR] [COLOR {1}]{2}/{3}[/COLOR]'.format(CONFIG.COLOR2,
+                                                                                 CONFIG.COLOR1,
+                                                                                 tools.convert_size(size),
+                                                                                 zipsize)
+    line3 = '[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, filename)
+    return line1 + '\n' + line2 + '\n' + line3
+
+
+def error_message(filename, e):
+    file = str(filename).split('/')
+    errormsg = "[COLOR {0}]File:[/COLOR] [COLOR {1}]{2}[/COLOR]\n".format(CONFIG.COLOR2,
+                                                                          CONFIG.COLOR1,
+                                                                          file[-1])
+    errormsg += "[COLOR {0}]Folder:[/COLOR] [COLOR {1}]{2}[/COLOR]\n".format(CONFIG.COLOR2,
+                                                                             CONFIG.COLOR1,
+                                                                             filename.replace(file[-1], ''))
+    errormsg += "[COLOR {0}]Error:[/COLOR] [COLOR {1}]{2}[/COLOR]\n\n".format(CONFIG.COLOR2,
+                                                                              CONFIG.COLOR1,
+                                                                              str(e).replace('\\\\', '\\')
+                                                                              .replace("'{0}'"
+                                                                              .format(filename), ''))
+    return errormsg
+
+
 # def all_with_progress(_in, _out, dp, ignore, title):
 def all_with_progress(_in, _out, dp, ignore, title, progress_dialog_bg):
-    from resources.libs import whitelist
+    from resources.libs import unzip
 
     count = 0
     errors = 0
     error = ''
     update = 0
     size = 0
-    excludes = []
+    prog = 0
 
     try:
         zin = zipfile.ZipFile(_in,  'r', allowZip64=True)
@@ -134,21 +247,19 @@ def all_with_progress(_in, _out, dp, ignore, title, progress_dialog_bg):
         logging.log('Error Checking Zip: {0}'.format(str(e)), level=xbmc.LOGERROR)
         return update, errors, error
 
-    white_list = whitelist.whitelist('read')
-    for item in white_list:
-        try:
-            name, id, fold = item
-        except:
-            pass
-        excludes.append(fold)
+    rules = SkipRules(ignore)
+    reporter = ProgressReporter(dp, cancelable=not progress_dialog_bg)
 
-    nFiles = float(len(zin.namelist()))
-    zipsize = tools.convert_size(sum([item.file_size for item in zin.infolist()]))
+    with zin:
+        infolist = zin.infolist()
+    nFiles = float(len(infolist))
+    zipsize = tools.convert_size(sum([item.file_size for item in infolist]))
 
     zipit = str(_in).replace('\\', '/').split('/')
     title = title if title else zipit[-1].replace('.zip', '')
 
-    for item in zin.infolist():
+    items = []
+    for item in infolist:
         
         try:
             str(item.filename).encode('ascii')
@@ -160,88 +271,31 @@ def all_with_progress(_in, _out, dp, ignore, title, progress_dialog_bg):
             continue
             
         count += 1
-        prog = int(count / nFiles * 100)
-        size += item.file_size
-        file = str(item.filename).split('/')
-        skip = False
-        
-        line1 = '{0} [COLOR {1}][B][Errors:{2}][/B][/COLOR]'.format(title,
-                                                                    CONFIG.COLOR2,
-                                                                    errors)
-        line2 = '[COLOR {0}][B]File:[/B][/COLOR] [COLOR {1}]{2}/{3}[/COLOR] '.format(CONFIG.COLOR2,
-                                                                                     CONFIG.COLOR1,
-                                                                                     count,
-                                                                                     int(nFiles))
-        line2 += '[COLOR {0}][B]Size:[/B][/COLOR] [COLOR {1}]{2}/{3}[/COLOR]'.format(CONFIG.COLOR2,
-                                                                                     CONFIG.COLOR1,
-                                                                                     tools.convert_size(size),
-                                                                                     zipsize)
-        line3 = '[COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, item.filename)
-        
-        if item.filename == 'userdata/sources.xml' and CONFIG.KEEPSOURCES == 'true':
-            skip = True
-        elif item.filename == 'userdata/favourites.xml' and CONFIG.KEEPFAVS == 'true':
-            skip = True
-        elif item.filename == 'userdata/profiles.xml' and CONFIG.KEEPPROFILES == 'true':
-            skip = True
-        elif item.filename == 'userdata/guisettings.xml' and CONFIG.KEEPGUISETTINGS == 'true':
-            skip = True
-        elif item.filename == 'userdata/playercorefactory.xml' and CONFIG.KEEPPLAYERCORE == 'true':
-            skip = True
-        elif item.filename == 'userdata/advancedsettings.xml' and CONFIG.KEEPADVANCED == 'true':
-            skip = True
-        # KODI RD ISRAEL - Skip Addons33.db if CONFIG.KEEPADDONS33DB is enabled.
-        elif item.filename == 'userdata/Database/Addons33.db' and CONFIG.KEEPADDONS33DB == 'true':
-            logging.log("KODI RD ISRAEL - EXTRACT.PY: Skipping Addons33.db - CONFIG.KEEPADDONS33DB is: {0}".format(CONFIG.KEEPADDONS33DB))
-            skip = True
-        elif file[0] == 'addons' and file[1] in excludes:
-            skip = True
-        elif file[0] == 'userdata' and file[1] == 'addon_data' and file[2] in excludes:
-            skip = True
-        elif file[-1] in CONFIG.LOGFILES:
-            skip = True
-        elif file[-1] in CONFIG.EXCLUDE_FILES:
-            skip = True
-        elif file[-1].endswith('.csv'):
-            skip = True
-        elif not str(item.filename).find('plugin.program.super.favourites') == -1 and CONFIG.KEEPSUPER == 'true':
-            skip = True
-        elif not str(item.filename).find(CONFIG.ADDON_ID) == -1 and ignore is None:
-            skip = True
-        if skip:
+        if rules.skip(item.filename):
             logging.log("Skipping: {0}".format(item.filename))
+            size += item.file_size
         else:
-            try:
-                zin.extract(item, _out)
-            except Exception as e:
-                errormsg = "[COLOR {0}]File:[/COLOR] [COLOR {1}]{2}[/COLOR]\n".format(CONFIG.COLOR2,
-                                                                                      CONFIG.COLOR1,
-                                                                                      file[-1])
-                errormsg += "[COLOR {0}]Folder:[/COLOR] [COLOR {1}]{2}[/COLOR]\n".format(CONFIG.COLOR2,
-                                                                                         CONFIG.COLOR1,
-                                                                                         item.filename.replace(file[-1], ''))
-                errormsg += "[COLOR {0}]Error:[/COLOR] [COLOR {1}]{2}[/COLOR]\n\n".format(CONFIG.COLOR2,
-                                                                                          CONFIG.COLOR1,
-                                                                                          str(e).replace('\\\\', '\\')
-                                                                                          .replace("'{0}'"
-                                                                                          .format(item.filename), ''))
-                errors += 1
-                error += errormsg
-                logging.log('Error Extracting: {0}({1})'.format(item.filename, str(e)), level=xbmc.LOGERROR)
-                pass
-        dp.update(prog, line1 + '\n' + line2 + '\n' + line3)
+            items.append(item)
+
+    def label(done, done_size, filename):
+        return progress_lines(title, errors, count - len(items) + done, nFiles, size + done_size, zipsize, filename)
+
+    def on_error(filename, e):
+        nonlocal errors, error
+        errors += 1
+        error += error_message(filename, e)
+        logging.log('Error Extracting: {0}({1})'.format(filename, str(e)), level=xbmc.LOGERROR)
+
+    if unzip.run(_in, _out, items, reporter, label, on_error):
+        prog = int(count / nFiles * 100) if nFiles else 0
+
     #####################################################
     # KODI-RD-IL
-        if not progress_dialog_bg:
-            if dp.iscanceled():
-                break
-            
-    if not progress_dialog_bg:
-        if dp.iscanceled():
-            dp.close()
-            logging.log_notify(CONFIG.ADDONTITLE,
-                               "[COLOR {0}]Extract Cancelled[/COLOR]".format(CONFIG.COLOR2))
-            sys.exit()
+    if reporter.canceled():
+        dp.close()
+        logging.log_notify(CONFIG.ADDONTITLE,
+                           "[COLOR {0}]Extract Cancelled[/COLOR]".format(CONFIG.COLOR2))
+        sys.exit()
     #####################################################
         
     # AMADEUS    
@@ -86,12 +86,9 @@ class BuildMenu:
 
     def get_listing(self):
         from resources.libs import test
-        
-        response = tools.open_url(CONFIG.BUILDFILE)
-        
-        if response:
-            link = tools.clean_text(response.text)
-        else:
+        from resources.libs.catalog import CATALOG
+
+        if not CATALOG.available():
             directory.add_file('גרסת קודי: {0}'.format(CONFIG.KODIV), icon=CONFIG.ICONBUILDS,
                                themeit=CONFIG.THEME3)
             directory.add_dir('תפריט שמירת נתונים', {'mode': 'savedata'}, icon=CONFIG.ICONSAVE, themeit=CONFIG.THEME3)
@@ -102,7 +99,8 @@ class BuildMenu:
 
         total, count20, count21, adultcount, hidden = check.build_count()
 
-        match = re.compile('name="(.+?)".+?ersion="(.+?)".+?rl="(.+?)".+?ui="(.+?)".+?odi="(.+?)".+?heme="(.+?)".+?con="(.+?)".+?anart="(.+?)".+?dult="(.+?)".+?escription="(.+?)"').findall(link)
+        match = [(b.name, b.version, b.url, b.gui, b.kodi, b.theme, b.icon, b.fanart, b.adult, b.description)
+                 for b in CATALOG.get_builds()]
         
         if total == 1:
             for name, version, url, gui, kodi, theme, icon, fanart, adult, description in match:
@@ -149,24 +147,22 @@ class BuildMenu:
                                themeit=CONFIG.THEME3)
 
     def view_build(self, name):
+        from resources.libs.catalog import CATALOG
     
-        response = tools.open_url(CONFIG.BUILDFILE)
-        
-        if response:
-            link = tools.clean_text(response.text)
-        else:
+        if not CATALOG.available():
             directory.add_file('URL for txt file not valid', themeit=CONFIG.THEME3)
             directory.add_file('{0}'.format(CONFIG.BUILDFILE), themeit=CONFIG.THEME3)
             return
 
-        if not check.check_build(name, 'version'):
+        build = CATALOG.get_build(name)
+
+        if not build:
             directory.add_file('Error reading the txt file.', themeit=CONFIG.THEME3)
             directory.add_file('{0} was not found in the builds list.'.format(name), themeit=CONFIG.THEME3)
             return
 
-        match = re.compile(
-            'name="%s".+?ersion="(.+?)".+?rl="(.+?)".+?ui="(.+?)".+?odi="(.+?)".+?heme="(.+?)".+?con="(.+?)".+?anart="(.+?)".+?review="(.+?)".+?dult="(.+?)".+?nfo="(.+?)".+?escription="(.+?)"' % name).findall(
-            link)
+        match = [(build.version, build.url, build.gui, build.kodi, build.theme, build.icon, build.fanart,
+                  build.preview, build.adult, build.info, build.description)]
             
         for version, url, gui, kodi, themefile, icon, fanart, preview, adult, info, description in match:
             build = '{0} (v{1})'.format(name, version)
@@ -230,13 +226,12 @@ class BuildMenu:
 
     def build_info(self, name):
         from resources.libs import check
+        from resources.libs.catalog import CATALOG
         from resources.libs.common import logging
         from resources.libs.common import tools
         from resources.libs.gui import window
         
-        response = tools.open_url(CONFIG.BUILDFILE, check=True)
-        
-        if response:
+        if CATALOG.available():
             if check.check_build(name, 'url'):
                 name, version, url, minor, gui_ignore, kodi, theme, icon, fanart, preview, adult, info, description = check.check_build(name, 'all')
                 adult = 'Yes' if adult.lower() == 'yes' else 'No'
@@ -284,12 +279,11 @@ class BuildMenu:
     def build_video(self, name):
         from resources.libs import check
         from resources.libs import yt
+        from resources.libs.catalog import CATALOG
         from resources.libs.common import logging
         from resources.libs.common import tools
         
-        response = tools.open_url(CONFIG.BUILDFILE, check=True)
-        
-        if response:
+        if CATALOG.available():
             videofile = check.check_build(name, 'preview')
             if tools.open_url(videofile, check=True):
                 yt.play_video(videofile)
@@ -27,6 +27,7 @@ class MainMenu:
 
     def get_listing(self):
         from resources.libs import check
+        from resources.libs.catalog import CATALOG
         from resources.libs.common import logging
         from resources.libs.common import tools
 
@@ -34,9 +35,7 @@ class MainMenu:
         errorsfound = str(errors) + ' Error(s) Found' if errors > 0 else 'None Found'
 
         if CONFIG.AUTOUPDATE == 'Yes':
-            response = tools.open_url(CONFIG.BUILDFILE, check=True)
-
-            if response:
+            if CATALOG.available():
                 ver = check.check_wizard('version')
                 if ver:
                     if ver > CONFIG.ADDON_VERSION:
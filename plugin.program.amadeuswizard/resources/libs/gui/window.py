@@ -598,9 +598,12 @@ def show_notification_with_extra_image(msg, image_id, ExtraImageURL):
 
 
 def show_log_viewer(window_title="Viewing Log File", window_msg=None, log_file=None, ext_buttons=False):
+    from resources.libs.common.logreader import LogReader
+
     class LogViewer(xbmcgui.WindowXMLDialog):
         def __init__(self, *args, **kwargs):
             self.log_file = kwargs['log_file']
+            self.reader = None
 
         def onInit(self):
             self.title = 101
@@ -611,48 +614,77 @@ def show_log_viewer(window_title="Viewing Log File", window_msg=None, log_file=N
             self.oldlog = 203
             self.wizardlog = 204
             self.closebutton = 205
+            self.olderbutton = 206
+            self.searchbutton = 207
 
-            if window_msg is None:
-                self.logmsg = tools.read_from_file(self.log_file)
-            else:
-                self.logmsg = window_msg
-            self.logfile = os.path.basename(self.log_file)
-            
             self.buttons = 'true' if ext_buttons else 'false'
             
             self.setProperty('texture.color1', CONFIG.COLOR1)
             self.setProperty('texture.color2', CONFIG.COLOR2)
             self.setProperty('message.title', window_title)
-            self.setProperty('message.logmsg', highlight_text(self.logmsg))
-            self.setProperty('message.logfile', self.logfile)
             self.setProperty('message.buttons', self.buttons)
 
+            if window_msg is None:
+                self.open_log(self.log_file)
+            else:
+                self.logmsg = window_msg
+                self.setProperty('message.paging', 'false')
+                self.setProperty('message.searchable', 'false')
+                self.setProperty('message.logmsg', highlight_text(self.logmsg))
+                self.setProperty('message.logfile', os.path.basename(self.log_file))
+
+        def open_log(self, log_file):
+            # Only the end of the log is read, older pages on request
+            self.log_file = log_file
+            self.reader = LogReader(logging.log_files(log_file))
+            self.logmsg = self.reader.tail()
+            self.show_page()
+
+        def show_page(self):
+            self.setProperty('message.paging', 'false' if self.reader.at_start else 'true')
+            self.setProperty('message.searchable', 'true')
+            self.setProperty('message.logmsg', highlight_text(self.logmsg))
+            self.setProperty('message.logfile', '{0} ({1})'.format(os.path.basename(self.log_file),
+                                                                   tools.convert_size(self.reader.size)))
+
+        def search(self):
+            term = xbmcgui.Dialog().input("Search log (prefix with re: for a regular expression)")
+            if not term:
+                return
+            regex = term.startswith('re:')
+            pattern = term[3:] if regex else term
+            try:
+                results = self.reader.search(pattern, regex=regex)
+            except re.error as e:
+                self.setProperty('message.logmsg', "Invalid regular expression: {0}".format(e))
+                return
+            header = "[B]{0} matching line(s) for {1}[/B]\n".format(len(results), pattern)
+            self.setProperty('message.logmsg', header + highlight_text('\n'.join(results)))
+
         def onClick(self, controlId):
             if controlId == self.closebutton:
                 self.close()
             elif controlId == self.upload:
                 self.close()
                 logging.upload_log()
+            elif controlId == self.olderbutton and self.reader:
+                self.logmsg = self.reader.older() + self.logmsg
+                self.show_page()
+            elif controlId == self.searchbutton and self.reader:
+                self.search()
             elif controlId in [self.kodilog, self.oldlog, self.wizardlog]:
                 if controlId == self.kodilog:
-                    newmsg = logging.grab_log()
                     filename = logging.grab_log(file=True)
                 elif controlId == self.oldlog:
-                    newmsg = logging.grab_log(old=True)
                     filename = logging.grab_log(file=True, old=True)
                 elif controlId == self.wizardlog:
-                    newmsg = logging.grab_log(wizard=True)
                     filename = logging.grab_log(file=True, wizard=True)
                 
-                if not newmsg:
+                if not filename:
                     self.setProperty('message.title', "Error Viewing Log File")
                     self.setProperty('message.logmsg', "File does not exist or could not be read.")
                 else:
-                    self.logmsg = newmsg
-                    self.logfile = os.path.basename(filename)
-                
-                    self.setProperty('message.logmsg', highlight_text(self.logmsg))
-                    self.setProperty('message.logfile', self.logfile)
+                    self.open_log(filename)
 
         def onAction(self, action):
             if action.getId() in BACK_ACTIONS:
@@ -28,6 +28,7 @@ import shutil
 
 from resources.libs.common.config import CONFIG
 from resources.libs.common import logging
+from resources.libs.common.progress import ProgressReporter
 
 
 
@@ -332,7 +333,7 @@ def wipe():
         loginit.auto_update('all')
         CONFIG.set_setting('loginnextsave', str(tools.get_date(days=3, formatted=True)))
 
-    exclude_dirs = CONFIG.EXCLUDES
+    exclude_dirs = list(CONFIG.EXCLUDES)
     exclude_dirs.append('My_Builds')
     
     progress_dialog = xbmcgui.DialogProgress()
@@ -342,8 +343,6 @@ def wipe():
     update.addon_updates('set')
     xbmcPath = os.path.abspath(CONFIG.HOME)
     progress_dialog.create(CONFIG.ADDONTITLE, "[COLOR {0}]Calculating files and folders".format(CONFIG.COLOR2) + '\n' + '\n' + 'Please Wait![/COLOR]')
-    total_files = sum([len(files) for r, d, files in os.walk(xbmcPath)])
-    del_file = 0
     progress_dialog.update(0, "[COLOR {0}]Gathering Excludes list.[/COLOR]".format(CONFIG.COLOR2))
     if CONFIG.KEEPREPOS == 'true':
         repos = glob.glob(os.path.join(CONFIG.ADDONS, 'repo*/'))
@@ -378,64 +377,20 @@ def wipe():
     for item in CONFIG.DEPENDENCIES:
         exclude_dirs.append(item)
 
-    progress_dialog.update(0, "[COLOR {0}]Clearing out files and folders:".format(CONFIG.COLOR2))
+    from resources.libs import wipe as wipe_engine
+
     latestAddonDB = db.latest_db('Addons')
-    for root, dirs, files in os.walk(xbmcPath, topdown=True):
-        dirs[:] = [d for d in dirs if d not in exclude_dirs]
-        for name in files:
-            del_file += 1
-            fold = root.replace('/', '\\').split('\\')
-            x = len(fold)-1
-            if name == 'sources.xml' and fold[-1] == 'userdata' and CONFIG.KEEPSOURCES == 'true':
-                logging.log("Keep sources.xml: {0}".format(os.path.join(root, name)))
-            elif name == 'favourites.xml' and fold[-1] == 'userdata' and CONFIG.KEEPFAVS == 'true':
-                logging.log("Keep favourites.xml: {0}".format(os.path.join(root, name)))
-            elif name == 'profiles.xml' and fold[-1] == 'userdata' and CONFIG.KEEPPROFILES == 'true':
-                logging.log("Keep profiles.xml: {0}".format(os.path.join(root, name)))
-            elif name == 'playercorefactory.xml' and fold[-1] == 'userdata' and CONFIG.KEEPPLAYERCORE == 'true':
-                logging.log("Keep playercorefactory.xml: {0}".format(os.path.join(root, name)))
-            elif name == 'guisettings.xml' and fold[-1] == 'userdata' and CONFIG.KEEPGUISETTINGS == 'true':
-                logging.log("Keep guisettings.xml: {0}".format(os.path.join(root, name)))
-            elif name == 'advancedsettings.xml' and fold[-1] == 'userdata' and CONFIG.KEEPADVANCED == 'true':
-                logging.log("Keep advancedsettings.xml: {0}".format(os.path.join(root, name)))
-            elif name == 'Addons33.db' and fold[-1] == 'Database'  and fold[-2] == 'userdata' and CONFIG.KEEPADDONS33DB == 'true':
-                logging.log("Keep Addons33.db: {0} - CONFIG.KEEPADDONS33DB is: {1}".format(os.path.join(root, name), CONFIG.KEEPADDONS33DB))
-            elif name in CONFIG.LOGFILES:
-                logging.log("Keep Log File: {0}".format(name))
-            elif name.endswith('.db'):
-                try:
-                    if name == latestAddonDB:
-                        logging.log("Ignoring {0} on Kodi {1}".format(name, tools.kodi_version()))
-                    else:
-                        os.remove(os.path.join(root, name))
-                except Exception as e:
-                    if not name.startswith('Textures13'):
-                        logging.log('Failed to delete, Purging DB')
-                        logging.log("-> {0}".format(str(e)))
-                        db.purge_db_file(os.path.join(root, name))
-            else:
-                progress_dialog.update(int(tools.percentage(del_file, total_files)), '\n' + '[COLOR {0}]File: [/COLOR][COLOR {1}]{2}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, name))
-                try:
-                    os.remove(os.path.join(root, name))
-                except Exception as e:
-                    logging.log("Error removing {0}".format(os.path.join(root, name)))
-                    logging.log("-> / {0}".format(str(e)))
-        if progress_dialog.iscanceled():
-            progress_dialog.close()
-            logging.log_notify(CONFIG.ADDONTITLE,
-                               "[COLOR {0}]Fresh Start Cancelled[/COLOR]".format(CONFIG.COLOR2))
-            return False
-    for root, dirs, files in os.walk(xbmcPath, topdown=True):
-        dirs[:] = [d for d in dirs if d not in exclude_dirs]
-        for name in dirs:
-            progress_dialog.update(100, '\n' + 'Cleaning Up Empty Folder: [COLOR {0}]{1}[/COLOR]'.format(CONFIG.COLOR1, name))
-            if name not in ["Database", "userdata", "temp", "addons", "addon_data"]:
-                shutil.rmtree(os.path.join(root, name), ignore_errors=True, onerror=None)
-        if progress_dialog.iscanceled():
-            progress_dialog.close()
-            logging.log_notify(CONFIG.ADDONTITLE,
-                               "[COLOR {0}]Fresh Start Cancelled[/COLOR]".format(CONFIG.COLOR2))
-            return False
+    plan = wipe_engine.build_plan(xbmcPath, exclude_dirs, latestAddonDB)
+    logging.log("Fresh Start: removing {0} files, keeping {1} items".format(plan.total, len(plan.kept)))
+
+    progress_dialog.update(0, "[COLOR {0}]Clearing out files and folders:".format(CONFIG.COLOR2))
+    reporter = ProgressReporter(progress_dialog)
+    if not wipe_engine.run(plan, reporter,
+                           label=lambda done, total: '\n' + '[COLOR {0}]Files: [/COLOR][COLOR {1}]{2}/{3}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, done, total)):
+        progress_dialog.close()
+        logging.log_notify(CONFIG.ADDONTITLE,
+                           "[COLOR {0}]Fresh Start Cancelled[/COLOR]".format(CONFIG.COLOR2))
+        return False
             
     progress_dialog.close()
     CONFIG.clear_setting('build')
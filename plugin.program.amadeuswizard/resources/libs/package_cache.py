@@ -0,0 +1,189 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import xbmc
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from resources.libs.common import logging
+from resources.libs.common.config import CONFIG
+
+MB = 1024 * 1024
+HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(src, dest):
+    tmp = '{0}.tmp'.format(dest)
+    try:
+        os.remove(tmp)
+    except OSError:
+        pass
+    try:
+        os.link(src, tmp)
+    except (OSError, AttributeError):
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class PackageCache:
+    """Content-addressed store for downloaded packages.
+
+    Blobs are named by their sha256, so the same zip published under several
+    urls is kept once. Urls map to a blob together with the ETag, Last-Modified
+    and size they were served with, and only reuse it while those still match.
+    The least recently used blobs are evicted past CONFIG.PACKAGECACHESIZE MB.
+    """
+
+    def __init__(self, folder=None, max_size=None):
+        self.folder = folder or CONFIG.PACKAGE_CACHE
+        self.index_file = os.path.join(self.folder, 'index.json')
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        if self._max_size is not None:
+            return self._max_size
+        try:
+            return int(float(CONFIG.PACKAGECACHESIZE)) * MB
+        except:
+            return 0
+
+    def _blob(self, sha):
+        return os.path.join(self.folder, '{0}.bin'.format(sha))
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except:
+            index = {}
+        index.setdefault('urls', {})
+        index.setdefault('blobs', {})
+        return index
+
+    def _save(self, index):
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        tmp = '{0}.tmp'.format(self.index_file)
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, self.index_file)
+
+    def _drop(self, index, sha):
+        index['blobs'].pop(sha, None)
+        for url in [url for url, entry in index['urls'].items() if entry['sha256'] == sha]:
+            del index['urls'][url]
+        try:
+            os.remove(self._blob(sha))
+        except OSError:
+            pass
+
+    def _evict(self, index):
+        total = sum(blob['size'] for blob in index['blobs'].values())
+        for sha, blob in sorted(index['blobs'].items(), key=lambda item: item[1]['used']):
+            if total <= self.max_size:
+                break
+            logging.log("[Package Cache] Evicting {0}".format(sha), level=xbmc.LOGDEBUG)
+            total -= blob['size']
+            self._drop(index, sha)
+
+    def fetch(self, url, headers, size, dest):
+        """Copies a cached package for url to dest. Returns True on a hit."""
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        if self.max_size <= 0 or not (etag or last_modified):
+            return False
+
+        with self._lock:
+            index = self._load()
+            entry = index['urls'].get(url)
+            if not entry or entry['etag'] != etag or entry['last_modified'] != last_modified \
+                    or (size is not None and entry['size'] != size):
+                return False
+
+            sha = entry['sha256']
+            blob = self._blob(sha)
+            try:
+                valid = os.path.getsize(blob) == entry['size'] and file_sha256(blob) == sha
+            except OSError:
+                valid = False
+            if not valid:
+                logging.log("[Package Cache] Discarding corrupt entry for {0}".format(url), level=xbmc.LOGWARNING)
+                self._drop(index, sha)
+                self._save(index)
+                return False
+
+            try:
+                _link_or_copy(blob, dest)
+            except Exception as e:
+                logging.log("[Package Cache] Unable to copy {0}: {1}".format(blob, e), level=xbmc.LOGERROR)
+                return False
+
+            index['blobs'][sha]['used'] = time.time()
+            self._save(index)
+
+        logging.log("[Package Cache] Hit for {0}".format(url))
+        return True
+
+    def store(self, url, headers, path):
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        if self.max_size <= 0 or not (etag or last_modified):
+            return
+
+        try:
+            size = os.path.getsize(path)
+            if size > self.max_size:
+                return
+            sha = file_sha256(path)
+
+            with self._lock:
+                index = self._load()
+                if not os.path.exists(self._blob(sha)):
+                    if not os.path.exists(self.folder):
+                        os.makedirs(self.folder)
+                    _link_or_copy(path, self._blob(sha))
+                index['blobs'][sha] = {'size': size, 'used': time.time()}
+                index['urls'][url] = {'sha256': sha, 'size': size,
+                                      'etag': etag, 'last_modified': last_modified}
+                self._evict(index)
+                self._save(index)
+        except Exception as e:
+            logging.log("[Package Cache] Unable to cache {0}: {1}".format(url, e), level=xbmc.LOGERROR)
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.folder, ignore_errors=True)
+
+
+CACHE = PackageCache()
@@ -0,0 +1,404 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import xbmc
+import xbmcgui
+
+import io
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+
+try:  # Python 3
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+from resources.libs import extract
+from resources.libs import install
+from resources.libs.common import logging
+from resources.libs.common import tools
+from resources.libs.common.config import CONFIG
+from resources.libs.common.progress import ProgressReporter
+
+# Enough for the end of central directory record, a maximum length comment
+# and the zip64 locator/record, so most archives need a single tail request
+TAIL_SIZE = 128 * 1024
+READ_AHEAD = 256 * 1024
+CHUNK_SIZE = 256 * 1024
+# Entries larger than this are spooled to disk instead of held in memory
+SPOOL_SIZE = 4 * 1024 * 1024
+QUEUE_SIZE = 8
+RETRIES = 5
+# A download-then-extract install is taken to fit without reading the
+# archive when the free space is at least this many times the zip's size
+ROOM_FACTOR = 4
+
+FILE_HEADER = struct.Struct('<4s2B4HL2L2H')
+FILE_HEADER_MAGIC = b'PK\003\004'
+FH_FILENAME_LENGTH = 10
+FH_EXTRA_FIELD_LENGTH = 11
+
+
+class _RemoteFile(io.RawIOBase):
+    """Seekable read-only view of a remote file, backed by Range requests."""
+
+    def __init__(self, url, size, tail_start, tail):
+        self.url = url
+        self.size = size
+        self.pos = 0
+        self._blocks = [(tail_start, tail)]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=0):
+        if whence == 0:
+            self.pos = offset
+        elif whence == 1:
+            self.pos += offset
+        else:
+            self.pos = self.size + offset
+        return self.pos
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = self.size - self.pos
+        end = min(self.pos + n, self.size)
+        if end <= self.pos:
+            return b''
+
+        for start, block in self._blocks:
+            if start <= self.pos and end <= start + len(block):
+                data = block[self.pos - start:end - start]
+                break
+        else:
+            fetch_end = max(end, min(self.pos + READ_AHEAD, self.size))
+            block = _fetch_range(self.url, self.pos, fetch_end - 1)
+            self._blocks.append((self.pos, block))
+            data = block[:end - self.pos]
+
+        self.pos += len(data)
+        return data
+
+
+def _fetch_range(url, start, end):
+    response = tools.get_session().get(url, headers={'Range': 'bytes={0}-{1}'.format(start, end)},
+                                       timeout=tools.URL_TIMEOUT)
+    if response.status_code != 206:
+        raise IOError('Range request returned status {0}'.format(response.status_code))
+    return response.content
+
+
+def _free_space(path):
+    while path and not os.path.exists(path):
+        path = os.path.dirname(path)
+    try:
+        return shutil.disk_usage(path).free
+    except Exception:
+        return None
+
+
+def has_room(url, path):
+    """Whether there is clearly room to download url to path and extract it,
+    judged from a HEAD request alone. False when it cannot tell."""
+    try:
+        response = tools.get_session().head(url, allow_redirects=True, timeout=tools.URL_TIMEOUT)
+        size = int(response.headers.get('content-length', 0))
+    except Exception:
+        return False
+    free = _free_space(path)
+    return bool(size) and free is not None and free > size * ROOM_FACTOR
+
+
+def _target_path(filename, out):
+    # Same sanitising zipfile.ZipFile.extract() applies to member names
+    arcname = filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid = ('', os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(x for x in arcname.split(os.path.sep) if x not in invalid)
+    return os.path.join(out, arcname)
+
+
+class StreamInstaller:
+    """Extracts a remote ZIP while it is still downloading.
+
+    The central directory is read first with ranged requests, then the body is
+    streamed once from the first local header. Each entry is handed to the
+    extractor as soon as all of its bytes have arrived, through a bounded
+    queue, so the archive itself never has to be stored on disk.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.size = 0
+        self.start_dir = 0
+        self.entries = []
+        self.received = 0
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._stop = threading.Event()
+
+    def open(self):
+        response = tools.open_url(self.url, headers={'Range': 'bytes=-{0}'.format(TAIL_SIZE)})
+
+        if not response or response.status_code != 206:
+            logging.log("[Stream Install] Range requests not supported for {0}".format(self.url))
+            return False
+
+        match = re.match(r'bytes\s+(\d+)-\d+/(\d+)', response.headers.get('content-range', ''))
+        if not match:
+            return False
+
+        self.size = int(match.group(2))
+        try:
+            zin = zipfile.ZipFile(_RemoteFile(self.url, self.size, int(match.group(1)), response.content), 'r', allowZip64=True)
+            infolist = zin.infolist()
+            self.start_dir = zin.start_dir
+        except Exception as e:
+            logging.log("[Stream Install] Unable to read central directory: {0}".format(e), level=xbmc.LOGERROR)
+            return False
+
+        for info in infolist:
+            if info.flag_bits & 0x1 or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                logging.log("[Stream Install] Unsupported entry, falling back to download: {0}".format(info.filename))
+                return False
+
+        self.entries = sorted(infolist, key=lambda info: info.header_offset)
+        return len(self.entries) > 0
+
+    def extracted_size(self):
+        return sum(info.file_size for info in self.entries)
+
+    def fits(self, path):
+        # Whether a regular download-then-extract install has room on disk
+        free = _free_space(path)
+        if free is None:
+            return True
+        return free > self.size + self.extracted_size()
+
+    def addons(self):
+        addonlist = []
+        for info in self.entries:
+            if str(info.filename).find('addon.xml') == -1:
+                continue
+            parts = str(info.filename).split('/')
+            if not parts[-2] in addonlist:
+                addonlist.append(parts[-2])
+        return addonlist
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _produce(self):
+        ends = [info.header_offset for info in self.entries[1:]] + [self.start_dir]
+        index = 0
+        attempts = 0
+
+        while index < len(self.entries) and not self._stop.is_set():
+            # Always (re)start on an entry boundary so a retry never needs partial state
+            pos = self.entries[index].header_offset
+            spool = None
+            try:
+                response = tools.get_session().get(self.url, headers={'Range': 'bytes={0}-{1}'.format(pos, self.start_dir - 1)},
+                                                   stream=True, timeout=tools.URL_TIMEOUT)
+                try:
+                    if response.status_code != 206:
+                        raise IOError('Range request returned status {0}'.format(response.status_code))
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        while chunk and index < len(self.entries):
+                            if spool is None:
+                                spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, dir=CONFIG.TEMP)
+                            data = chunk[:ends[index] - pos]
+                            spool.write(data)
+                            pos += len(data)
+                            self.received += len(data)
+                            chunk = chunk[len(data):]
+                            if pos >= ends[index]:
+                                self._put((self.entries[index], spool))
+                                spool = None
+                                index += 1
+                                attempts = 0
+                        if index >= len(self.entries) or self._stop.is_set():
+                            break
+                finally:
+                    response.close()
+                if index < len(self.entries) and not self._stop.is_set():
+                    raise IOError('Connection closed at byte {0} of {1}'.format(pos, self.start_dir))
+            except Exception as e:
+                if spool is not None:
+                    self.received -= spool.tell()
+                    spool.close()
+                attempts += 1
+                if attempts > RETRIES:
+                    self._put(e)
+                    return
+                logging.log("[Stream Install] Retrying from {0} ({1}): {2}".format(self.entries[index].header_offset, attempts, e), level=xbmc.LOGDEBUG)
+                time.sleep(min(2 ** attempts, 30))
+
+        self._put(None)
+
+    def _write(self, info, spool, _out):
+        target = _target_path(info.filename, _out)
+
+        if info.filename.endswith('/'):
+            if not os.path.isdir(target):
+                os.makedirs(target)
+            return
+
+        spool.seek(0)
+        header = FILE_HEADER.unpack(spool.read(FILE_HEADER.size))
+        if header[0] != FILE_HEADER_MAGIC:
+            raise zipfile.BadZipfile('Bad magic number for file header')
+        spool.seek(header[FH_FILENAME_LENGTH] + header[FH_EXTRA_FIELD_LENGTH], 1)
+
+        folder = os.path.dirname(target)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        decompressor = zlib.decompressobj(-15) if info.compress_type == zipfile.ZIP_DEFLATED else None
+        remaining = info.compress_size
+        crc = 0
+        with open(target, 'wb') as f:
+            while remaining > 0:
+                data = spool.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    raise zipfile.BadZipfile('Truncated file {0}'.format(info.filename))
+                remaining -= len(data)
+                if decompressor:
+                    data = decompressor.decompress(data)
+                crc = zlib.crc32(data, crc)
+                f.write(data)
+            if decompressor:
+                data = decompressor.flush()
+                crc = zlib.crc32(data, crc)
+                f.write(data)
+
+        if crc & 0xffffffff != info.CRC:
+            raise zipfile.BadZipfile('Bad CRC-32 for file {0}'.format(info.filename))
+
+    def extract(self, _out, ignore=None, title=None, progress_dialog_bg=False):
+        dp = xbmcgui.DialogProgressBG() if progress_dialog_bg else xbmcgui.DialogProgress()
+        dp.create(CONFIG.ADDONTITLE, "Extracting Content")
+
+        count = 0
+        errors = 0
+        error = ''
+        prog = 0
+        size = 0
+        rules = extract.SkipRules(ignore)
+        reporter = ProgressReporter(dp, cancelable=not progress_dialog_bg)
+
+        nFiles = float(len(self.entries))
+        zipsize = tools.convert_size(self.extracted_size())
+        title = title if title else self.url.split('/')[-1].replace('.zip', '')
+
+        # Large entries spool to Kodi's temp folder. A fresh start wipes it
+        # along with addons/packages, but always before extract() is called,
+        # so creating it here is enough
+        if not os.path.isdir(CONFIG.TEMP):
+            os.makedirs(CONFIG.TEMP)
+
+        producer = threading.Thread(target=self._produce)
+        producer.daemon = True
+        producer.start()
+
+        canceled = False
+        while True:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if reporter.canceled():
+                    canceled = True
+                    break
+                continue
+
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                errors += 1
+                error += extract.error_message(self.url, item)
+                logging.log('Error Downloading: {0}({1})'.format(self.url, str(item)), level=xbmc.LOGERROR)
+                break
+
+            info, spool = item
+            try:
+                try:
+                    str(info.filename).encode('ascii')
+                except (UnicodeDecodeError, UnicodeEncodeError):
+                    logging.log("[ASCII Check] Illegal character found in file: {0}".format(info.filename))
+                    continue
+
+                count += 1
+                prog = int(count / nFiles * 100)
+                size += info.file_size
+
+                if rules.skip(info.filename):
+                    logging.log("Skipping: {0}".format(info.filename))
+                else:
+                    try:
+                        self._write(info, spool, _out)
+                    except Exception as e:
+                        errors += 1
+                        error += extract.error_message(info.filename, e)
+                        logging.log('Error Extracting: {0}({1})'.format(info.filename, str(e)), level=xbmc.LOGERROR)
+            finally:
+                spool.close()
+
+            reporter.update(prog, lambda: extract.progress_lines(title, errors, count, nFiles, size, zipsize, info.filename))
+            if reporter.canceled():
+                canceled = True
+                break
+
+        self._stop.set()
+        producer.join(5)
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if isinstance(item, tuple):
+                item[1].close()
+
+        if canceled:
+            dp.close()
+            logging.log_notify(CONFIG.ADDONTITLE,
+                               "[COLOR {0}]Extract Cancelled[/COLOR]".format(CONFIG.COLOR2))
+            sys.exit()
+
+        # AMADEUS
+        install.restore_fentasticdata()
+
+        return prog, errors, error
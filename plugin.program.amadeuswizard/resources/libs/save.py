@@ -29,6 +29,7 @@ except ImportError:  # Python 2
     from resources.libs import zipfile
 
 from resources.libs.common.config import CONFIG
+from resources.libs.common import compression
 from resources.libs.common import logging
 from resources.libs.common import tools
 
@@ -207,15 +208,15 @@ def export_save_data():
             files = os.listdir(path)
             for file in files:
                 fn = os.path.join(path, file)
-                zipf.write(fn, os.path.join(fold, file), zipfile.ZIP_DEFLATED)
+                compression.write(zipf, fn, os.path.join(fold, file))
     if CONFIG.KEEPSUPER == 'true' and os.path.exists(superfold):
         for base, dirs, files in os.walk(superfold):
             for file in files:
                 fn = os.path.join(base, file)
-                zipf.write(fn, fn[len(CONFIG.ADDON_DATA):], zipfile.ZIP_DEFLATED)
+                compression.write(zipf, fn, fn[len(CONFIG.ADDON_DATA):])
     for item in CONFIG.XMLS:
         if keepx[CONFIG.XMLS.index(item)] == 'true' and os.path.exists(os.path.join(CONFIG.USERDATA, item)):
-            zipf.write(os.path.join(CONFIG.USERDATA, item), os.path.join('xmls', item), zipfile.ZIP_DEFLATED)
+            compression.write(zipf, os.path.join(CONFIG.USERDATA, item), os.path.join('xmls', item))
     zipf.close()
     
     dialog.ok(CONFIG.ADDONTITLE,
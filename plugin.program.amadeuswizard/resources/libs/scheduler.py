@@ -0,0 +1,196 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import xbmc
+
+import inspect
+import json
+import os
+import threading
+import time
+
+from resources.libs.common import logging
+from resources.libs.common.config import CONFIG
+
+STATE_FILE = os.path.join(CONFIG.PLUGIN_DATA, 'maintenance.json')
+# Seconds between idle checks while waiting
+POLL_INTERVAL = 5
+# Also treat Kodi as idle after this many seconds without input, for setups
+# that have no screensaver
+IDLE_TIME = 600
+# Defaults for a single run slice of a job
+TIME_BUDGET = 10.0
+IO_BUDGET = 64 * 1024 * 1024
+
+
+class Job:
+    """A maintenance task.
+
+    `func` is called with no arguments. If it returns a generator, every
+    `yield` is a checkpoint where the scheduler may stop for the slice; the
+    yielded value is the number of bytes of I/O done since the last one.
+    Jobs are restarted from scratch in a later session, so they have to be
+    safe to run again after being interrupted.
+    """
+
+    def __init__(self, name, func, priority=10, time_budget=TIME_BUDGET, io_budget=IO_BUDGET):
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.time_budget = time_budget
+        self.io_budget = io_budget
+
+
+class _Monitor(xbmc.Monitor):
+    def __init__(self, scheduler):
+        super(_Monitor, self).__init__()
+        self.scheduler = scheduler
+
+    def onScreensaverDeactivated(self):
+        self.scheduler.interrupt.set()
+
+    def onSettingsChanged(self):
+        # The service outlives the settings dialog, drop the cached values
+        CONFIG.settings_changed()
+
+
+class _Player(xbmc.Player):
+    def __init__(self, scheduler):
+        super(_Player, self).__init__()
+        self.scheduler = scheduler
+
+    def onPlayBackStarted(self):
+        self.scheduler.interrupt.set()
+
+    def onAVStarted(self):
+        self.scheduler.interrupt.set()
+
+
+class Scheduler:
+    """Runs queued maintenance jobs only while Kodi is idle.
+
+    Jobs run highest priority (lowest number) first, in slices bounded by
+    the job's time and I/O budget. Playback or leaving the screensaver
+    interrupts the current slice at its next checkpoint. Queued job names
+    are kept in STATE_FILE, so unfinished work carries over to the next
+    session.
+    """
+
+    def __init__(self, state_file=STATE_FILE):
+        self.state_file = state_file
+        self.jobs = {}
+        self.pending = self._load()
+        self.interrupt = threading.Event()
+        self._running = {}
+
+    def _load(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                return list(json.load(f).get('pending', []))
+        except:
+            return []
+
+    def _save(self):
+        try:
+            if not os.path.exists(os.path.dirname(self.state_file)):
+                os.makedirs(os.path.dirname(self.state_file))
+            tmp = '{0}.tmp'.format(self.state_file)
+            with open(tmp, 'w') as f:
+                json.dump({'pending': self.pending}, f)
+            os.replace(tmp, self.state_file)
+        except Exception as e:
+            logging.log("[Scheduler] Unable to save state: {0}".format(e), level=xbmc.LOGERROR)
+
+    def register(self, job):
+        self.jobs[job.name] = job
+
+    def enqueue(self, name):
+        if name not in self.pending:
+            self.pending.append(name)
+            self._save()
+
+    def _next(self):
+        queued = [self.jobs[name] for name in self.pending if name in self.jobs]
+        return min(queued, key=lambda job: job.priority) if queued else None
+
+    def _idle(self):
+        if xbmc.Player().isPlaying():
+            return False
+        return xbmc.getCondVisibility('System.ScreenSaverActive') or xbmc.getGlobalIdleTime() >= IDLE_TIME
+
+    def _finish(self, job):
+        self._running.pop(job.name, None)
+        self.pending.remove(job.name)
+        self._save()
+        logging.log("[Scheduler] Finished {0}".format(job.name), level=xbmc.LOGINFO)
+
+    def _run_slice(self, job):
+        gen = self._running.get(job.name)
+        if gen is None:
+            logging.log("[Scheduler] Starting {0}".format(job.name), level=xbmc.LOGINFO)
+            result = job.func()
+            if not inspect.isgenerator(result):
+                self._finish(job)
+                return
+            gen = self._running[job.name] = result
+
+        deadline = time.time() + job.time_budget
+        io = 0
+        try:
+            while True:
+                io += next(gen) or 0
+                if self.interrupt.is_set() or io >= job.io_budget or time.time() >= deadline:
+                    return
+        except StopIteration:
+            self._finish(job)
+
+    def run(self):
+        """Blocks until every queued job with a registered handler is done
+        or Kodi is shutting down."""
+        monitor = _Monitor(self)
+        # Kept referenced so its playback callbacks stay registered
+        self._player = _Player(self)
+
+        while not monitor.abortRequested():
+            # Nothing else writes wizard.log out while the service waits
+            logging.WIZARD_LOG.tick()
+            job = self._next()
+            if job is None:
+                break
+
+            self.interrupt.clear()
+            if not self._idle():
+                if monitor.waitForAbort(POLL_INTERVAL):
+                    break
+                continue
+
+            try:
+                self._run_slice(job)
+            except Exception as e:
+                logging.log("[Scheduler] {0} failed: {1}".format(job.name, e), level=xbmc.LOGERROR)
+                self._finish(job)
+
+            # Give Kodi room between slices
+            if monitor.waitForAbort(1):
+                break
+
+        for gen in self._running.values():
+            gen.close()
+        self._running = {}
+        self._player = None
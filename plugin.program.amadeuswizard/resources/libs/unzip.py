@@ -0,0 +1,194 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+# zlib releases the GIL while inflating, so members can be extracted on a few
+# threads at once. Each thread reads the archive through its own ZipFile.
+
+import os
+import shutil
+import threading
+import zipfile
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from concurrent.futures import FIRST_COMPLETED
+
+from resources.libs.pipeline import FILE_HEADER
+from resources.libs.pipeline import FILE_HEADER_MAGIC
+from resources.libs.pipeline import FH_EXTRA_FIELD_LENGTH
+from resources.libs.pipeline import FH_FILENAME_LENGTH
+from resources.libs.pipeline import _target_path
+
+WORKERS = min(4, os.cpu_count() or 1)
+# Members handed to a worker at a time, up to BATCH_BYTES of them
+BATCH_SIZE = 64
+BATCH_BYTES = 8 * 1024 * 1024
+COPY_SIZE = 1024 * 1024
+
+
+def _data_offset(raw, item):
+    # Start of a member's data, after its local header
+    raw.seek(item.header_offset)
+    header = FILE_HEADER.unpack(raw.read(FILE_HEADER.size))
+    if header[0] != FILE_HEADER_MAGIC:
+        raise zipfile.BadZipfile('Bad magic number for file header')
+    return item.header_offset + FILE_HEADER.size + header[FH_FILENAME_LENGTH] + header[FH_EXTRA_FIELD_LENGTH]
+
+
+def _copy_stored(raw, item, dst):
+    # Copies a stored member straight from the archive, skipping zipfile's
+    # buffering, and checks its CRC as zipfile would
+    raw.seek(_data_offset(raw, item))
+    remaining = item.compress_size
+    crc = 0
+    while remaining > 0:
+        chunk = raw.read(min(COPY_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipfile('Truncated file {0}'.format(item.filename))
+        crc = zlib.crc32(chunk, crc)
+        dst.write(chunk)
+        remaining -= len(chunk)
+    if crc & 0xffffffff != item.CRC:
+        raise zipfile.BadZipfile('Bad CRC-32 for file {0}'.format(item.filename))
+
+
+class _Archives(threading.local):
+    # A ZipFile and a raw handle on the archive for each worker thread. Every
+    # handle opened also goes in `opened`, shared by all threads, so the
+    # caller can close them once the pool is done.
+    def __init__(self, path, opened, lock):
+        self.path = path
+        self.opened = opened
+        self.lock = lock
+        self.zin = None
+        self.raw = None
+
+    def get(self):
+        if self.zin is None:
+            self.zin = zipfile.ZipFile(self.path, 'r', allowZip64=True)
+            self.raw = open(self.path, 'rb')
+            with self.lock:
+                self.opened.append((self.zin, self.raw))
+        return self.zin, self.raw
+
+
+def _extract_one(archives, item, path):
+    zin, raw = archives.get()
+    if item.compress_type == zipfile.ZIP_STORED and not item.flag_bits & 0x1:
+        with open(path, 'wb') as dst:
+            _copy_stored(raw, item, dst)
+    else:
+        with zin.open(item) as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_SIZE)
+
+
+def _batches(members):
+    batch = []
+    size = 0
+    for member in members:
+        batch.append(member)
+        size += member[0].file_size
+        if len(batch) >= BATCH_SIZE or size >= BATCH_BYTES:
+            yield batch
+            batch = []
+            size = 0
+    if batch:
+        yield batch
+
+
+def run(_in, _out, items, reporter, label=None, on_error=None):
+    """Extracts the ZipInfo items of archive _in into _out.
+
+    Directories are created up front, then files are written on a thread
+    pool. `label(done, size, filename)` gives the progress text and
+    `on_error(filename, exception)` is called for each member that failed,
+    both on the calling thread. Returns False if cancelled.
+    """
+    stop = threading.Event()
+    lock = threading.Lock()
+    done = [0, 0, '']
+    failed = []
+
+    targets = {}
+    for item in items:
+        # A later copy of the same name wins, as it did extracting in order
+        targets[_target_path(item.filename, _out)] = item
+    members = [(item, path) for path, item in targets.items()]
+    members.sort(key=lambda member: member[0].header_offset)
+
+    folders = set()
+    files = []
+    for item, path in members:
+        if item.is_dir():
+            folders.add(path)
+        else:
+            folders.add(os.path.dirname(path))
+            files.append((item, path))
+    for folder in sorted(folders):
+        try:
+            os.makedirs(folder)
+        except OSError:
+            pass
+    skipped = len(items) - len(files)
+
+    opened = []
+    archives = _Archives(_in, opened, lock)
+
+    def extract(batch):
+        for item, path in batch:
+            if stop.is_set():
+                return
+            try:
+                _extract_one(archives, item, path)
+            except Exception as e:
+                with lock:
+                    failed.append((item.filename, e))
+            with lock:
+                done[0] += 1
+                done[1] += item.file_size
+                done[2] = item.filename
+
+    total = len(items)
+    try:
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            pending = set(pool.submit(extract, batch) for batch in _batches(files))
+            while pending:
+                finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                with lock:
+                    errors, failed[:] = failed[:], []
+                    count, size, filename = skipped + done[0], done[1], done[2]
+                if on_error:
+                    for name, e in errors:
+                        on_error(name, e)
+                percent = 100 if total == 0 else count * 100.0 / total
+                reporter.update(percent, (lambda: label(count, size, filename)) if label else None)
+                if reporter.canceled():
+                    stop.set()
+    finally:
+        for zin, raw in opened:
+            zin.close()
+            raw.close()
+
+    if on_error:
+        for name, e in failed:
+            on_error(name, e)
+    return not stop.is_set()
@@ -28,6 +28,7 @@ from resources.libs.common.config import CONFIG
 
 def wizard_update():
     from resources.libs import check
+    from resources.libs.catalog import CATALOG
     from resources.libs.common import logging
     from resources.libs.common import tools
     from resources.libs.gui import window
@@ -35,9 +36,7 @@ def wizard_update():
     dialog = xbmcgui.Dialog()
     progress_dialog = xbmcgui.DialogProgress()
 
-    response = tools.open_url(CONFIG.BUILDFILE, check=True)
-
-    if response:
+    if CATALOG.available():
         try:
             wid, ver, zip = check.check_wizard('all')
         except:
@@ -0,0 +1,184 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+import os
+import shutil
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from concurrent.futures import FIRST_COMPLETED
+
+from resources.libs import db
+from resources.libs.common import logging
+from resources.libs.common.config import CONFIG
+
+# Folders that are emptied but never removed themselves
+PROTECTED_DIRS = frozenset(["Database", "userdata", "temp", "addons", "addon_data"])
+WORKERS = 4
+FILE_BATCH = 256
+
+
+class WipePlan:
+    def __init__(self):
+        self.trees = []
+        self.files = []
+        self.kept = []
+
+    @property
+    def total(self):
+        return len(self.files) + sum(count for path, count in self.trees)
+
+
+def _keep_file(name, parent, grandparent, latest_addon_db):
+    if parent == 'userdata':
+        if name == 'sources.xml' and CONFIG.KEEPSOURCES == 'true':
+            return True
+        elif name == 'favourites.xml' and CONFIG.KEEPFAVS == 'true':
+            return True
+        elif name == 'profiles.xml' and CONFIG.KEEPPROFILES == 'true':
+            return True
+        elif name == 'playercorefactory.xml' and CONFIG.KEEPPLAYERCORE == 'true':
+            return True
+        elif name == 'guisettings.xml' and CONFIG.KEEPGUISETTINGS == 'true':
+            return True
+        elif name == 'advancedsettings.xml' and CONFIG.KEEPADVANCED == 'true':
+            return True
+    if name == 'Addons33.db' and parent == 'Database' and grandparent == 'userdata' and CONFIG.KEEPADDONS33DB == 'true':
+        return True
+    if name in CONFIG.LOGFILES:
+        return True
+    if name == latest_addon_db:
+        return True
+    return False
+
+
+def _scan(path, plan, exclude_dirs, latest_addon_db):
+    # Returns (keeps, files, trees, count) for everything below path, so a
+    # caller can replace all of it with a single rmtree when keeps is False
+    keeps = False
+    files = []
+    trees = []
+    count = 0
+
+    try:
+        entries = list(os.scandir(path))
+    except OSError as e:
+        logging.log("Unable to scan {0}: {1}".format(path, e))
+        return True, files, trees, count
+
+    name = os.path.basename(path)
+    parent = os.path.basename(os.path.dirname(path))
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name in exclude_dirs:
+                plan.kept.append(entry.path)
+                keeps = True
+                continue
+            sub_keeps, sub_files, sub_trees, sub_count = _scan(entry.path, plan, exclude_dirs, latest_addon_db)
+            if not sub_keeps and entry.name not in PROTECTED_DIRS:
+                trees.append((entry.path, sub_count))
+            else:
+                files.extend(sub_files)
+                trees.extend(sub_trees)
+            keeps = keeps or sub_keeps
+            count += sub_count
+        elif _keep_file(entry.name, name, parent, latest_addon_db):
+            plan.kept.append(entry.path)
+            keeps = True
+        else:
+            files.append(entry.path)
+            count += 1
+
+    return keeps, files, trees, count
+
+
+def build_plan(home, exclude_dirs, latest_addon_db):
+    plan = WipePlan()
+    exclude_dirs = frozenset(exclude_dirs)
+    keeps, files, trees, count = _scan(os.path.abspath(home), plan, exclude_dirs, latest_addon_db)
+    plan.files = files
+    plan.trees = trees
+    return plan
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except Exception as e:
+        if path.endswith('.db') and not os.path.basename(path).startswith('Textures13'):
+            logging.log('Failed to delete, Purging DB')
+            logging.log("-> {0}".format(str(e)))
+            db.purge_db_file(path)
+        else:
+            logging.log("Error removing {0}".format(path))
+            logging.log("-> / {0}".format(str(e)))
+
+
+def _remove_tree(path):
+    def onerror(func, failed, exc_info):
+        if func in (os.remove, os.unlink):
+            _remove_file(failed)
+
+    shutil.rmtree(path, onerror=onerror)
+
+
+def run(plan, reporter, label=None):
+    """Executes a plan on a thread pool. Returns False if cancelled."""
+    stop = threading.Event()
+    total = plan.total
+    done = [0]
+    lock = threading.Lock()
+
+    def remove_files(paths):
+        for path in paths:
+            if stop.is_set():
+                return
+            _remove_file(path)
+            with lock:
+                done[0] += 1
+
+    def remove_tree(path, count):
+        if stop.is_set():
+            return
+        _remove_tree(path)
+        with lock:
+            done[0] += count
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        pending = set()
+        # Biggest subtrees first so the pool stays busy to the end
+        for path, count in sorted(plan.trees, key=lambda tree: -tree[1]):
+            pending.add(pool.submit(remove_tree, path, count))
+        for start in range(0, len(plan.files), FILE_BATCH):
+            pending.add(pool.submit(remove_files, plan.files[start:start + FILE_BATCH]))
+
+        while pending:
+            finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.log("Wipe error: {0}".format(str(e)))
+            percent = 100 if total == 0 else done[0] * 100.0 / total
+            reporter.update(percent, (lambda: label(done[0], total)) if label else None)
+            if reporter.canceled():
+                stop.set()
+
+    return not stop.is_set()
@@ -24,6 +24,7 @@ import os
 
 from resources.libs import check
 from resources.libs import db
+from resources.libs import delta
 from resources.libs import extract
 from resources.libs import install
 from resources.libs import skin
@@ -49,6 +50,47 @@ class Wizard:
                            yeslabel='[B][COLOR springgreen]Yes[/COLOR][/B]'):
             install.wipe()
 
+    def _stream_installer(self, url):
+        # Extract while downloading when asked to, or when there is no room
+        # to keep the whole zip on disk next to the extracted build
+        from resources.libs import pipeline
+
+        # Reading the central directory costs a few ranged requests, skip it
+        # when a HEAD request already shows there is plenty of room
+        if CONFIG.STREAMINSTALL != 'true' and pipeline.has_room(url, CONFIG.MYBUILDS):
+            return None
+
+        streamer = pipeline.StreamInstaller(url)
+        if not streamer.open():
+            return None
+        if CONFIG.STREAMINSTALL == 'true' or not streamer.fits(CONFIG.MYBUILDS):
+            logging.log("[Stream Install] Installing {0} while downloading".format(url))
+            return streamer
+        return None
+
+    def _download_quick_update(self, name, guizip, lib):
+        # Fetches the delta against the installed version when one is
+        # published, otherwise the full gui zip
+        updater = delta.DeltaUpdate(name, guizip)
+        url = updater.prepare()
+
+        try:
+            os.remove(lib)
+        except:
+            pass
+
+        Downloader().download(url, lib)
+        xbmc.sleep(500)
+
+        if os.path.getsize(lib) == 0:
+            try:
+                os.remove(lib)
+            except:
+                pass
+
+            return None
+        return updater
+
     def build(self, name, over=False):
         # if action == 'normal':
             # if CONFIG.KEEPTRAKT == 'true':
@@ -93,16 +135,19 @@ class Wizard:
             except:
                 pass
 
-            Downloader().download(buildzip, lib)
-            xbmc.sleep(500)
-            
-            if os.path.getsize(lib) == 0:
-                try:
-                    os.remove(lib)
-                except:
-                    pass
-                    
-                return
+            streamer = self._stream_installer(buildzip)
+
+            if not streamer:
+                Downloader().download(buildzip, lib)
+                xbmc.sleep(500)
+                
+                if os.path.getsize(lib) == 0:
+                    try:
+                        os.remove(lib)
+                    except:
+                        pass
+                        
+                    return
                 
             install.wipe()
                 
@@ -110,20 +155,25 @@ class Wizard:
             
             title = '[COLOR {0}][B]Installing:[/B][/COLOR] [COLOR {1}]{2} v{3}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, name, check.check_build(name, 'version'))
             self.dialogProgress.update(0, title + '\n' + 'Please Wait')
-            percent, errors, error = extract.all(lib, CONFIG.HOME, title=title)
+            if streamer:
+                percent, errors, error = streamer.extract(CONFIG.HOME, title=title)
+            else:
+                percent, errors, error = extract.all(lib, CONFIG.HOME, title=title)
             
             skin.skin_to_default('Build Install')
 
             if int(float(percent)) > 0:
                 db.fix_metas()
-                CONFIG.set_setting('buildname', name)
-                CONFIG.set_setting('buildversion', check.check_build(name, 'version'))
-                CONFIG.set_setting('buildtheme', '')
-                CONFIG.set_setting('latestversion', check.check_build(name, 'version'))
-                CONFIG.set_setting('nextbuildcheck', tools.get_date(days=CONFIG.UPDATECHECK, formatted=True))
-                CONFIG.set_setting('installed', 'true')
-                CONFIG.set_setting('extract', percent)
-                CONFIG.set_setting('errors', errors)
+                delta.forget(name)
+                with CONFIG.batch():
+                    CONFIG.set_setting('buildname', name)
+                    CONFIG.set_setting('buildversion', check.check_build(name, 'version'))
+                    CONFIG.set_setting('buildtheme', '')
+                    CONFIG.set_setting('latestversion', check.check_build(name, 'version'))
+                    CONFIG.set_setting('nextbuildcheck', tools.get_date(days=CONFIG.UPDATECHECK, formatted=True))
+                    CONFIG.set_setting('installed', 'true')
+                    CONFIG.set_setting('extract', percent)
+                    CONFIG.set_setting('errors', errors)
                 logging.log('INSTALLED {0}: [ERRORS:{1}]'.format(percent, errors))
 
                 # try:
@@ -155,7 +205,7 @@ class Wizard:
                 #########################################################################################################
                 # KODI-RD-IL
                 # Enable all addons in build's ZIP file.
-                installed = db.grab_addons(lib)
+                installed = streamer.addons() if streamer else db.grab_addons(lib)
                 db.addon_database(installed, 1, True)
                 try:
                     os.remove(lib)
@@ -211,26 +261,15 @@ class Wizard:
             self.dialogProgress.create(CONFIG.ADDONTITLE, '[COLOR {0}][B]Downloading GuiFix:[/B][/COLOR] [COLOR {1}]{2}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, name))
 
             lib = os.path.join(CONFIG.PACKAGES, '{0}_guisettings.zip'.format(zipname))
-            
-            try:
-                os.remove(lib)
-            except:
-                pass
 
-            Downloader().download(guizip, lib)
-            xbmc.sleep(500)
-            
-            if os.path.getsize(lib) == 0:
-                try:
-                    os.remove(lib)
-                except:
-                    pass
-                    
+            updater = self._download_quick_update(name, guizip, lib)
+            if not updater:
                 return
             
             title = '[COLOR {0}][B]Installing:[/B][/COLOR] [COLOR {1}]{2}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, name)
             self.dialogProgress.update(0, title + '\n' + 'Please Wait')
-            extract.all(lib, CONFIG.HOME, title=title)
+            percent, errors, error = extract.all(lib, CONFIG.HOME, title=title)
+            updater.finish(CONFIG.HOME, errors)
             self.dialogProgress.close()
             skin.skin_to_default('Build Install')
             skin.look_and_feel_data('save')
@@ -277,25 +316,14 @@ class Wizard:
             self.dialogProgress.close()
 
             lib = os.path.join(CONFIG.PACKAGES, '{0}_quick_update.zip'.format(zipname))
-            
-            try:
-                os.remove(lib)
-            except:
-                pass
 
-            Downloader().download(guizip, lib)
-            xbmc.sleep(500)
-            
-            if os.path.getsize(lib) == 0:
-                try:
-                    os.remove(lib)
-                except:
-                    pass
-                    
+            updater = self._download_quick_update(name, guizip, lib)
+            if not updater:
                 return False
             
             title = '[COLOR {0}][B]Installing:[/B][/COLOR] [COLOR {1}]{2}[/COLOR]'.format(CONFIG.COLOR2, CONFIG.COLOR1, name)
-            extract.all(lib, CONFIG.HOME, title=title)
+            percent, errors, error = extract.all(lib, CONFIG.HOME, title=title)
+            updater.finish(CONFIG.HOME, errors)
             # skin.skin_to_default('Build Install')
             # skin.look_and_feel_data('save')
             installed = db.grab_addons(lib)
@@ -0,0 +1,134 @@
+################################################################################
+#      Copyright (C) 2019 drinfernoo                                           #
+#                                                                              #
+#  This Program is free software; you can redistribute it and/or modify        #
+#  it under the terms of the GNU General Public License as published by        #
+#  the Free Software Foundation; either version 2, or (at your option)         #
+#  any later version.                                                          #
+#                                                                              #
+#  This Program is distributed in the hope that it will be useful,             #
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+#  GNU General Public License for more details.                                #
+#                                                                              #
+#  You should have received a copy of the GNU General Public License           #
+#  along with XBMC; see the file COPYING.  If not, write to                    #
+#  the Free Software Foundation, 675 Mass Ave, Cambridge, MA 02139, USA.       #
+#  http://www.gnu.org/copyleft/gpl.html                                        #
+################################################################################
+
+# zlib releases the GIL while deflating, so members are compressed on a few
+# threads and only appended to the archive, in order, on the calling thread.
+# How each one is compressed is up to compression.POLICY.
+
+import os
+import zipfile
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+from resources.libs.common import compression
+from resources.libs.common import logging
+
+WORKERS = min(4, os.cpu_count() or 1)
+# Bigger files are left to zipfile, which streams them instead of holding
+# them in memory
+MAX_MEMBER = 16 * 1024 * 1024
+# Members compressed ahead of the one being written, and the most file
+# bytes they may add up to, so memory stays bounded when they are large
+WINDOW = WORKERS * 4
+WINDOW_BYTES = 64 * 1024 * 1024
+
+
+def _compress(path, arcname):
+    zinfo = zipfile.ZipInfo.from_file(path, arcname)
+    with open(path, 'rb') as f:
+        data = f.read()
+    zinfo.file_size = len(data)
+    zinfo.CRC = zlib.crc32(data) & 0xffffffff
+    compress_type, level = compression.POLICY.for_data(path, data)
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = compressor.compress(data) + compressor.flush()
+    zinfo.compress_type = compress_type
+    zinfo.compress_size = len(data)
+    return zinfo, data
+
+
+def _append(zipf, zinfo, data):
+    # What ZipFile.writestr does after compressing, for data that already is.
+    # Uses ZipFile internals, checked against CPython 3.6 to 3.13; the
+    # archive must be a seekable file, as backups always are.
+    with zipf._lock:
+        if zipf._writing:
+            raise ValueError("Can't write to ZIP archive while an open writing handle exists.")
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+        zipf.fp.seek(zipf.start_dir)
+        zinfo.header_offset = zipf.fp.tell()
+        zipf.fp.write(zinfo.FileHeader(False))
+        zipf.fp.write(data)
+        zipf.start_dir = zipf.fp.tell()
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+
+
+def write_members(zipf, members, progress=None):
+    """Compresses (path, arcname) members into the open ZipFile zipf.
+
+    `progress(count, path)` is called after each member; returning False
+    stops the backup. Members that cannot be read are logged and left out.
+    Returns (bytes of the files written, whether it was stopped).
+    """
+    members = list(members)
+    written = 0
+
+    def compress(path, arcname, size):
+        if size > MAX_MEMBER:
+            return None
+        return _compress(path, arcname)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        queued = []
+        pending = [0]
+        ahead = iter(members)
+
+        def fill():
+            while len(queued) < WINDOW and (not queued or pending[0] < WINDOW_BYTES):
+                member = next(ahead, None)
+                if member is None:
+                    return
+                try:
+                    size = os.path.getsize(member[0])
+                except OSError:
+                    size = 0
+                future = pool.submit(compress, member[0], member[1], size)
+                # Larger members are streamed by zipfile and hold no memory here
+                size = size if size <= MAX_MEMBER else 0
+                pending[0] += size
+                queued.append((member, size, future))
+
+        count = 0
+        fill()
+        while queued:
+            (path, arcname), size, future = queued.pop(0)
+            pending[0] -= size
+            fill()
+            count += 1
+            try:
+                result = future.result()
+                if result is None:
+                    compression.write(zipf, path, arcname)
+                    written += os.path.getsize(path)
+                else:
+                    _append(zipf, *result)
+                    written += result[0].file_size
+            except Exception as e:
+                logging.log("[Back Up] Unable to backup {0}".format(path))
+                logging.log("{0} / {1}".format(Exception, e))
+
+            if progress is not None and progress(count, path) is False:
+                for member, size, future in queued:
+                    future.cancel()
+                return written, True
+    return written, False
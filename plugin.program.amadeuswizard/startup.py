@@ -35,6 +35,7 @@ except ImportError:  # Python 2
 from resources.libs.common.config import CONFIG
 from resources.libs import clear
 from resources.libs import check
+from resources.libs.catalog import CATALOG
 from resources.libs import db
 from resources.libs.gui import window
 from resources.libs.common import logging
@@ -228,9 +229,7 @@ def installed_build_check():
 
 
 def build_update_check():
-    response = tools.open_url(CONFIG.BUILDFILE, check=True)
-
-    if not response:
+    if not CATALOG.available():
         logging.log("[Build Check] Not a valid URL for Build File: {0}".format(CONFIG.BUILDFILE), level=xbmc.LOGINFO)
     elif not CONFIG.BUILDNAME == '':
         # if CONFIG.SKIN in ['skin.confluence', 'skin.estuary', 'skin.estouchy'] and not CONFIG.DEFAULTIGNORE == 'true':
@@ -287,35 +286,65 @@ def save_login():
                     level=xbmc.LOGINFO)
 
 
-def auto_clean():
+def clean_packages_job():
+    for count, size in clear.iter_old_packages():
+        yield size
+
+
+def clean_cache_job():
+    for count, size in clear.iter_clear_cache(True):
+        yield size
+
+
+def clean_thumbs_job():
+    for count, size in clear.iter_old_thumbs():
+        yield size
+
+
+def trim_thumbs_job():
+    for count, size in clear.iter_trim_thumbs():
+        yield size
+
+
+def register_maintenance(scheduler):
+    from resources.libs.scheduler import Job
+
+    scheduler.register(Job('clear_packages', clean_packages_job, priority=1))
+    scheduler.register(Job('clear_cache', clean_cache_job, priority=2))
+    scheduler.register(Job('old_thumbs', clean_thumbs_job, priority=3))
+    scheduler.register(Job('trim_thumbs', trim_thumbs_job, priority=4))
+
+
+def auto_clean(scheduler):
     service = False
     days = [tools.get_date(formatted=True), tools.get_date(days=1, formatted=True), tools.get_date(days=3, formatted=True), tools.get_date(days=7, formatted=True),
             tools.get_date(days=30, formatted=True)]
 
     freq = int(CONFIG.AUTOFREQ)
-    next_cleanup = time.mktime(time.strptime(CONFIG.NEXTCLEANDATE, "%Y-%m-%d %H:%M:%S"))
+    next_cleanup = time.mktime(time.strptime(CONFIG.AUTONEXTRUN, "%Y-%m-%d %H:%M:%S"))
 
     if next_cleanup <= tools.get_date() or freq == 0:
         service = True
         next_run = days[freq]
         CONFIG.set_setting('nextautocleanup', next_run)
     else:
-        logging.log("[Auto Clean Up] Next Clean Up {0}".format(CONFIG.NEXTCLEANDATE),
+        logging.log("[Auto Clean Up] Next Clean Up {0}".format(CONFIG.AUTONEXTRUN),
                     level=xbmc.LOGINFO)
+    # The jobs themselves run later, once Kodi is idle
     if service:
         if CONFIG.AUTOCACHE == 'true':
             logging.log('[Auto Clean Up] Cache: On', level=xbmc.LOGINFO)
-            clear.clear_cache(True)
+            scheduler.enqueue('clear_cache')
         else:
             logging.log('[Auto Clean Up] Cache: Off', level=xbmc.LOGINFO)
         if CONFIG.AUTOTHUMBS == 'true':
             logging.log('[Auto Clean Up] Old Thumbs: On', level=xbmc.LOGINFO)
-            clear.old_thumbs()
+            scheduler.enqueue('old_thumbs')
         else:
             logging.log('[Auto Clean Up] Old Thumbs: Off', level=xbmc.LOGINFO)
         if CONFIG.AUTOPACKAGES == 'true':
             logging.log('[Auto Clean Up] Packages: On', level=xbmc.LOGINFO)
-            clear.clear_packages_startup()
+            scheduler.enqueue('clear_packages')
         else:
             logging.log('[Auto Clean Up] Packages: Off', level=xbmc.LOGINFO)
 
@@ -340,6 +369,22 @@ def stop_if_duplicate():
         logging.log('Continuing Start Up Script')
 
 
+def prefetch_remote():
+    # Everything below needs these, fetch them side by side up front
+    urls = []
+    if CONFIG.get_setting('buildname'):
+        if CONFIG.ENABLE_NOTIFICATION == 'Yes':
+            urls.append(CONFIG.NOTIFICATION)
+        urls.append(CONFIG.QUICK_UPDATE_NOTIFICATION_URL)
+        if tools.platform() == 'android':
+            urls.append(CONFIG.LATEST_APK_VERSION_TEXT_FILE)
+        elif tools.platform() == 'windows':
+            urls.append(CONFIG.LATEST_WINDOWS_VERSION_TEXT_FILE)
+
+    if not tools.prefetch(urls, tasks=[CATALOG.load]):
+        logging.log("[Prefetch] Deadline reached, continuing with what was fetched", level=xbmc.LOGINFO)
+
+
 def check_for_video():
     while xbmc.Player().isPlayingVideo():
         xbmc.sleep(1000)
@@ -354,6 +399,8 @@ tools.ensure_folders()
     # stop_if_duplicate()
 # Ensure that the wizard's name matches its folder
 check.check_paths()
+# Fetch remote files concurrently before the checks below use them
+prefetch_remote()
     
 # AUTO UPDATE WIZARD
 if CONFIG.AUTOUPDATE == 'Yes':
@@ -405,22 +452,17 @@ else:
     logging.log("[Build Update Check] Next Check: {0}".format(buildcheck), level=xbmc.LOGINFO)
 
 # KODI-RD-IL - BUILD INSTALL ON STARTUP
-if tools.open_url(CONFIG.BUILDFILE, check=True) and CONFIG.get_setting('installed') == 'false':
+if CONFIG.get_setting('installed') == 'false' and CATALOG.available():
     logging.log("[Current Build Check] Build Not Installed", level=xbmc.LOGINFO)
     CONFIG.set_setting('nextbuildcheck', tools.get_date(days=CONFIG.UPDATECHECK, formatted=True))
     CONFIG.set_setting('installed', 'ignored')
     
     # Taken from build_menu.py - get_listing()
-    import re
-    response = tools.open_url(CONFIG.BUILDFILE)
-    link = tools.clean_text(response.text)
-        
     total, *_ = check.build_count()
-    match = re.compile('name="(.+?)".+?ersion="(.+?)".+?rl="(.+?)".+?ui="(.+?)".+?odi="(.+?)".+?heme="(.+?)".+?con="(.+?)".+?anart="(.+?)".+?dult="(.+?)".+?escription="(.+?)"').findall(link)
     
     # If only one build exists - Auto install build - without manual prompt
     if total == 1:
-        SINGLE_BUILD_NAME = match[0][0]
+        SINGLE_BUILD_NAME = CATALOG.get_builds()[0].name
         from resources.libs.wizard import Wizard
         Wizard().build(SINGLE_BUILD_NAME, over=True)
         
@@ -514,9 +556,18 @@ else:
     # logging.log("[Binary Detection] Eligible Binary Addons to Reinstall", level=xbmc.LOGINFO)
 
 # AUTO CLEAN
-# if CONFIG.get_setting('autoclean') == 'true':
-    # logging.log("[Auto Clean Up] Started", level=xbmc.LOGINFO)
-    # auto_clean()
-# else:
-    # logging.log('[Auto Clean Up] Not Enabled', level=xbmc.LOGINFO)
-    
\ No newline at end of file
+# Queued here and run by the scheduler only while Kodi is idle; jobs left
+# over from an earlier session are picked up again
+from resources.libs.scheduler import Scheduler
+maintenance = Scheduler()
+register_maintenance(maintenance)
+if CONFIG.get_setting('autoclean') == 'true':
+    logging.log("[Auto Clean Up] Started", level=xbmc.LOGINFO)
+    auto_clean(maintenance)
+else:
+    logging.log('[Auto Clean Up] Not Enabled', level=xbmc.LOGINFO)
+if clear.thumbs_quota_size():
+    maintenance.enqueue('trim_thumbs')
+# Startup is done, write out what it logged before possibly waiting a long time
+logging.WIZARD_LOG.flush()
+maintenance.run()
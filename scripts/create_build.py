@@ -2,19 +2,101 @@
 # -*- coding: utf-8 -*-
 """
 Amadeus Wizard - Build Generator
-Creates the initial 'full' build ZIP file from the repository contents.
+Creates the initial 'full' build ZIP file from the repository contents, and
+delta ZIPs between two build versions for quick updates.
 """
 
 import os
+import sys
+import json
 import shutil
+import hashlib
 import zipfile
 import argparse
 
 REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BUILD_DIR = os.path.join(REPO_ROOT, 'build_temp')
 RELEASES_DIR = os.path.join(REPO_ROOT, 'releases')
+MANIFEST_FORMAT = 1
 
-def create_base_build(version='1.0.0'):
+# The add-on's compression policy, so release ZIPs are packed the same way
+# as backups made on a device
+sys.path.insert(0, os.path.join(REPO_ROOT, 'plugin.program.amadeuswizard'))
+from resources.libs.common import compression  # noqa: E402
+
+
+def manifest_path(zip_path):
+    """Manifest published next to a build ZIP (see resources/libs/delta.py)."""
+    return os.path.splitext(zip_path)[0] + '.manifest.json'
+
+
+def zip_manifest(zip_path, version):
+    """Build the per-file manifest (path, size, sha1) of a build ZIP."""
+    files = {}
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        for info in zf.infolist():
+            if info.filename.endswith('/'):
+                continue
+            digest = hashlib.sha1()
+            with zf.open(info) as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            files[info.filename] = {'size': info.file_size, 'sha1': digest.hexdigest()}
+    return {'format': MANIFEST_FORMAT, 'version': version, 'files': files, 'deltas': {}}
+
+
+def write_manifest(zip_path, manifest):
+    path = manifest_path(zip_path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    print(f'[OK] Manifest written: {path}')
+    return path
+
+
+def create_delta(old_zip, new_zip, old_version, new_version):
+    """Create a delta ZIP with the files changed or added since old_version.
+
+    The delta and its delete list are recorded in the new build's manifest,
+    which clients on old_version use to skip the full download.
+    """
+    print(f'[INFO] Creating delta {old_version} -> {new_version}...')
+    old = zip_manifest(old_zip, old_version)
+
+    path = manifest_path(new_zip)
+    new = None
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            new = json.load(f)
+        if new.get('version') != new_version:
+            new = None
+    if new is None:
+        new = zip_manifest(new_zip, new_version)
+
+    changed = sorted(p for p, info in new['files'].items() if old['files'].get(p) != info)
+    deleted = sorted(p for p in old['files'] if p not in new['files'])
+
+    stem = os.path.splitext(os.path.basename(new_zip))[0]
+    delta_name = f'{stem}-delta-{old_version}-{new_version}.zip'
+    delta_path = os.path.join(os.path.dirname(os.path.abspath(new_zip)), delta_name)
+
+    with zipfile.ZipFile(new_zip, 'r') as src, zipfile.ZipFile(delta_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name in changed:
+            info = src.getinfo(name)
+            # A fresh entry, the source's offsets and sizes belong to the other archive
+            out = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+            out.external_attr = info.external_attr
+            out.compress_type = info.compress_type
+            # Lets zipfile pick zip64 up front for large members
+            out.file_size = info.file_size
+            with src.open(info) as f_in, zf.open(out, 'w') as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+    new.setdefault('deltas', {})[old_version] = {'url': delta_name, 'files': changed, 'delete': deleted}
+    write_manifest(new_zip, new)
+    print(f'[OK] Delta created: {delta_path} ({len(changed)} changed, {len(deleted)} deleted)')
+    return delta_path
+
+def create_base_build(version='1.0.0', db_level=compression.DB_LEVEL):
     """Create a base build ZIP containing critical addons and settings."""
     print(f'[INFO] Creating base build v{version}...')
     
@@ -61,18 +143,38 @@ def create_base_build(version='1.0.0'):
     zip_path = os.path.join(RELEASES_DIR, zip_name)
     
     print(f'[INFO] Zipping to {zip_name}...')
+    policy = compression.CompressionPolicy(db_level=db_level)
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
         for root, dirs, files in os.walk(BUILD_DIR):
             for file in files:
                 file_path = os.path.join(root, file)
                 # Keep structure relative to BUILD_DIR (so zip starts with addons/ and userdata/)
                 arcname = os.path.relpath(file_path, BUILD_DIR)
-                zf.write(file_path, arcname)
+                compression.write(zf, file_path, arcname, policy)
                 
     # Cleanup
     shutil.rmtree(BUILD_DIR)
     print(f'[OK] Build created: {zip_path}')
+    write_manifest(zip_path, zip_manifest(zip_path, version))
     return zip_path
 
 if __name__ == '__main__':
-    create_base_build()
+    parser = argparse.ArgumentParser(description='Amadeus Wizard build generator')
+    subparsers = parser.add_subparsers(dest='mode')
+
+    full_parser = subparsers.add_parser('full', help='create a full build ZIP (default)')
+    full_parser.add_argument('--version', default='1.0.0')
+    full_parser.add_argument('--db-level', type=int, default=compression.DB_LEVEL,
+                             help='deflate level for large databases (0-9)')
+
+    delta_parser = subparsers.add_parser('delta', help='create a delta ZIP between two builds')
+    delta_parser.add_argument('old_zip')
+    delta_parser.add_argument('new_zip')
+    delta_parser.add_argument('--from-version', required=True)
+    delta_parser.add_argument('--to-version', required=True)
+
+    args = parser.parse_args()
+    if args.mode == 'delta':
+        create_delta(args.old_zip, args.new_zip, args.from_version, args.to_version)
+    else:
+        create_base_build(getattr(args, 'version', '1.0.0'), getattr(args, 'db_level', compression.DB_LEVEL))
@@ -20,6 +20,10 @@ ADDONS = ['plugin.program.amadeuswizard', 'repository.amadeuswizard']
 OUTPUT_DIR = REPO_ROOT  # addons.xml in root
 ZIPS_DIR = os.path.join(REPO_ROOT, 'zips')
 
+# The add-on's compression policy, shared with the build and backup writers
+sys.path.insert(0, os.path.join(REPO_ROOT, 'plugin.program.amadeuswizard'))
+from resources.libs.common import compression  # noqa: E402
+
 def calculate_md5(filepath):
     """Calculate MD5 hash of a file."""
     hash_md5 = hashlib.md5()
@@ -48,69 +52,6 @@ def save_addons_xml(content):
     print(f'[OK] Generated: addons.xml.md5 ({md5_hash})')
 
 
-def create_addon_zip(addon_name, version=None):
-    """Create SIMPLE ZIP package to prevent Kodi crash."""
-    addon_path = os.path.join(REPO_ROOT, addon_name)
-    if not os.path.isdir(addon_path):
-        print(f'✗ Addon not found: {addon_name}')
-        return None
-    
-    # Get version
-    if not version:
-        addon_xml_path = os.path.join(addon_path, 'addon.xml')
-        tree = ElementTree.parse(addon_xml_path)
-        version = tree.getroot().get('version', '1.0.0')
-    
-    # Ensure zips output dir exists
-    addon_zips_dir = os.path.join(ZIPS_DIR, addon_name)
-    os.makedirs(addon_zips_dir, exist_ok=True)
-    
-    zip_name = f'{addon_name}-{version}.zip'
-    zip_path = os.path.join(addon_zips_dir, zip_name)
-    
-    print(f'Creating ZIP: {zip_path}...')
-    
-    # Standard ZIP creation (Best compatibility)
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-        # Walk the addon directory
-        for root, dirs, files in os.walk(addon_path):
-            # EXCLUDE everything irrelevant
-            dirs[:] = [d for d in dirs if d not in ['.git', '__pycache__', '.idea', 'zips', 'releases', 'bin', 'obj']]
-            
-            for file in files:
-                if file.endswith(('.pyc', '.pyo', '.DS_Store', '.zip')):
-                    continue
-                
-                abs_path = os.path.join(root, file)
-                
-                # Critical: Calculate path inside ZIP
-                # Must be: addon_id/file.xml
-                # NOT: addon_id/addon_id/file.xml
-                
-                rel_path = os.path.relpath(abs_path, addon_path) # path relative to addon folder
-                zip_arcname = os.path.join(addon_name, rel_path) # addon_id/rel_path
-                
-                # FORCE FORWARD SLASHES (Critical for Kodi/Zip standard)
-                zip_arcname = zip_arcname.replace(os.sep, '/')
-                
-                zf.write(abs_path, zip_arcname)
-    
-    # Verify ZIP integrity
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zf:
-            ret = zf.testzip()
-            if ret is not None:
-                print(f'❌ Corrupted file in ZIP: {ret}')
-                return None
-            print(f'✅ ZIP Entry Check Passed: {zip_path}')
-    except Exception as e:
-        print(f'❌ ZIP Validation Failed: {e}')
-        return None
-
-    print(f'[OK] Created Safe ZIP: {zip_path}')
-    return zip_path
-
-
 def get_addon_xml(addon_path):
     """Parse and return addon.xml content."""
     addon_xml_path = os.path.join(addon_path, 'addon.xml')
@@ -192,7 +133,7 @@ def create_addon_zip(addon_name, version=None):
                 # But for a repo zip, usually we want the folder inside.
                 # If we zip 'plugin.program.amadeuswizard', the zip should contain 'plugin.program.amadeuswizard/...'
                 # arcname from REPO_ROOT achieves this e.g. 'plugin.program.amadeuswizard/addon.xml'
-                zf.write(file_path, arcname)
+                compression.write(zf, file_path, arcname)
     
     print(f'[OK] Created: {zip_path}')
     return zip_path